@@ -2,6 +2,7 @@ import streamlit as st
 import lunch_data
 import recommender
 from history_manager import LunchHistory
+from geo_locator import geo_locator
 import pandas as pd
 import time
 from datetime import datetime
@@ -104,15 +105,23 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- Auto-Detect Location (Background) ---
+# IP 위치 추정은 디스크 캐시를 먼저 보고, 없으면 백그라운드 스레드에서 조회.
+# 첫 화면은 기다리지 않고 Seoul 기준으로 그린 뒤, 감지가 끝난 다음 실행부터 반영합니다.
+if not lunch_data.load_config().get("location"):
+    detected = geo_locator.cached()
+    if not detected:
+        geo_future = geo_locator.detect_in_background()
+        detected = geo_future.result() if geo_future.done() else None
+    if detected:
+        lunch_data.save_config({"location": detected})
+        st.session_state.pop('weather_info', None)  # 감지된 위치로 날씨 다시 조회
+
 # --- Auto-Fetch Weather (Silent) ---
 if 'weather_info' not in st.session_state:
-    # 1. Try Config / Auto Detect
+    # 1. Config (없으면 감지 완료 전까지 Seoul)
     cfg = lunch_data.load_config()
-    target = cfg.get("location")
-    
-    if not target:
-        target = st.session_state.recommender.detect_city_by_ip() or "Seoul"
-        lunch_data.save_config({"location": target})
+    target = cfg.get("location") or "Seoul"
 
     # 2. Fetch
     cond, temp = st.session_state.recommender.get_weather(location=target)
@@ -3,23 +3,44 @@ from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import uvicorn
 import recommender
+import lunch_data
 import os
 import random
 import asyncio
 import time
+import copy
+import contextvars
 import logging
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from session_manager import session_manager
 from rate_limiter import rate_limiter
 from datetime import datetime, timedelta
-
-# 날씨 캐시 (10분마다 갱신)
+from contextlib import asynccontextmanager
+import weather_client
+from weather_client import weather_http, async_weather
+from weather_store import weather_store, forecast_store
+from keyword_matcher import FuzzyKeywordIndex, KeywordMatcher, first_label, hit_labels
+from intent_cache import intent_cache, normalize_utterance
+from request_pipeline import RequestContext, StageTimings, pipeline_stats
+from intent_classifier import DEFAULT_CONFIDENCE_THRESHOLD, alog_labeled_utterance, intent_classifier
+from near_duplicate_cache import REUSABLE_FIELDS, mismatched_fields, near_intent_cache
+from response_copy_cache import copy_key, response_copy_cache
+from latency_budget import RESPONSE_RESERVE_SEC, gemini_latency
+from gemini_pool import DEFAULT_RPM_LIMIT, GeminiClientPool
+from single_flight import gemini_flights, normalize_prompt
+from gemini_stream import MIN_PARTIAL_CHARS, StreamCollector
+from kakao_callback import callback_ack_response, kakao_callbacks
+
+# 날씨 캐시 (백그라운드 작업이 10분마다 갱신, 요청은 캐시만 읽음)
 weather_cache = {
     "condition": None,
     "temp": None,
     "mapped_weather": None,
-    "last_updated": None
+    "last_updated": None,
+    "last_attempt": None,
+    "last_error": None,
+    "source": None
 }
 
 # 환경 변수 로드
@@ -41,58 +62,122 @@ console_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """서버 시작/종료 훅"""
+    # 날씨 API 연결을 미리 맺어 두어 첫 요청이 핸드셰이크 비용을 내지 않도록 함
+    # (스레드는 취소되지 않으므로 warm_up 자체 타임아웃을 짧게 둠)
+    warm_up_task = asyncio.create_task(asyncio.to_thread(weather_http.warm_up))
+    # 날씨는 백그라운드에서 주기적으로 갱신 (요청이 날씨 I/O를 기다리지 않도록)
+    refresher_task = asyncio.create_task(weather_refresher_loop())
+    await asyncio.to_thread(response_copy_cache.purge_expired)
+    pregen_task = asyncio.create_task(copy_pregen_loop())
+    yield
+    pregen_task.cancel()
+    refresher_task.cancel()
+    warm_up_task.cancel()
+    weather_http.close()
+    await async_weather.aclose()
+    await kakao_callbacks.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "DDMC Lunch Bot Server is running!"}
 
-# Gemini API 설정 (멀티 키 로테이션 지원)
+# Gemini API 설정 (키별 클라이언트 풀, 부하 분산)
 GEMINI_FORCE_LOCAL = os.getenv("GEMINI_FORCE_LOCAL", "").lower() in ("1", "true", "yes", "y")
 API_KEYS = [k.strip() for k in os.getenv("GEMINI_API_KEY", "").split(",") if k.strip()]
-current_key_index = 0
+GEMINI_KEY_RPM = int(os.getenv("GEMINI_KEY_RPM", str(DEFAULT_RPM_LIMIT)))
+# 오프라인 시험용 가짜 Gemini (fake_gemini.PROFILES 이름, 예: normal / degraded / quota). 설정하면 실제 키 대신 사용
+GEMINI_FAKE = os.getenv("GEMINI_FAKE", "").strip()
 
-gemini_model = None
-intent_model = None
 GEMINI_AVAILABLE = False
 
-def reconfigure_gemini():
-    global gemini_model, intent_model, GEMINI_AVAILABLE, current_key_index
-    
-    if not API_KEYS:
-        GEMINI_AVAILABLE = False
-        return False
 
-    try:
-        import google.generativeai as genai
-        from google.generativeai.types import HarmCategory, HarmBlockThreshold
-        
-        target_key = API_KEYS[current_key_index]
-        genai.configure(api_key=target_key)
-
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
+class KeyedGenerativeModel:
+    """API 키 하나에 묶인 GenerativeModel (전역 genai.configure를 쓰지 않음)"""
 
-        INTENT_CONFIG = {"temperature": 0.1, "max_output_tokens": 100, "top_p": 0.8, "top_k": 40}
-        RESPONSE_CONFIG = {"temperature": 0.85, "max_output_tokens": 200, "top_p": 0.8, "top_k": 40}
-        model_name = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
+    def __init__(self, model, client_manager):
+        self.model = model
+        self.client_manager = client_manager
 
-        gemini_model = genai.GenerativeModel(model_name, safety_settings=safety_settings, generation_config=RESPONSE_CONFIG)
-        intent_model = genai.GenerativeModel(model_name, safety_settings=safety_settings, generation_config=INTENT_CONFIG)
-        
-        GEMINI_AVAILABLE = True
-        logger.info(f"✅ Gemini API 키 전환 성공! (Key Index: {current_key_index}, Model: {model_name})")
-        return True
-    except Exception as e:
-        logger.error(f"❌ Gemini API 재설정 실패 (Index {current_key_index}): {e}")
-        return False
+    async def generate_content_async(self, prompt, **kwargs):
+        # 비동기 클라이언트는 이벤트 루프 안에서 처음 쓸 때 키별로 한 번만 생성
+        if self.model._async_client is None:
+            self.model._async_client = self.client_manager.get_default_client("generative_async")
+        return await self.model.generate_content_async(prompt, **kwargs)
+
+
+def build_gemini_models(api_key: str) -> Dict[str, Any]:
+    """키 하나의 문구 생성용 / 의도 분석용 모델"""
+    import google.generativeai as genai
+    from google.generativeai import client as genai_client
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
+    client_manager = genai_client._ClientManager()
+    client_manager.configure(api_key=api_key)
+
+    safety_settings = {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    }
+
+    INTENT_CONFIG = {"temperature": 0.1, "max_output_tokens": 100, "top_p": 0.8, "top_k": 40}
+    RESPONSE_CONFIG = {"temperature": 0.85, "max_output_tokens": 200, "top_p": 0.8, "top_k": 40}
+    # 의도 JSON + 답변을 한 번에 받는 모드용 (구조화 출력)
+    COMBINED_CONFIG = {"temperature": 0.6, "max_output_tokens": 320, "top_p": 0.8, "top_k": 40,
+                       "response_mime_type": "application/json"}
+    model_name = os.getenv("GEMINI_MODEL", "gemini-2.5-flash-lite")
 
-if not GEMINI_FORCE_LOCAL and API_KEYS:
-    reconfigure_gemini()
+    return {
+        "generation": KeyedGenerativeModel(
+            genai.GenerativeModel(model_name, safety_settings=safety_settings, generation_config=RESPONSE_CONFIG),
+            client_manager,
+        ),
+        "intent": KeyedGenerativeModel(
+            genai.GenerativeModel(model_name, safety_settings=safety_settings, generation_config=INTENT_CONFIG),
+            client_manager,
+        ),
+        "combined": KeyedGenerativeModel(
+            genai.GenerativeModel(model_name, safety_settings=safety_settings, generation_config=COMBINED_CONFIG),
+            client_manager,
+        ),
+    }
+
+
+def build_fake_gemini_pool(profile: str) -> GeminiClientPool:
+    """가짜 키 GEMINI_FAKE_KEYS개로 풀 구성 (녹화 파일/seed는 GEMINI_FAKE_RECORDING / GEMINI_FAKE_SEED)"""
+    from fake_gemini import build_fake_models, load_recording
+
+    recording_path = os.getenv("GEMINI_FAKE_RECORDING", "")
+    recording = load_recording(recording_path) if recording_path else None
+    seed = os.getenv("GEMINI_FAKE_SEED")
+    fake_keys = [f"fake-key-{i}" for i in range(int(os.getenv("GEMINI_FAKE_KEYS", "2")))]
+    return GeminiClientPool.from_keys(
+        fake_keys,
+        lambda key: build_fake_models(
+            profile, recording=recording, seed=None if seed is None else int(seed) + 10 * fake_keys.index(key)
+        ),
+        rpm_limit=GEMINI_KEY_RPM,
+    )
+
+
+gemini_pool = GeminiClientPool()
+if GEMINI_FAKE and not GEMINI_FORCE_LOCAL:
+    gemini_pool = build_fake_gemini_pool(GEMINI_FAKE)
+    GEMINI_AVAILABLE = len(gemini_pool) > 0
+    logger.warning(f"🧪 가짜 Gemini 사용 중 (profile={GEMINI_FAKE}, keys={len(gemini_pool)})")
+elif not GEMINI_FORCE_LOCAL and API_KEYS:
+    gemini_pool = GeminiClientPool.from_keys(API_KEYS, build_gemini_models, rpm_limit=GEMINI_KEY_RPM)
+    GEMINI_AVAILABLE = len(gemini_pool) > 0
+    if GEMINI_AVAILABLE:
+        logger.info(f"✅ Gemini 키 풀 준비 완료: {len(gemini_pool)}/{len(API_KEYS)}개 (Model: {os.getenv('GEMINI_MODEL', 'gemini-2.5-flash-lite')})")
+    else:
+        logger.error("❌ Gemini 클라이언트를 하나도 만들지 못했습니다.")
 else:
     if GEMINI_FORCE_LOCAL:
         logger.warning("⚠️ Gemini API 강제 비활성화 모드입니다.")
@@ -133,9 +218,241 @@ MOOD_KEYWORDS = {
     "다이어트": ["다이어트", "살빼", "가벼운", "샐러드", "관리", "식단"]
 }
 
+# CUISINE_KEYWORDS에 없는 '특징' 기반 키워드 (태그 필터용)
+TAG_KEYWORDS = {
+    "soup": ["국물", "찌개", "탕", "전골", "국밥"],
+    "noodle": ["면", "국수", "우동", "라면", "짬뽕", "짜장", "파스타", "소바"],
+    "meat": ["고기", "육류", "돈까스", "스테이크", "갈비", "불고기", "제육"],
+    "rice": ["밥", "덮밥", "볶음밥", "비빔밥", "리조또"],
+    "spicy": ["매운", "빨간", "얼큰", "칼칼"],
+    "light": ["가벼운", "샐러드", "샌드위치", "다이어트"],
+    "heavy": ["든든", "푸짐", "해장"]
+}
+
+# 의도 단어 (순서 = 우선순위)
+INTENT_KEYWORDS = {
+    "greeting": ["안녕", "안녕하세요", "하이", "ㅎㅇ", "hello", "hi", "헬로", "헬로우", "반가", "반가워", "여보세요", "누구", "넌누구", "이름이", "봇이름"],
+    "thanks": ["고마", "감사", "thanks", "thank", "ㅇㅋ", "알았어", "ㄱㅅ", "ㄳ"],
+    "explain": ["왜", "이유", "why", "어째서", "이유는", "설명해", "왜죠"],
+    "reject": ["싫", "별로", "다른", "아니", "no", "패스", "바꿔", "말고", "담에", "나중에"],
+    "recommend": ["추천", "메뉴", "밥", "식사", "배고파", "뭐먹지", "골라줘", "아무거나", "랜덤", "알아서", "해봐", "해", "고", "배곱", "출출", "허기"],
+    "accept_short": ["응", "ㅇㅇ", "ㅇㅋ", "좋아", "콜", "고고"],
+    "help": ["도움", "사용법", "설명", "help", "어떻게", "기능"],
+    "accept_feedback": ["좋", "맛있", "거기", "그거", "먹을", "ok", "yes", "굿"]
+}
+
+# 질문형 발화에서도 추천으로 볼 핵심 단어
+RECOMMEND_CORE_KEYWORDS = ["추천", "메뉴", "점심", "밥"]
+
+EMOTION_KEYWORDS = {
+    "negative": ["좆같", "짜증", "열받", "화나", "힘들", "우울"],
+    "positive": ["행복", "좋", "신나", "즐거"]
+}
+
+
+# (분류, 사전) 목록 - 정확 매칭 오토마톤과 퍼지 색인이 같은 사전을 사용
+INTENT_KEYWORD_TABLES = [
+    ("intent", INTENT_KEYWORDS),
+    ("recommend", {"core": RECOMMEND_CORE_KEYWORDS}),
+    ("emotion", EMOTION_KEYWORDS),
+    ("cuisine", CUISINE_KEYWORDS),
+    ("tag", TAG_KEYWORDS),
+    ("weather", WEATHER_KEYWORDS),
+    ("mood", MOOD_KEYWORDS),
+]
+
+
+def build_intent_matcher() -> KeywordMatcher:
+    """로컬 의도 분석용 키워드 사전을 오토마톤 하나로 컴파일"""
+    matcher = KeywordMatcher()
+    for category, table in INTENT_KEYWORD_TABLES:
+        matcher.add_table(category, table)
+    return matcher.compile()
+
+
+def build_intent_fuzzy_index() -> FuzzyKeywordIndex:
+    """같은 키워드 사전의 자모 퍼지 색인 (띄어쓰기 변형 / 오타 1개)"""
+    index = FuzzyKeywordIndex()
+    for category, table in INTENT_KEYWORD_TABLES:
+        index.add_table(category, table)
+    return index
+
+
+INTENT_MATCHER = build_intent_matcher()
+INTENT_FUZZY_INDEX = build_intent_fuzzy_index()
+
 # [공용 객체] 서버 시작 시 한 번만 생성하여 I/O 부하 감소
 r = recommender.LunchRecommender()
 
+
+def _on_config_change(old_config: Dict, new_config: Dict) -> None:
+    """설정의 위치가 바뀌면 날씨 캐시를 무효화 (다음 요청에서 새 위치로 다시 조회)"""
+    if old_config.get("location") != new_config.get("location"):
+        weather_cache["last_updated"] = None
+        logger.info(f"📍 위치 변경 감지: {old_config.get('location')} -> {new_config.get('location')} (날씨 캐시 초기화)")
+
+lunch_data.add_config_listener(_on_config_change)
+
+
+def _on_menu_change(names: List[str]) -> None:
+    """메뉴가 추가/수정/삭제되면 추천기 메뉴를 다시 바인딩하고 해당 메뉴의 캐시된 응답 문구 삭제"""
+    r.refresh_data()
+    for name in names:
+        removed = response_copy_cache.invalidate_menu(name)
+        logger.info(f"🍽️ 메뉴 변경 감지: {name} (문구 캐시 {removed}건 삭제)")
+
+lunch_data.add_menu_listener(_on_menu_change)
+
+
+# --- 날씨 백그라운드 갱신 (stale-while-revalidate) ---
+WEATHER_REFRESH_INTERVAL_SEC = 600   # 정기 갱신 주기 (10분)
+WEATHER_STALE_AFTER_SEC = 900        # 이 시간이 지나면 오래된 값으로 간주하고 즉시 재검증
+WEATHER_RETRY_INTERVAL_SEC = 60      # 갱신 실패 시 재시도 주기
+_weather_revalidate_task = None
+
+
+# 날씨 라벨 매핑은 예보 조회와 공유하도록 weather_client로 이동
+map_weather = weather_client.map_weather_label
+
+
+def get_weather_age_sec() -> Optional[float]:
+    """마지막 성공 갱신 이후 경과 시간 (한 번도 없으면 None)"""
+    last_updated = weather_cache.get("last_updated")
+    if not last_updated:
+        return None
+    return (datetime.now() - last_updated).total_seconds()
+
+
+def is_weather_stale() -> bool:
+    age = get_weather_age_sec()
+    return age is None or age > WEATHER_STALE_AFTER_SEC
+
+
+async def refresh_weather_cache() -> bool:
+    """날씨를 조회해 캐시를 갱신. 실패하면 기존 값을 그대로 둠."""
+    now = datetime.now()
+    weather_cache["last_attempt"] = now
+    location = lunch_data.load_config().get("location", "Seoul")
+
+    # 1) 시간별 예보 표에 현재 시각이 있으면 그 값을 사용 (몇 시간에 한 번 받은 예보로 현재 날씨 호출 대체)
+    forecast = await refresh_forecast(location)
+    # 예보 표는 KST 기준이므로 서버 시간대(컨테이너는 보통 UTC)와 무관하게 KST 현재 시각으로 조회
+    cond, temp = forecast.at(weather_client.forecast_now()) if forecast else (None, None)
+    source, observed_at = "forecast", now
+
+    # 2) 예보가 없으면 현재 날씨 직접 조회
+    if cond is None:
+        source = "live"
+        try:
+            # 위치별 공용 캐시에 최근 관측값이 있으면 재사용 (재시작 직후 등), 없으면 조회 한 번만 실행
+            cond, temp = await weather_store.aget_or_fetch(
+                location, lambda: async_weather.get_weather(location), max_age=WEATHER_REFRESH_INTERVAL_SEC / 2
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            cond, temp = None, None
+            weather_cache["last_error"] = str(e)
+        if cond is None and temp is None:
+            weather_cache["last_error"] = weather_cache.get("last_error") or "no provider returned weather"
+            logger.warning(f"🌧️ 날씨 갱신 실패 (기존 값 유지, age={get_weather_age_sec()})")
+            return False
+        entry = weather_store.get_entry(location)
+        observed_at = datetime.fromtimestamp(entry["fetched_at"]) if entry else now
+
+    weather_cache.update({
+        "condition": cond, "temp": temp,
+        "mapped_weather": map_weather(cond, temp),
+        "last_updated": observed_at, "last_error": None, "source": source
+    })
+    return True
+
+
+async def refresh_forecast(location: str):
+    """시간별 예보를 (TTL이 지났을 때만) 받아 공용 예보 캐시에 저장. 실패하면 None"""
+    try:
+        return await forecast_store.aget_or_fetch(location, lambda: async_weather.get_hourly_forecast(location))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"🌧️ 시간별 예보 갱신 실패: {e}")
+        return None
+
+
+def get_meal_weather(meal_label: str) -> Optional[str]:
+    """해당 식사 시각의 예보 날씨 라벨 (메모리의 예보만 사용, 없으면 현재 날씨 캐시)"""
+    location = lunch_data.load_config().get("location", "Seoul")
+    cond, temp = forecast_store.weather_at(location, weather_client.meal_time(meal_label))
+    if cond is None and temp is None:
+        return weather_cache.get("mapped_weather")
+    return map_weather(cond, temp)
+
+
+def trigger_weather_revalidation() -> None:
+    """캐시가 오래됐으면 백그라운드 재검증을 한 번만 시작 (요청은 기다리지 않음)"""
+    global _weather_revalidate_task
+    if not is_weather_stale():
+        return
+    if _weather_revalidate_task is not None and not _weather_revalidate_task.done():
+        return
+    _weather_revalidate_task = asyncio.create_task(refresh_weather_cache())
+
+
+async def weather_refresher_loop() -> None:
+    """서버 시작 시 실행: 주기적으로 날씨 캐시를 갱신"""
+    while True:
+        try:
+            ok = await refresh_weather_cache()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            ok = False
+            logger.warning(f"🌧️ 날씨 갱신 루프 오류: {e}")
+        await asyncio.sleep(WEATHER_REFRESH_INTERVAL_SEC if ok else WEATHER_RETRY_INTERVAL_SEC)
+
+
+@app.get("/api/weather/status")
+async def weather_status():
+    """날씨 캐시 상태 (신선도 / 제공자 통계) 확인용"""
+    age = get_weather_age_sec()
+    return {
+        "condition": weather_cache.get("condition"),
+        "temp": weather_cache.get("temp"),
+        "mapped_weather": weather_cache.get("mapped_weather"),
+        "last_updated": weather_cache["last_updated"].isoformat() if weather_cache.get("last_updated") else None,
+        "age_sec": round(age, 1) if age is not None else None,
+        "stale": is_weather_stale(),
+        "last_error": weather_cache.get("last_error"),
+        "providers": weather_client.provider_stats(),
+        "source": weather_cache.get("source"),
+        "store": weather_store.stats(),
+        "forecast_store": forecast_store.stats(),
+    }
+
+
+@app.get("/api/intent/cache")
+async def intent_cache_status():
+    """의도 분석 캐시 적중률 확인용 (정확 일치 + 유사 발화)"""
+    return {**intent_cache.stats(), "near_duplicate": near_intent_cache.stats()}
+
+
+@app.get("/api/copy/cache")
+async def copy_cache_status():
+    """Gemini 응답 문구 캐시 (메모리/디스크) 적중률 + 사전 생성 현황 확인용"""
+    return {**response_copy_cache.stats(), "pregen": dict(pregen_stats), "pregen_active": can_pregenerate()}
+
+
+@app.get("/api/gemini/keys")
+async def gemini_keys_status():
+    """키별 상태 (쿨다운 / 진행 중 호출 / 최근 1분 호출 수 / 호출 종류별 서킷 상태) + 중복 호출 합치기 통계 확인용"""
+    return {**gemini_pool.stats(), "single_flight": gemini_flights.stats()}
+
+
+@app.get("/api/pipeline/stats")
+async def pipeline_status():
+    """요청 처리 단계별 평균/최대 소요 시간 + Gemini 응답 시간(p50/p90, 헤지 결과) + 카카오 콜백 전송 확인용"""
+    return {**pipeline_stats.snapshot(), "gemini_latency": gemini_latency.stats(), "callbacks": kakao_callbacks.stats()}
+
 # Input Models for Kakao Skill Payload
 class Action(BaseModel):
     params: Dict[str, Any] = Field(default_factory=dict)
@@ -146,6 +463,7 @@ class User(BaseModel):
 class UserRequest(BaseModel):
     utterance: str
     user: Optional[User] = None
+    callbackUrl: Optional[str] = None   # 스킬 블록에서 콜백을 켠 경우에만 들어옴
 
 class SkillPayload(BaseModel):
     userRequest: UserRequest
@@ -177,72 +495,198 @@ def get_josa(word: str, particle_type: str) -> str:
 
 
 import asyncio
-INTENT_TIMEOUT_SEC = 1.8
-GENERATION_TIMEOUT_SEC = 2.5
-
-# [최적화] 지수 백오프 기반 쿨다운 시스템
-GEMINI_INITIAL_COOLDOWN = 30.0 # 초기 쿨다운 30초
-GEMINI_MAX_COOLDOWN = 600.0    # 최대 쿨다운 10분
-GEMINI_BACKOFF_FACTOR = 2.0    # 배수
-GEMINI_COOLDOWN_UNTIL = 0.0
-current_gemini_cooldown_sec = GEMINI_INITIAL_COOLDOWN
-
+INTENT_TIMEOUT_SEC = 1.8             # 의도 분석 대기 상한 (실제 마감은 p90/남은 예산으로 조정)
+# 로컬 의도 분류기 확신도가 이 값 이상이면 Gemini 의도 분석을 건너뜀
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", DEFAULT_CONFIDENCE_THRESHOLD))
+# 유사 발화 캐시로 재사용한 의도 중 실제 Gemini 결과와 비교해 볼 비율
+NEAR_DUP_AUDIT_RATE = float(os.getenv("NEAR_DUP_AUDIT_RATE", "0.1"))
+GENERATION_TIMEOUT_SEC = 2.5         # 문구 생성 대기 상한 (실제 마감은 p90/남은 예산으로 조정)
+GLOBAL_TIMEOUT_SEC = 4.3             # 요청 전체 예산 (카카오 5초 제한 전에 응답)
+COMBINED_TIMEOUT_SEC = 3.0           # 의도 + 답변 한 번에 받는 호출의 대기 상한
+# 의도 분석과 추천 멘트를 Gemini 한 번의 호출로 받기 (메뉴 후보는 로컬에서 먼저 고름)
+GEMINI_COMBINED_MODE = os.getenv("GEMINI_COMBINED_MODE", "").lower() in ("1", "true", "yes", "y")
+COMBINED_SHORTLIST_SIZE = 3
+# 추천 멘트를 스트리밍으로 받아 마감 시점까지 완성된 문장만이라도 사용 (위치/종류는 로컬에서 붙임)
+GEMINI_STREAMING = os.getenv("GEMINI_STREAMING", "").lower() in ("1", "true", "yes", "y")
+STREAM_MAX_SEC = GENERATION_TIMEOUT_SEC * 2   # 마감 뒤에도 캐시를 채우려고 스트림을 받는 최대 시간
+# 카카오 콜백(useCallback): 바로 끝나지 않는 요청은 "잠시만요"로 먼저 답하고 최종 응답은 callbackUrl로 전송
+KAKAO_CALLBACK_ENABLED = os.getenv("KAKAO_CALLBACK", "1").lower() not in ("0", "false", "no", "n")
+CALLBACK_ACK_SEC = 1.0        # 이 안에 끝나면 콜백 없이 바로 응답
+CALLBACK_BUDGET_SEC = 45.0    # 콜백으로 보낼 응답의 전체 예산 (callbackUrl 유효 시간 1분 안)
+CALLBACK_PATIENCE = 3.0       # 콜백 응답 중에는 Gemini 대기 상한을 이 배수만큼 늘림
+CALLBACK_ACK_TEXT = "메뉴 고르는 중이에요! 잠시만 기다려 주세요 🍽️"
+# 현재 요청의 Gemini 대기 배수 (콜백 응답을 만드는 태스크에서만 1보다 큼)
+gemini_patience: contextvars.ContextVar = contextvars.ContextVar("gemini_patience", default=1.0)
+GEMINI_CALL_TIMEOUTS = {
+    "intent": INTENT_TIMEOUT_SEC,
+    "generation": GENERATION_TIMEOUT_SEC,
+    "combined": COMBINED_TIMEOUT_SEC,
+}
 
+# 429 쿨다운/백오프는 키별로 gemini_pool이 관리 (한 키가 막혀도 다른 키로 계속 호출)
 def _is_rate_limited_error(err: Exception) -> bool:
     msg = str(err).lower()
     return "429" in msg or "quota" in msg or "rate limit" in msg
 
 
-def _gemini_in_cooldown() -> bool:
-    return time.time() < GEMINI_COOLDOWN_UNTIL
+def _gemini_in_cooldown(kind: Optional[str] = None) -> bool:
+    """등록된 키가 모두 쿨다운이면 True (kind가 있으면 그 호출 종류의 서킷이 모두 차단된 경우도 True -> 로컬 모드)"""
+    return gemini_pool.all_in_cooldown(kind)
 
 
-def _set_gemini_cooldown() -> None:
-    global GEMINI_COOLDOWN_UNTIL, current_gemini_cooldown_sec, current_key_index
-    
-    # [멀티 키] 429 에러 발생 시 즉시 다음 키로 전환 시도
-    if len(API_KEYS) > 1:
-        old_idx = current_key_index
-        current_key_index = (current_key_index + 1) % len(API_KEYS)
-        logger.warning(f"🔄 Rate Limit 감지! 키 전환 시도: Index {old_idx} -> {current_key_index}")
-        if reconfigure_gemini():
-            # 키 전환 성공 시 쿨다운 없이 즉시 재시도 가능하도록 설정 (단, 백오프는 유지하여 안전성 확보)
-            GEMINI_COOLDOWN_UNTIL = 0
-            return
+async def call_gemini(kind: str, prompt: str, timeout_sec: float, flight_key=None):
+    """
+    Gemini 호출 (kind: "generation" / "intent"). 같은 프롬프트(또는 flight_key)의 호출이 이미 진행 중이면
+    새로 보내지 않고 그 결과를 함께 받습니다 (동시 요청 몰릴 때 쿼터/429 절약).
+    대기 배수(gemini_patience)가 다른 호출끼리는 합치지 않고, 배수는 호출에 직접 넘깁니다
+    (합쳐진 호출이 처음 시작한 요청의 컨텍스트 값을 물려받지 않도록).
+    """
+    patience = gemini_patience.get()
+    key = (flight_key or (kind, normalize_prompt(prompt)), patience)
+    return await gemini_flights.do(key, lambda: _call_gemini_once(kind, prompt, timeout_sec, patience))
 
-    GEMINI_COOLDOWN_UNTIL = time.time() + current_gemini_cooldown_sec
-    logger.warning(f"⚠️ 모든 키 한도 초과 또는 단일 키 쿨다운 진입: {current_gemini_cooldown_sec:.1f}초")
-    current_gemini_cooldown_sec = min(GEMINI_MAX_COOLDOWN, current_gemini_cooldown_sec * GEMINI_BACKOFF_FACTOR)
 
-def _reset_gemini_backoff() -> None:
-    """성공 시 백오프 초기화"""
-    global current_gemini_cooldown_sec
-    if current_gemini_cooldown_sec > GEMINI_INITIAL_COOLDOWN:
-        current_gemini_cooldown_sec = GEMINI_INITIAL_COOLDOWN
-        logger.info("✅ Gemini 백오프가 초기화되었습니다.")
+async def _call_gemini_once(kind: str, prompt: str, timeout_sec: float, patience: float = 1.0):
+    """
+    풀에서 가장 한가한 키를 골라 호출 (대기 상한은 timeout_sec * patience).
+    429면 그 키만 쿨다운, 오류/타임아웃은 그 키 + 종류의 서킷 브레이커에 기록. 쓸 수 있는 키가 없거나 실패하면 예외
+    """
+    # 시작 시각은 서킷 브레이커가 이 호출이 시험 호출인지 가리는 표식
+    acquired_at = time.time()
+    client = gemini_pool.acquire(kind, now=acquired_at)
+    if client is None:
+        raise RuntimeError(f"쓸 수 있는 Gemini 키 없음 (쿨다운/서킷 차단, {gemini_pool.cooldown_remaining():.1f}s left)")
+    timeout_sec *= patience
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(client.models[kind].generate_content_async(prompt), timeout=timeout_sec)
+    except asyncio.TimeoutError:
+        gemini_latency.record(kind, timeout_sec, timed_out=True)
+        gemini_pool.release(client, ok=False, kind=kind, timed_out=True, started_at=acquired_at)
+        raise
+    except asyncio.CancelledError:
+        gemini_pool.release(client, ok=False, kind=kind, aborted=True, started_at=acquired_at)
+        raise
+    except Exception as e:
+        gemini_pool.release(client, ok=False, rate_limited=_is_rate_limited_error(e), kind=kind,
+                            started_at=acquired_at)
+        raise
+    gemini_latency.record(kind, time.perf_counter() - started)
+    gemini_pool.release(client, ok=True, kind=kind, started_at=acquired_at)
+    return response
+
 
-async def run_gemini_with_timeout(model, prompt: str, timeout_sec: float, log_label: str):
+async def run_gemini_with_timeout(prompt: str, timeout_sec: float, log_label: str, kind: str = "generation", flight_key=None):
     """Execute Gemini call with a strict timeout and return text or None."""
-    if _gemini_in_cooldown():
-        remaining = GEMINI_COOLDOWN_UNTIL - time.time()
-        logger.warning(f"{log_label} skipped: Gemini in cooldown ({remaining:.1f}s left)")
+    if _gemini_in_cooldown(kind):
+        logger.warning(f"{log_label} skipped: Gemini in cooldown / circuit open ({gemini_pool.cooldown_remaining():.1f}s left)")
         return None
     try:
-        # 가급적 자체 비동기 메서드 사용
-        response = await asyncio.wait_for(model.generate_content_async(prompt), timeout=timeout_sec)
-        result = (response.text or "").strip()
-        if result:
-            _reset_gemini_backoff() # 성공하면 백오프 초기화
-        return result
+        response = await call_gemini(kind, prompt, timeout_sec, flight_key=flight_key)
+        return (response.text or "").strip()
     except asyncio.TimeoutError:
         logger.warning(f"{log_label} timeout after {timeout_sec}s")
     except Exception as e:
         if _is_rate_limited_error(e):
-            _set_gemini_cooldown()
-            logger.warning(f"{log_label} rate-limited; entering cooldown")
+            logger.warning(f"{log_label} rate-limited; key cooling down")
         logger.warning(f"{log_label} fail: {e}")
     return None
 
+async def _start_gemini_stream(kind: str, prompt: str, on_done=None, patience: float = 1.0) -> StreamCollector:
+    """
+    풀에서 키를 골라 스트리밍 호출을 시작하고 수집기를 반환 (키는 스트림이 끝날 때 반납).
+    스트림 최대 시간은 STREAM_MAX_SEC * patience. 첫 응답 전에 실패하면 예외
+    """
+    acquired_at = time.time()
+    client = gemini_pool.acquire(kind, now=acquired_at)
+    if client is None:
+        raise RuntimeError(f"쓸 수 있는 Gemini 키 없음 (쿨다운/서킷 차단, {gemini_pool.cooldown_remaining():.1f}s left)")
+    max_sec = STREAM_MAX_SEC * patience
+    try:
+        stream = await asyncio.wait_for(
+            client.models[kind].generate_content_async(prompt, stream=True), timeout=max_sec
+        )
+    except asyncio.TimeoutError:
+        gemini_pool.release(client, ok=False, kind=kind, timed_out=True, started_at=acquired_at)
+        raise
+    except asyncio.CancelledError:
+        gemini_pool.release(client, ok=False, kind=kind, aborted=True, started_at=acquired_at)
+        raise
+    except Exception as e:
+        gemini_pool.release(client, ok=False, rate_limited=_is_rate_limited_error(e), kind=kind,
+                            started_at=acquired_at)
+        raise
+
+    def finish(collector: StreamCollector) -> None:
+        if collector.complete:
+            gemini_latency.record(kind, collector.elapsed)
+            gemini_pool.release(client, ok=True, kind=kind, started_at=acquired_at)
+        elif isinstance(collector.error, asyncio.CancelledError):
+            gemini_pool.release(client, ok=False, kind=kind, aborted=True, started_at=acquired_at)
+        else:
+            timed_out = isinstance(collector.error, asyncio.TimeoutError)
+            if timed_out:
+                gemini_latency.record(kind, max_sec, timed_out=True)
+            gemini_pool.release(client, ok=False, rate_limited=not timed_out and _is_rate_limited_error(collector.error),
+                                kind=kind, timed_out=timed_out, started_at=acquired_at)
+        if on_done is not None:
+            on_done(collector)
+
+    collector = StreamCollector(stream, max_sec, on_done=finish)
+    # 마감으로 대기자가 떠나도 스트림은 끝까지 받아 캐시를 채움
+    _background_tasks.add(collector.task)
+    collector.task.add_done_callback(_background_tasks.discard)
+    return collector
+
+
+def _strip_footer(text: str) -> str:
+    """Gemini가 직접 쓴 위치/종류 표기는 떼어 냄 (로컬에서 붙이므로)"""
+    return (text or "").split("📍")[0].strip()
+
+
+async def stream_copy_with_deadline(
+    key: str, prompt: str, footer: str, log_label: str, menu: Optional[str] = None, deadline_at: Optional[float] = None
+) -> Optional[str]:
+    """
+    문구를 스트리밍으로 받아 마감(남은 예산)까지 기다림.
+    다 오면 전체, 마감이면 문장이 끝난 곳까지만 쓰고(너무 짧으면 None) 뒤에 footer를 붙임.
+    스트림은 마감 뒤에도 계속 받아 완성본을 캐시에 저장합니다.
+    """
+    def store(collector: StreamCollector) -> None:
+        text = _strip_footer(collector.text) if collector.complete else ""
+        if text:
+            _spawn_background(response_copy_cache.aput(key, f"{text}\n\n{footer}", menu=menu))
+
+    patience = gemini_patience.get()
+    remaining = remaining_budget(deadline_at)
+    ceiling = GENERATION_TIMEOUT_SEC * patience
+    wait = ceiling if remaining is None else min(ceiling, max(0.0, remaining - RESPONSE_RESERVE_SEC))
+    started = time.perf_counter()
+    try:
+        collector = await asyncio.wait_for(
+            gemini_flights.do(("stream", key, patience),
+                              lambda: _start_gemini_stream("generation", prompt, on_done=store, patience=patience)),
+            timeout=wait,
+        )
+    except (asyncio.TimeoutError, Exception) as e:
+        logger.warning(f"{log_label} stream start fail/timeout: {e}")
+        gemini_latency.record_outcome("generation", "local")
+        return None
+
+    if await collector.wait(wait - (time.perf_counter() - started)):
+        text = _strip_footer(collector.text)
+        outcome = "gemini"
+    else:
+        partial = collector.partial()
+        text = _strip_footer(partial) if partial else ""
+        if len(text) < MIN_PARTIAL_CHARS:
+            text = ""
+        outcome = "partial" if text else "local"
+        logger.info(f"⏱️ {log_label}: {wait:.2f}s 마감 -> {'완성된 문장까지 사용' if text else '로컬 문구 사용'} (스트림은 백그라운드에서 계속)")
+    gemini_latency.record_outcome("generation", outcome)
+    return f"{text}\n\n{footer}" if text else None
+
+
 def format_history(conversation_history: List[Dict], limit: int = 2) -> str:
     """대화 히스토리 포맷팅 (토큰 절약)"""
     if not conversation_history:
@@ -307,17 +751,81 @@ def contains_explain_keyword(utterance: str) -> bool:
     text = utterance.lower()
     return any(k in text for k in ["왜", "이유", "why", "어째서", "이유는"])
 
-async def analyze_intent_with_gemini(utterance: str, conversation_history: List[Dict]) -> Dict[str, Any]:
+def remaining_budget(deadline_at: Optional[float]) -> Optional[float]:
+    """요청 전체 예산 중 남은 시간(초). 마감이 없으면 None"""
+    return None if deadline_at is None else deadline_at - time.time()
+
+
+async def hedge_gemini(kind: str, gemini_call, deadline_at: Optional[float], log_label: str):
+    """
+    Gemini 호출을 적응형 마감(최근 p90 + 남은 예산)까지만 기다립니다.
+    마감 안에 결과가 오면 그 결과, 아니면 None을 돌려주고(호출 측이 로컬 결과 사용)
+    호출은 취소하지 않고 백그라운드에서 마저 끝내 캐시/응답 시간 기록을 채웁니다.
+    """
+    patience = gemini_patience.get()
+    ceiling = GEMINI_CALL_TIMEOUTS.get(kind, GENERATION_TIMEOUT_SEC) * patience
+    if patience > 1:
+        # 콜백으로 응답하는 중이면 카카오 5초 제한이 없으므로 p90과 무관하게 상한(남은 예산 안)까지 기다림
+        remaining = remaining_budget(deadline_at)
+        wait = ceiling if remaining is None else min(ceiling, max(0.0, remaining - RESPONSE_RESERVE_SEC))
+    else:
+        wait = gemini_latency.deadline(kind, ceiling, remaining_budget(deadline_at))
+    task = asyncio.ensure_future(gemini_call)
+    result = None
+    if wait > 0:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), timeout=wait)
+        except asyncio.TimeoutError:
+            result = None
+    if not task.done():
+        logger.info(f"⏱️ {log_label}: {wait:.2f}s 안에 Gemini 응답 없음 -> 로컬 결과 사용 (호출은 백그라운드에서 계속)")
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    gemini_latency.record_outcome(kind, "gemini" if result else "local")
+    return result
+
+
+async def analyze_intent_with_gemini(utterance: str, conversation_history: List[Dict], deadline_at: Optional[float] = None) -> Dict[str, Any]:
     """Gemini API를 사용하여 사용자 의도를 분석합니다. (Short Prompt + Strict Config)"""
-    if _gemini_in_cooldown():
+    cached = intent_cache.get(utterance, "gemini")
+    if cached is not None:
+        return cached
+    # 표현만 조금 다른 발화 ("점심 뭐먹지?" / "점심 뭐 먹지ㅠ")는 이전 분석 결과 재사용
+    near = near_intent_cache.lookup(utterance)
+    if near is not None:
+        reused, matched, similarity = near
+        # 의도만 재사용하고 조건(음식 종류/날씨/기분)은 이 발화에서 다시 추출 ("중식 말고 한식" ~ "한식 말고 중식")
+        result = analyze_intent_fallback(utterance)
+        result.update({name: reused.get(name) for name in REUSABLE_FIELDS if name in reused})
+        logger.info(f"♻️ Near-duplicate intent: '{utterance}' ~ '{matched}' ({similarity:.2f})")
+        if random.random() < NEAR_DUP_AUDIT_RATE:
+            _spawn_background(_audit_near_hit(utterance, conversation_history, matched, similarity, copy.deepcopy(result)))
+        return result
+    if _gemini_in_cooldown("intent"):
         return analyze_intent_fallback(utterance)
+    result = await hedge_gemini("intent", _analyze_and_remember_intent(utterance, conversation_history), deadline_at, "Intent")
+    return result if result is not None else analyze_intent_fallback(utterance)
+
+
+async def _analyze_and_remember_intent(utterance: str, conversation_history: List[Dict]) -> Optional[Dict[str, Any]]:
+    """Gemini 의도 분석 후 캐시에 저장 (실패/타임아웃이면 None)"""
     try:
-        history_text = format_history(conversation_history, limit=2)
-        
-        from datetime import datetime
-        now_str = datetime.now().strftime("%I:%M%p") # 시간 포맷 단축
+        result = await _request_gemini_intent(utterance, conversation_history)
+    except (asyncio.TimeoutError, Exception) as e:
+        if _is_rate_limited_error(e):
+            logger.warning("⚠️ Intent 분석 rate-limited; key cooling down")
+        logger.warning(f"⚠️ Intent 분석 실패/타임아웃: {e}")
+        return None
+    await _remember_gemini_intent(utterance, result)
+    return result
+
 
-        prompt = f"""의도 분석 (JSON):
+async def _request_gemini_intent(utterance: str, conversation_history: List[Dict]) -> Dict[str, Any]:
+    """Gemini 의도 분석 호출 + JSON 파싱 (실패 시 예외)"""
+    history_text = format_history(conversation_history, limit=2)
+    now_str = datetime.now().strftime("%I:%M%p") # 시간 포맷 단축
+
+    prompt = f"""의도 분석 (JSON):
 히스토리:
 {history_text}
 입력: "{utterance}" ({now_str})
@@ -332,116 +840,361 @@ async def analyze_intent_with_gemini(utterance: str, conversation_history: List[
 
 JSON만 출력:"""
 
-        # 타임아웃 짧게(응답성 우선)
-        response = await asyncio.wait_for(intent_model.generate_content_async(prompt), timeout=INTENT_TIMEOUT_SEC)
-        result_text = response.text.strip()
-        
-        # JSON 파싱 cleanup
-        if "```" in result_text:
-            result_text = result_text.replace("```json", "").replace("```", "").strip()
-            
-        import json
-        result = json.loads(result_text)
-        
-        # 키 이름 호환성 (filter -> cuisine_filters)
-        if 'filter' in result:
-            result['cuisine_filters'] = result.pop('filter')
-            
-        return result
+    # 타임아웃 짧게(응답성 우선)
+    response = await call_gemini("intent", prompt, INTENT_TIMEOUT_SEC)
+    return _parse_intent_json(response.text)
+
+
+def _parse_intent_json(text: str) -> Dict[str, Any]:
+    """Gemini JSON 응답 파싱 (코드 블록 제거, filter -> cuisine_filters). 실패 시 예외"""
+    result_text = (text or "").strip()
+    
+    # JSON 파싱 cleanup
+    if "```" in result_text:
+        result_text = result_text.replace("```json", "").replace("```", "").strip()
         
-    except (asyncio.TimeoutError, Exception) as e:
-        if _is_rate_limited_error(e):
-            _set_gemini_cooldown()
-            logger.warning("⚠️ Intent 분석 rate-limited; entering cooldown")
-        logger.warning(f"⚠️ Intent 분석 실패/타임아웃: {e}")
-        return analyze_intent_fallback(utterance)
+    import json
+    result = json.loads(result_text)
+    if not isinstance(result, dict):
+        raise ValueError(f"JSON object expected: {result_text[:50]}")
+    
+    # 키 이름 호환성 (filter -> cuisine_filters)
+    if 'filter' in result:
+        result['cuisine_filters'] = result.pop('filter')
+    return result
+
+
+# --- 의도 + 답변 한 번에 (GEMINI_COMBINED_MODE) ---
+def menu_footer(choice: Dict) -> str:
+    """추천 멘트 끝의 위치/종류 표기 (Gemini에게 맡기지 않고 로컬에서 붙임)"""
+    return f"📍 위치: {choice.get('area', '')}\n🍽️ 종류: {choice.get('category', '')}"
+
+
+def build_candidate_shortlist(ctx: RequestContext, size: int = COMBINED_SHORTLIST_SIZE) -> List[Dict]:
+    """빠른 의도(키워드) 기준으로 로컬 추천 후보를 몇 개 골라 둠 (직전 추천 메뉴는 제외)"""
+    local_intent = ctx.local_intent
+    last_rec = session_manager.get_last_recommendation(ctx.user_id)
+    excluded = [last_rec["name"]] if last_rec and "name" in last_rec else []
+    shortlist = []
+    for _ in range(size):
+        choice = r.recommend( # Use global r
+            weather=ctx.weather or local_intent.get("weather"),
+            cuisine_filters=local_intent.get("cuisine_filters"),
+            mood=local_intent.get("mood"),
+            excluded_menus=excluded,
+            tag_filters=local_intent.get("tag_filters", []),
+            meal_label=ctx.meal_label,
+            is_late_evening=ctx.is_late_evening,
+        )
+        if not choice or choice.get("name") in excluded:
+            break
+        shortlist.append(choice)
+        excluded.append(choice["name"])
+    return shortlist
+
+
+def build_combined_prompt(ctx: RequestContext, shortlist: List[Dict]) -> str:
+    history_text = format_history(ctx.conversation_history, limit=2)
+    now_str = datetime.now().strftime("%I:%M%p")
+    candidates = "\n".join(
+        f"{i}. {c['name']} ({c.get('category', '')}, {c.get('area', '')}, 특징: {', '.join(c.get('tags', []))})"
+        for i, c in enumerate(shortlist)
+    ) or "(없음)"
+    return f"""의도 분석 + 답변 (JSON):
+히스토리:
+{history_text}
+입력: "{ctx.utterance}" ({now_str})
+현재 추천 식사: {ctx.meal_label}, 날씨: {ctx.weather}
+후보 메뉴:
+{candidates}
+
+분류:
+1. intent: recommend (메뉴추천요청), explain (이유), reject (거절), accept (수락), casual (잡담/일반질문), help (도움)
+2. casual_type: greeting, thanks, chitchat (casual일때)
+3. emotion: negative, neutral, positive
+4. filter: [한식, 중식, 일식, 양식, 분식]
+5. weather: 비, 눈, 더위, 추위, 한파
+6. mood: 피곤, 행복, 우울, 화남, 다이어트, 플렉스
+7. pick: recommend/reject이면 후보 번호 하나 (없으면 null)
+8. reply:
+   - recommend/reject: 고른 메뉴 추천 멘트, 친근하게 2문장 (위치/종류 표기는 쓰지 말 것)
+   - casual: 친구처럼 공감하는 1-2문장 (이모지 사용)
+   - 그 외: ""
+
+JSON만 출력:"""
+
+
+async def analyze_and_reply_with_gemini(ctx: RequestContext, shortlist: List[Dict]) -> Optional[Dict[str, Any]]:
+    """
+    의도 JSON과 답변을 Gemini 한 번의 호출로 받음.
+    반환: {"intent_data": ..., "choice": 후보 중 고른 메뉴 또는 None, "reply": 답변} (실패/마감 초과 시 None)
+    """
+    if _gemini_in_cooldown("combined"):
+        return None
+    prompt = build_combined_prompt(ctx, shortlist)
+
+    async def request():
+        try:
+            response = await call_gemini("combined", prompt, COMBINED_TIMEOUT_SEC)
+            result = _parse_intent_json(response.text)
+        except (asyncio.TimeoutError, Exception) as e:
+            logger.warning(f"⚠️ Combined 분석 실패/타임아웃: {e}")
+            return None
+        reply = str(result.pop("reply", "") or "").strip()
+        pick = result.pop("pick", None)
+        choice = None
+        if isinstance(pick, int) and not isinstance(pick, bool) and 0 <= pick < len(shortlist):
+            choice = shortlist[pick]
+        await _remember_gemini_intent(ctx.utterance, result)
+        if choice and reply and result.get("intent") in ("recommend", "reject"):
+            key, _ = build_recommend_copy_request(ctx.utterance, choice, {**ctx.local_intent, **result}, ctx.meal_label)
+            await response_copy_cache.aput(key, f"{reply}\n\n{menu_footer(choice)}", menu=choice["name"])
+        return {"intent_data": result, "choice": choice, "reply": reply}
+
+    return await hedge_gemini("combined", request(), ctx.deadline_at, "Combined")
+
+
+async def _remember_gemini_intent(utterance: str, result: Dict[str, Any]) -> None:
+    """Gemini 의도 결과를 정확/유사 캐시에 저장하고 로컬 분류기 학습 데이터로 기록 (python intent_train.py)"""
+    intent_cache.put(utterance, "gemini", result)
+    near_intent_cache.put(utterance, result)
+    await alog_labeled_utterance(utterance, result.get("intent"), source="gemini")
+
+
+async def _audit_near_hit(utterance: str, conversation_history: List[Dict], matched: str, similarity: float, served: Dict[str, Any]) -> None:
+    """유사 캐시로 응답한 결과(의도 + 조건)가 맞았는지 백그라운드에서 실제 Gemini 결과와 비교"""
+    if _gemini_in_cooldown("intent"):
+        return
+    try:
+        result = await _request_gemini_intent(utterance, conversation_history)
+    except Exception:
+        return
+    if near_intent_cache.audit(utterance, matched, similarity, served, result):
+        logger.warning(f"⚠️ Near-duplicate false hit: '{utterance}' ~ '{matched}' "
+                       f"(mismatched: {', '.join(mismatched_fields(served, result))})")
+    # 이 발화 자체의 정확한 결과를 저장해 다음부터는 직접 사용
+    await _remember_gemini_intent(utterance, result)
+
+
+_background_tasks = set()
+
+
+def _spawn_background(coro) -> None:
+    """응답을 기다리게 하지 않는 백그라운드 작업 (완료 전 GC되지 않도록 참조 유지)"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+_copy_fills = set()
+
+
+async def generate_copy_with_cache(
+    key: str, prompt: str, log_label: str, menu: Optional[str] = None, deadline_at: Optional[float] = None,
+    footer: Optional[str] = None,
+) -> Optional[str]:
+    """
+    상황 키(response_copy_cache)로 캐시된 Gemini 문구가 있으면 바로 사용하고,
+    변형이 덜 모였으면 백그라운드에서 하나 더 생성해 둡니다.
+    없으면 Gemini를 적응형 마감까지만 기다리고(hedge_gemini), 늦게 온 결과도 캐시에 저장합니다.
+    footer(위치/종류)가 있는 문구는 GEMINI_STREAMING이면 스트리밍으로 받아 마감 시 완성된 문장까지 사용합니다.
+    """
+    cached = await response_copy_cache.aget(key)
+    if cached is not None:
+        if key not in _copy_fills and response_copy_cache.needs_variants(key):
+            _copy_fills.add(key)
+            _spawn_background(_fill_copy_variant(key, prompt, log_label, menu))
+        return cached
+    if GEMINI_STREAMING and footer is not None:
+        return await stream_copy_with_deadline(key, prompt, footer, log_label, menu=menu, deadline_at=deadline_at)
+    return await hedge_gemini("generation", _generate_copy(key, prompt, log_label, menu), deadline_at, log_label)
+
+
+async def _generate_copy(key: str, prompt: str, log_label: str, menu: Optional[str]) -> Optional[str]:
+    # 프롬프트에는 사용자 발화가 들어가지만 같은 상황 키의 문구는 서로 바꿔 써도 되므로 상황 키로 합침
+    response_text = await run_gemini_with_timeout(prompt, GENERATION_TIMEOUT_SEC, log_label, flight_key=("copy", key))
+    if response_text:
+        await response_copy_cache.aput(key, response_text, menu=menu)
+    return response_text
+
+
+async def _fill_copy_variant(key: str, prompt: str, log_label: str, menu: Optional[str]) -> None:
+    try:
+        if _gemini_in_cooldown("generation"):
+            return
+        response_text = await run_gemini_with_timeout(prompt, GENERATION_TIMEOUT_SEC, f"{log_label} (variant)")
+        if response_text:
+            await response_copy_cache.aput(key, response_text, menu=menu)
+    finally:
+        _copy_fills.discard(key)
+
+
+# --- 문구 사전 생성 (한가한 시간에 남는 쿼터로 문구 풀 채우기) ---
+PREGEN_ENABLED = os.getenv("COPY_PREGEN", "1").lower() not in ("0", "false", "no", "n")
+PREGEN_INTERVAL_SEC = 20.0      # 사전 생성 호출 간격 (시간당 최대 180회)
+PREGEN_IDLE_SEC = 120.0         # 마지막 요청 후 이만큼 조용해야 생성
+PREGEN_PEAK_WINDOWS = [((11, 0), (13, 0)), ((17, 30), (19, 0))]   # 이 시간대에는 쿼터를 실제 요청에 양보
+PREGEN_MEAL_LABELS = ["점심", "저녁"]
+PREGEN_CASUAL_UTTERANCES = [("greeting", "안녕"), ("greeting", "안녕하세요"), ("thanks", "고마워"), ("thanks", "감사합니다")]
+
+last_request_at = 0.0
+pregen_stats = {"generated": 0, "failed": 0, "rounds": 0, "last_generated_at": None}
+
+
+def is_peak_time(now: Optional[datetime] = None) -> bool:
+    current = now or datetime.now()
+    minutes = current.hour * 60 + current.minute
+    return any(sh * 60 + sm <= minutes < eh * 60 + em for (sh, sm), (eh, em) in PREGEN_PEAK_WINDOWS)
+
+
+def can_pregenerate(now: Optional[datetime] = None) -> bool:
+    """사전 생성 가능 여부: Gemini 사용 가능 + 쿨다운 아님 + 피크 시간 아님 + 최근 요청 없음"""
+    return (
+        PREGEN_ENABLED
+        and GEMINI_AVAILABLE
+        and not _gemini_in_cooldown("generation")
+        and not is_peak_time(now)
+        and time.time() - last_request_at >= PREGEN_IDLE_SEC
+    )
+
+
+def build_pregen_targets():
+    """메뉴 x 자주 나오는 상황별 (캐시 키, 프롬프트, 로그 라벨, 메뉴 이름) 목록"""
+    weather_by_meal = {meal: get_meal_weather(meal) for meal in PREGEN_MEAL_LABELS}
+    neutral = {"intent": "recommend", "emotion": "neutral"}
+    targets = []
+    for menu in r.menus:
+        if not menu.get("name"):
+            continue
+        for meal_label in PREGEN_MEAL_LABELS:
+            key, prompt = build_recommend_copy_request(f"{meal_label} 추천", menu, neutral, meal_label)
+            targets.append((key, prompt, "Pregen recommend", menu["name"]))
+        for weather in sorted({w for w in weather_by_meal.values() if w}):
+            key, prompt = build_explanation_copy_request("왜 이거 추천했어?", menu, weather=weather)
+            targets.append((key, prompt, "Pregen explanation", menu["name"]))
+    for meal_label in PREGEN_MEAL_LABELS:
+        for casual_type, utterance in PREGEN_CASUAL_UTTERANCES:
+            key, prompt = build_casual_copy_request(utterance, casual_type, [], meal_label)
+            targets.append((key, prompt, "Pregen casual", None))
+    return targets
+
+
+def next_pregen_target(targets):
+    """변형이 가장 적은 대상부터 (전부 가득 찼으면 None)"""
+    best, best_count = None, response_copy_cache.max_variants
+    for target in targets:
+        count = response_copy_cache.stored_count(target[0])
+        if count < best_count:
+            best, best_count = target, count
+            if count == 0:
+                break
+    return best
+
+
+async def pregenerate_copy_once(targets) -> bool:
+    """사전 생성 한 건. 생성했으면 True"""
+    # 대상마다 SQLite에서 변형 수를 세므로 스레드에서
+    target = await asyncio.to_thread(next_pregen_target, targets)
+    if target is None:
+        return False
+    key, prompt, log_label, menu = target
+    response_text = await run_gemini_with_timeout(prompt, GENERATION_TIMEOUT_SEC, log_label)
+    if not response_text:
+        pregen_stats["failed"] += 1
+        return False
+    await response_copy_cache.aput(key, response_text, menu=menu)
+    pregen_stats["generated"] += 1
+    pregen_stats["last_generated_at"] = datetime.now().isoformat(timespec="seconds")
+    return True
+
+
+async def copy_pregen_loop() -> None:
+    """한가한 시간에 문구 풀을 채워 피크 시간에는 Gemini 호출 없이 응답"""
+    targets = []
+    while True:
+        await asyncio.sleep(PREGEN_INTERVAL_SEC)
+        if not can_pregenerate():
+            continue
+        try:
+            if not targets:
+                targets = await asyncio.to_thread(build_pregen_targets)
+                pregen_stats["rounds"] += 1
+            if not await pregenerate_copy_once(targets):
+                targets = []   # 전부 채웠거나 실패 -> 다음 주기에 목록(메뉴/날씨) 새로 구성
+        except Exception as e:
+            logger.warning(f"📝 문구 사전 생성 오류: {e}")
+            targets = []
+
+
+async def pooled_copy(key: str) -> Optional[str]:
+    """Gemini를 호출하지 않는 경로에서도 미리 만들어 둔 문구가 있으면 사용"""
+    return await response_copy_cache.aget(key)
 
 
 def analyze_intent_fallback(utterance: str) -> Dict[str, Any]:
     """
     키워드 매칭으로 사용자 의도를 분석합니다 (Fallback).
+    바로가기 버튼 문구는 고정 표에서, 최근에 분석한 발화는 캐시에서 바로 꺼냅니다.
+    """
+    key = normalize_utterance(utterance)
+    dispatched = QUICK_REPLY_INTENTS.get(key)
+    if dispatched is not None:
+        intent_cache.record_hit("dispatch")
+        return copy.deepcopy(dispatched)
+    cached = intent_cache.get(key, "local")
+    if cached is not None:
+        return cached
+    result = _analyze_intent_keywords(key)
+    intent_cache.put(key, "local", result)
+    return result
+
+
+def _analyze_intent_keywords(utterance_lower: str) -> Dict[str, Any]:
+    """
+    모든 키워드 사전을 묶은 오토마톤(INTENT_MATCHER)으로 발화를 한 번만 훑고, 그 결과에서 각 항목을 판단합니다.
     """
-    utterance_lower = utterance.lower()
+    hits = INTENT_MATCHER.find_all(utterance_lower)
+    # 정확히 일치하지 않은 구간은 자모 퍼지 색인으로 띄어쓰기/오타 변형 보완 ("배 고파", "스트레쓰")
+    hits += INTENT_FUZZY_INDEX.find_all(utterance_lower, exclude=hits)
+    found = hit_labels(hits)
+    intent_words = found.get("intent", set())
     
     # 의도 분석
     intent = "casual"  # 기본값 변경: recommend -> casual (아무 말이나 하면 잡담으로 처리)
     casual_type = "chitchat"
     
-    # 일상 대화 패턴 (명확한 인사/감사 등)
-    if any(word in utterance_lower for word in ["안녕", "안녕하세요", "하이", "ㅎㅇ", "hello", "hi", "헬로", "헬로우", "반가", "반가워", "여보세요", "누구", "넌누구", "이름이", "봇이름"]):
-        intent = "casual"
-        casual_type = "greeting"
-    elif any(word in utterance_lower for word in ["고마", "감사", "thanks", "thank", "ㅇㅋ", "알았어", "ㄱㅅ", "ㄳ"]):
-        intent = "casual"
-        casual_type = "thanks"
-    elif any(word in utterance_lower for word in ["왜", "이유", "why", "어째서", "이유는", "설명해", "왜죠"]):
+    # 우선순위: 인사 > 감사 > 설명 > 거절 > 추천 > 짧은 긍정 > 도움말 > 긍정 피드백
+    matched = first_label(INTENT_KEYWORDS, intent_words)
+    if matched == "explain":
         # [CRITICAL] 설명 요청은 최우선순위로 처리하고 즉시 반환 (오버라이드 방지)
         return {"intent": "explain", "casual_type": None, "emotion": "neutral", "cuisine_filters": [], "weather": None, "mood": None, "tag_filters": []}
-    elif any(word in utterance_lower for word in ["싫", "별로", "다른", "아니", "no", "패스", "바꿔", "말고", "담에", "나중에"]):
-        intent = "reject"
-    # recommend (명확한 키워드가 있을 때만 추천)
-    elif any(word in utterance_lower for word in ["추천", "메뉴", "밥", "식사", "배고파", "뭐먹지", "골라줘", "아무거나", "랜덤", "알아서", "해봐", "해", "고", "배곱", "출출", "허기"]):
-        intent = "recommend"
-    # accept (짧은 긍정)
-    elif any(word in utterance_lower for word in ["응", "ㅇㅇ", "ㅇㅋ", "좋아", "콜", "고고"]):
-        intent = "accept"
-    # help (도움말)
-    elif any(word in utterance_lower for word in ["도움", "사용법", "설명", "help", "어떻게", "기능"]):
-        intent = "help"
-    # 긍정 피드백 패턴
-    elif any(word in utterance_lower for word in ["좋", "맛있", "거기", "그거", "먹을", "ok", "yes", "굿"]):
+    if matched in ("greeting", "thanks"):
+        casual_type = matched
+    elif matched in ("accept_short", "accept_feedback"):
         intent = "accept"
+    elif matched:
+        intent = matched
     
     # 질문형 어미 체크 (보강)
     if any(utterance_lower.endswith(ending) for ending in ["?", "냐", "까", "니", "요", "죠", "가", "나"]):
         # 추천 키워드가 없으면 잡담 유지
-        if intent == "recommend" and not any(word in utterance_lower for word in ["추천", "메뉴", "점심", "밥"]):
+        if intent == "recommend" and "core" not in found.get("recommend", set()):
              intent = "casual"
              casual_type = "chitchat"
     
     # 감정 분석
-    emotion = "neutral"
-    if any(word in utterance_lower for word in ["좆같", "짜증", "열받", "화나", "힘들", "우울"]):
-        emotion = "negative"
-    elif any(word in utterance_lower for word in ["행복", "좋", "신나", "즐거"]):
-        emotion = "positive"
+    emotion = first_label(EMOTION_KEYWORDS, found.get("emotion", set())) or "neutral"
     
     # 음식 종류 추출
-    cuisine_filters = []
-    for cuisine, keywords in CUISINE_KEYWORDS.items():
-        if any(keyword in utterance_lower for keyword in keywords):
-            cuisine_filters.append(cuisine)
+    cuisine_filters = [c for c in CUISINE_KEYWORDS if c in found.get("cuisine", set())]
             
     # [NEW] 음식 태그 추출 (국물, 면, 고기 등) -> search_filters로 활용
-    # CUISINE_KEYWORDS에 없는 '특징' 기반 키워드
-    tag_keywords_map = {
-        "soup": ["국물", "찌개", "탕", "전골", "국밥"],
-        "noodle": ["면", "국수", "우동", "라면", "짬뽕", "짜장", "파스타", "소바"],
-        "meat": ["고기", "육류", "돈까스", "스테이크", "갈비", "불고기", "제육"],
-        "rice": ["밥", "덮밥", "볶음밥", "비빔밥", "리조또"],
-        "spicy": ["매운", "빨간", "얼큰", "칼칼"],
-        "light": ["가벼운", "샐러드", "샌드위치", "다이어트"],
-        "heavy": ["든든", "푸짐", "해장"]
-    }
-    
-    tag_filters = []
-    for tag, keywords in tag_keywords_map.items():
-        if any(keyword in utterance_lower for keyword in keywords):
-            tag_filters.append(tag)
+    tag_filters = [t for t in TAG_KEYWORDS if t in found.get("tag", set())]
             
-    # 날씨 추출
-    weather = None
-    for weather_type, keywords in WEATHER_KEYWORDS.items():
-        if any(keyword in utterance_lower for keyword in keywords):
-            weather = weather_type
-            break
-    
-    # 기분 추출
-    mood = None
-    for mood_type, keywords in MOOD_KEYWORDS.items():
-        if any(keyword in utterance_lower for keyword in keywords):
-            mood = mood_type
-            break
+    # 날씨 / 기분 추출 (사전 순서상 처음 발견된 것)
+    weather = first_label(WEATHER_KEYWORDS, found.get("weather", set()))
+    mood = first_label(MOOD_KEYWORDS, found.get("mood", set()))
+
     # [NEW] 음식 키워드, 기분, 날씨 중 하나라도 발견되면 추천 Intent로 유도
     if (cuisine_filters or tag_filters or mood or weather) and intent == "casual":
         intent = "recommend"
@@ -457,6 +1210,16 @@ def analyze_intent_fallback(utterance: str) -> Dict[str, Any]:
     }
 
 
+# 바로가기 버튼 / 자주 쓰는 문구 -> 미리 분석해 둔 의도 (정확히 일치할 때만 사용)
+QUICK_REPLY_UTTERANCES = [
+    "랜덤 추천해줘", "날씨에 맞게 추천해줘", "도움말",
+    "점심 추천", "점심 추천해줘", "저녁 추천", "저녁 추천해줘", "아침 추천", "메뉴 추천", "추천해줘",
+]
+QUICK_REPLY_INTENTS = {
+    normalize_utterance(u): _analyze_intent_keywords(normalize_utterance(u)) for u in QUICK_REPLY_UTTERANCES
+}
+
+
 def generate_explanation_fallback(rec: Dict, weather: Optional[str] = None, mood: Optional[str] = None) -> str:
     """
     메뉴 추천 이유를 로컬에서 생성 (Fallback)
@@ -522,8 +1285,20 @@ async def generate_casual_response_with_gemini(
     conversation_history: List[Dict],
     user_id: str = "Master",
     meal_label: str = "점심",
+    deadline_at: Optional[float] = None,
 ) -> str:
     """일상 대화 응답 (Short Prompt)"""
+    key, prompt = build_casual_copy_request(utterance, casual_type, conversation_history, meal_label)
+    response_text = await generate_copy_with_cache(key, prompt, "Casual response", deadline_at=deadline_at)
+    if response_text:
+        return response_text
+    return generate_casual_response_fallback(casual_type, user_id, meal_label=meal_label)
+
+
+def build_casual_copy_request(
+    utterance: str, casual_type: str, conversation_history: List[Dict], meal_label: str = "점심"
+):
+    """일상 대화 문구의 (캐시 키, 프롬프트)"""
     history_text = format_history(conversation_history)
     
     prompt = f"""친근한 챗봇 응답:
@@ -540,13 +1315,7 @@ async def generate_casual_response_with_gemini(
 5. 1-2문장으로 짧게
 
 응답:"""
-    
-    response_text = await run_gemini_with_timeout(
-        gemini_model, prompt, GENERATION_TIMEOUT_SEC, "Casual response"
-    )
-    if response_text:
-        return response_text
-    return generate_casual_response_fallback(casual_type, user_id, meal_label=meal_label)
+    return copy_key("casual", casual_type=casual_type, meal_label=meal_label, utterance=normalize_utterance(utterance)), prompt
 
 
 def generate_casual_response_fallback(casual_type: str, user_id: str = "Master", meal_label: str = "점심") -> str:
@@ -649,9 +1418,19 @@ def build_emotion_prefix(intent_data: Dict, choice: Optional[Dict] = None, short
     return selected_prefix + "\n"
 
 
-async def generate_explanation_with_gemini(utterance: str, last_recommendation: Dict, conversation_history: List[Dict], weather: Optional[str] = None, mood: Optional[str] = None) -> str:
+async def generate_explanation_with_gemini(utterance: str, last_recommendation: Dict, conversation_history: List[Dict], weather: Optional[str] = None, mood: Optional[str] = None, deadline_at: Optional[float] = None) -> str:
     """추천 이유 설명 (Short Prompt)"""
-    rec = last_recommendation
+    key, prompt = build_explanation_copy_request(utterance, last_recommendation, weather, mood)
+    response_text = await generate_copy_with_cache(
+        key, prompt, "Explanation", menu=last_recommendation['name'], deadline_at=deadline_at
+    )
+    if response_text:
+        return response_text
+    return generate_explanation_fallback(last_recommendation, weather, mood)
+
+
+def build_explanation_copy_request(utterance: str, rec: Dict, weather: Optional[str] = None, mood: Optional[str] = None):
+    """추천 이유 설명 문구의 (캐시 키, 프롬프트)"""
     info = f"{rec['name']}({rec.get('category')}), {rec.get('area')}, 특징:{','.join(rec.get('tags',[]))}"
     context = f"날씨:{weather}, 기분:{mood}" if weather or mood else ""
     
@@ -667,13 +1446,12 @@ async def generate_explanation_with_gemini(utterance: str, last_recommendation:
 4. 친근한 말투, 이모지
 
 응답:"""
-    
-    response_text = await run_gemini_with_timeout(
-        gemini_model, prompt, GENERATION_TIMEOUT_SEC, "Explanation"
+    key = copy_key(
+        "explain", menu=rec['name'], category=rec.get('category'), area=rec.get('area'),
+        tags=rec.get('tags', []), weather=weather, mood=mood,
     )
-    if response_text:
-        return response_text
-    return generate_explanation_fallback(last_recommendation, weather, mood)
+    return key, prompt
+
 
 async def generate_response_with_gemini(
     utterance: str,
@@ -681,12 +1459,25 @@ async def generate_response_with_gemini(
     intent_data: Dict,
     conversation_history: List[Dict],
     meal_label: str = "점심",
+    deadline_at: Optional[float] = None,
 ) -> str:
     """추천 멘트 생성 (Short Prompt)"""
     # Cooldown 체크 - Rate limit 중이면 즉시 fallback
-    if _gemini_in_cooldown():
+    if _gemini_in_cooldown("generation"):
         return generate_response_message(choice, intent_data, meal_label=meal_label)
-    
+
+    key, prompt = build_recommend_copy_request(utterance, choice, intent_data, meal_label)
+    prefix = build_emotion_prefix(intent_data, choice, short_mode=True)
+    response_text = await generate_copy_with_cache(
+        key, prompt, "Recommend response", menu=choice['name'], deadline_at=deadline_at, footer=menu_footer(choice)
+    )
+    if response_text:
+        return prefix + response_text
+    return generate_response_message(choice, intent_data)
+
+
+def build_recommend_copy_request(utterance: str, choice: Dict, intent_data: Dict, meal_label: str = "점심"):
+    """추천 멘트 문구의 (캐시 키, 프롬프트). 감정 머리말은 캐시에 넣지 않고 매번 붙임"""
     name = choice['name']
     category = choice.get('category', '')
     area = choice.get('area', '')
@@ -695,7 +1486,6 @@ async def generate_response_with_gemini(
     context = f"상황: {intent_data.get('weather')}, {intent_data.get('mood')}, {intent_data.get('cuisine_filters')}"
     emotion = intent_data.get('emotion', 'neutral')
     tone = "위로하는 톤" if emotion == "negative" else "밝은 톤"
-    prefix = build_emotion_prefix(intent_data, choice, short_mode=True)
     
     prompt = f"""{meal_label} 추천 멘트 작성 ({tone}):
 사용자: "{utterance}"
@@ -715,12 +1505,12 @@ async def generate_response_with_gemini(
 📍 위치: {area}
 🍽️ 종류: {category}"""
 
-    response_text = await run_gemini_with_timeout(
-        gemini_model, prompt, GENERATION_TIMEOUT_SEC, "Recommend response"
+    key = copy_key(
+        "recommend", menu=name, category=category, area=area, tags=tags,
+        mood=intent_data.get('mood'), weather=intent_data.get('weather'),
+        cuisine_filters=intent_data.get('cuisine_filters'), meal_label=meal_label, tone=tone,
     )
-    if response_text:
-        return prefix + response_text
-    return generate_response_message(choice, intent_data)
+    return key, prompt
 
 
 def generate_response_message(choice: dict, intent_data: Dict, meal_label: str = "점심") -> str:
@@ -863,18 +1653,25 @@ async def recommend_lunch(payload: SkillPayload):
     """
     KakaoTalk Skill Endpoint for Lunch Recommendation (Reliability Wrapped)
     """
+    global last_request_at
     total_start = time.time()
+    last_request_at = total_start
 
     # 1. 사용자 ID 및 기초 정보 추출 (타임아웃 영향 최소화)
     user_id = payload.userRequest.user.id if payload.userRequest.user else "anonymous"
     utterance = payload.userRequest.utterance or ""
 
-    # [긴급 타이브레이커] 4.3초 내에 응답을 못 하면 강제 종료하고 안전 응답 반환
+    # 콜백이 켜진 블록이면 느린 응답(Gemini)은 callbackUrl로 나중에 전송
+    callback_url = payload.userRequest.callbackUrl
+    if callback_url and KAKAO_CALLBACK_ENABLED and GEMINI_AVAILABLE:
+        return await respond_with_callback(user_id, utterance, payload, total_start, callback_url)
+
+    # [긴급 타이브레이커] GLOBAL_TIMEOUT_SEC(4.3초) 내에 응답을 못 하면 강제 종료하고 안전 응답 반환
     try:
         start_handle = time.time()
         response = await asyncio.wait_for(
             handle_recommendation_logic(user_id, utterance, payload, total_start),
-            timeout=4.3,
+            timeout=GLOBAL_TIMEOUT_SEC,
         )
         duration = time.time() - start_handle
         logger.info(f"⏱️ Request handled in {duration:.2f}s")
@@ -892,75 +1689,158 @@ async def recommend_lunch(payload: SkillPayload):
         return get_emergency_fallback_response(str(e), utterance=utterance, user_id=user_id)
 
 
+async def respond_with_callback(
+    user_id: str, utterance: str, payload: SkillPayload, start_time: float, callback_url: str
+) -> Dict:
+    """
+    콜백 응답: CALLBACK_ACK_SEC 안에 끝나면 바로 응답, 아니면 useCallback으로 먼저 답하고
+    최종 응답(또는 실패 시 안전 응답)은 kakao_callbacks 워커가 callbackUrl로 전송.
+    전송 대기열이 가득 차면 기존처럼 GLOBAL_TIMEOUT_SEC까지만 기다림
+    """
+    task = asyncio.ensure_future(_handle_with_patience(user_id, utterance, payload, start_time))
+    await asyncio.wait({task}, timeout=CALLBACK_ACK_SEC)
+
+    def fallback() -> Dict:
+        return get_emergency_fallback_response("callback_timeout", utterance=utterance, user_id=user_id,
+                                               weather=weather_cache.get("mapped_weather"))
+
+    if task.done():
+        try:
+            return task.result()
+        except Exception as e:
+            logger.exception(f"🚨 Unhandled Error: {e}")
+            return get_emergency_fallback_response(str(e), utterance=utterance, user_id=user_id)
+    if kakao_callbacks.submit(callback_url, task, fallback, received_at=start_time):
+        logger.info(f"📨 Callback: {time.time() - start_time:.2f}s 안에 못 끝나 useCallback 응답 후 callbackUrl로 전송 예정")
+        return callback_ack_response(CALLBACK_ACK_TEXT)
+    logger.warning("⚠️ Callback queue full -> 일반 응답으로 처리")
+    try:
+        return await asyncio.wait_for(task, timeout=max(0.0, start_time + GLOBAL_TIMEOUT_SEC - time.time()))
+    except asyncio.TimeoutError:
+        return fallback()
+    except Exception as e:
+        logger.exception(f"🚨 Unhandled Error: {e}")
+        return get_emergency_fallback_response(str(e), utterance=utterance, user_id=user_id)
+
+
+async def _handle_with_patience(user_id: str, utterance: str, payload: SkillPayload, start_time: float) -> Dict:
+    # 태스크마다 컨텍스트가 복사되므로 이 요청의 Gemini 호출만 오래 기다림
+    gemini_patience.set(CALLBACK_PATIENCE)
+    return await handle_recommendation_logic(user_id, utterance, payload, start_time, budget_sec=CALLBACK_BUDGET_SEC)
+
+
 async def handle_recommendation_logic(
-    user_id: str, utterance: str, payload: SkillPayload, start_time: float
+    user_id: str, utterance: str, payload: SkillPayload, start_time: float, budget_sec: float = GLOBAL_TIMEOUT_SEC
 ):
-    """메인 추천 로직 핸들러 (입력 분석 -> 필터링 -> 선택 -> 응답 생성)"""
-    total_start = start_time
-    
-    # [ULTRA FAST TRACK] 0. 로컬 의도 분석 최우선 실행
-    # 날씨, 세션, 레이트 리밋 등 무거운 작업 전에 먼저 판단합니다.
-    fast_intent = analyze_intent_fallback(utterance)
-    
-    # [Defensive] "왜"/"이유"는 무조건 설명으로 고정 (Help 오인식 방지)
-    if "왜" in utterance or "이유" in utterance:
-        fast_intent["intent"] = "explain"
-        
-    is_help_request = fast_intent.get("intent") == "help"
-    is_welcome_event = not utterance.strip() or utterance in ["웰컴", "welcome", "시작"]
-    is_short_casual = len(utterance.strip()) <= 2
-    has_random_keyword = any(k in utterance for k in ["랜덤", "랜덤추천", "랜덤 추천"])
+    """
+    메인 추천 로직 핸들러
+    normalize -> fast_intent -> gate -> enrich -> decide -> render 순서로 한 번씩만 처리하고 단계별 시간을 기록합니다.
+    budget_sec: 요청 전체 예산 (콜백으로 응답할 때는 카카오 5초 제한 대신 CALLBACK_BUDGET_SEC)
+    """
+    timings = StageTimings()
+    try:
+        with timings.stage("normalize"):
+            ctx = normalize_request(user_id, utterance, deadline_at=(start_time or time.time()) + budget_sec)
+        with timings.stage("fast_intent"):
+            ctx = detect_fast_intent(ctx)
+        with timings.stage("gate"):
+            early_response = gate_request(ctx)
+        if early_response is not None:
+            return early_response
+        with timings.stage("enrich"):
+            ctx = enrich_request(ctx)
+        with timings.stage("decide"):
+            ctx, early_response = await decide_request(ctx)
+        if early_response is not None:
+            return early_response
+        with timings.stage("render"):
+            return await render_response(ctx)
+    finally:
+        pipeline_stats.record(timings)
+        logger.info(f"⏱️ Stages ({timings.total_ms():.1f}ms): {timings.summary()}")
+
+
+# 이스터에그 (공백 제거 후 비교)
+EASTER_EGG_KEYWORDS = [
+    "김형석",
+    "만든사람",
+    "만든 사람",
+    "누가만듬",
+    "개발자",
+    "제작자",
+    "누가만들",
+    "누가했",
+    "누구작품",
+    "창조주",
+    "주인장",
+]
+
+
+def normalize_request(user_id: str, utterance: str, deadline_at: Optional[float] = None) -> RequestContext:
+    """[normalize] 발화 변형(strip/공백 제거/소문자)과 시간 맥락을 한 번만 계산"""
+    text = utterance.strip()
     time_ctx = get_time_context(utterance)
     current_meal_label = time_ctx["current_label"] or "점심"
     requested_meal_label = time_ctx["requested_label"]
-    is_late_evening = bool(time_ctx["is_late_evening"])
     meal_label = requested_meal_label or current_meal_label
-    mismatch_notice = (
-        f"지금은 {current_meal_label} 시간인데, {meal_label}으로 추천해드릴까요? 😊"
-        if requested_meal_label and requested_meal_label != current_meal_label
-        else ""
+    return RequestContext(
+        user_id=user_id,
+        utterance=utterance,
+        text=text,
+        compact=utterance.replace(" ", ""),
+        lower=utterance.lower(),
+        is_welcome=not text or utterance in ["웰컴", "welcome", "시작"],
+        is_short=len(text) <= 2,
+        has_random_keyword=any(k in utterance for k in ["랜덤", "랜덤추천", "랜덤 추천"]),
+        is_question=any(text.endswith(m) for m in ["?", "냐", "까", "니", "요", "죠"]),
+        wants_explain=contains_explain_keyword(utterance),
+        current_meal_label=current_meal_label,
+        requested_meal_label=requested_meal_label,
+        meal_label=meal_label,
+        is_late_evening=bool(time_ctx["is_late_evening"]),
+        mismatch_notice=(
+            f"지금은 {current_meal_label} 시간인데, {meal_label}으로 추천해드릴까요? 😊"
+            if requested_meal_label and requested_meal_label != current_meal_label
+            else ""
+        ),
+        deadline_at=deadline_at,
     )
-    recommended_in_response = False
-    
-    # 0.1 웰컴/도움말/단답형 즉시 반환 (0.01초 내 응답 목표)
-    if is_welcome_event:
+
+
+def detect_fast_intent(ctx: RequestContext) -> RequestContext:
+    """[fast_intent] 로컬 키워드 의도 분석 (요청당 한 번)"""
+    local_intent = analyze_intent_fallback(ctx.utterance)
+    fast_intent = dict(local_intent)
+    # [Defensive] "왜"/"이유"는 무조건 설명으로 고정 (Help 오인식 방지)
+    if "왜" in ctx.utterance or "이유" in ctx.utterance:
+        fast_intent["intent"] = "explain"
+    return ctx.with_(local_intent=local_intent, fast_intent=fast_intent)
+
+
+def gate_request(ctx: RequestContext) -> Optional[Dict]:
+    """[gate] 날씨/세션/Gemini 없이 바로 답할 수 있는 요청과 레이트 리밋 처리 (통과하면 None)"""
+    user_id, utterance, meal_label = ctx.user_id, ctx.utterance, ctx.meal_label
+
+    # 웰컴/도움말/단답형 즉시 반환 (0.01초 내 응답 목표)
+    if ctx.is_welcome:
         logger.info("⚡ Ultra Fast Track: Welcome Event")
-        # generate_casual_response_fallback는 동기 함수이므로 await 제거
         return get_final_kakao_response(
             generate_casual_response_fallback("greeting", user_id, meal_label=meal_label)
         )
-    elif is_help_request:
+    if ctx.fast_intent.get("intent") == "help":
         logger.info("⚡ Ultra Fast Track: Help Request")
         return get_help_response()
-    elif is_short_casual and fast_intent.get("intent") != "explain" and not has_random_keyword:
+    if ctx.is_short and ctx.fast_intent.get("intent") != "explain" and not ctx.has_random_keyword:
         logger.info(f"⚡ Ultra Fast Track: Short Casual ({utterance})")
         return get_final_kakao_response(
             generate_casual_response_fallback("chitchat", user_id, meal_label=meal_label)
         )
 
-    # 1. 태아웃 방지용 기록 및 이스터에그
     logger.info(f"[Request Processing] '{utterance}' | user={user_id}")
-    
-    # 이스터에그
-    easter_egg_keywords = [
-        "김형석",
-        "만든사람",
-        "만든 사람",
-        "누가만듬",
-        "개발자",
-        "제작자",
-        "누가만들",
-        "누가했",
-        "누구작품",
-        "창조주",
-        "주인장",
-    ]
-
-    if any(keyword in utterance.replace(" ", "") for keyword in easter_egg_keywords):
-        import random
 
+    # 이스터에그
+    if any(keyword in ctx.compact for keyword in EASTER_EGG_KEYWORDS):
         praise_messages = [
-            # ... (찬양 문구 생략/유지) ...
             "🌟 **시스템 경보: 위대한 창조주 감지!** 🌟\n\n앗! 당신은... 이 세상 모든 코드를 지배하고,\n점심 메뉴의 진리를 깨우치신 **김형석님**?! 🙇‍♂️",
             "🕶️ **Top Secret Information**\n\nCode Name: **K.H.S (김형석)**\nRole: The Architect of Lunch (점심의 설계자)",
             "🥘 **푸드 마스터 김형석**\n\n이 봇을 누가 만들었냐고요?\n바로 **김형석**님입니다! (박수 짝짝짝 👏)",
@@ -969,31 +1849,9 @@ async def handle_recommendation_logic(
 
     # [관리자 기능] 가게목록 조회 - "가게목록" 또는 "지존마스터 가게목록" 명령어
     if "가게목록" in utterance or "가게 목록" in utterance:
-        try:
-            logger.info(f"🏪 Admin: Restaurant List Requested - utterance='{utterance}'")
-            import lunch_data
+        return get_store_list_response(utterance)
 
-            menus_by_area = lunch_data.get_menus_by_area()
-            total_count = sum(len(menus) for menus in menus_by_area.values())
-            logger.info(f"📊 총 {total_count}개의 가게를 로드했습니다.")
-
-            list_text = f"📋 **식당 목록** (총 {total_count}개)\n\n"
-
-            for area in sorted(menus_by_area.keys()):
-                menus = menus_by_area[area]
-                list_text += f"🏢 **{area}**\n"
-                for idx, menu in enumerate(menus, 1):
-                    category = menu.get('category', '기타')
-                    list_text += f"{idx}. {menu['name']} ({category})\n"
-                list_text += "\n"
-
-            logger.info("✅ 가게목록 전송 완료")
-            return get_final_kakao_response(list_text.strip())
-        except Exception as e:
-            logger.exception(f"🏪 Admin: Restaurant List Query Failed - Full traceback and error details")
-            return get_final_kakao_response("❌ 오류가 발생했습니다. 관리자에게 문의하세요.")
-
-    # 2. Rate Limiting
+    # Rate Limiting
     is_allowed, deny_reason = rate_limiter.is_allowed(user_id)
     if not is_allowed:
         return {
@@ -1001,224 +1859,264 @@ async def handle_recommendation_logic(
             "template": {"outputs": [{"simpleText": {"text": f"⚠️ {deny_reason}"}}]},
         }
 
-    # 3. 세션 및 날씨 정보 (병렬 시작)
-    session = session_manager.get_session(user_id)
-    conversation_history = session_manager.get_conversation_history(user_id)
-
-    # [병렬화] 날씨 정보를 미리 가져오기 시작 (메인 로직과 겹치지 않게 비동기 처리)
-    async def get_weather_task():
-        now = datetime.now()
-        if weather_cache["last_updated"] and (now - weather_cache["last_updated"]) < timedelta(minutes=10):
-             return weather_cache["mapped_weather"]
-        try:
-            # 글로벌 객체 r을 활용하거나 별도 처리 (여기서는 독립적으로 날씨만 가져옴)
-            # r.get_weather는 내부적으로 requests를 사용하므로 thread에서 별도로 수행
-            # 여기서 타임아웃을 너무 짧게 잡으면 항상 실패하므로 내부 requests timeout에 맡깁니다.
-            cond, temp = await asyncio.to_thread(r.get_weather)
-            
-            actual_weather = None
-            if cond:
-                weather_mapping = {
-                    "비": "비", "rain": "비", "rainy": "비",
-                    "눈": "눈", "snow": "눈", "snowy": "눈",
-                    "맑음": "맑음", "clear": "맑음", "sunny": "맑음",
-                    "흐림": "흐림", "cloudy": "흐림", "overcast": "흐림",
-                    "더움": "더위", "hot": "더위"
-                }
-                c_lower = cond.lower()
-                for k, v in weather_mapping.items():
-                    if k in c_lower:
-                        actual_weather = v
-                        break
-            
-            if not actual_weather and temp:
-                try:
-                    t_val = float(temp.replace("°C", "").replace("℃", "").strip())
-                    if t_val < 0: actual_weather = "한파"
-                    elif t_val < 10: actual_weather = "추위"
-                    elif t_val > 28: actual_weather = "더위"
-                except: pass
-            
-            weather_cache.update({
-                "condition": cond, "temp": temp, 
-                "mapped_weather": actual_weather, "last_updated": now
-            })
-            return actual_weather
-        except:
-            return None
-
-    weather_future = asyncio.create_task(get_weather_task())
-    
-    # 4. 의도 분석 (Hybrid)
-    # (이미 위에서 초반 0. 로컬 분석이 수행되었으므로, 필요한 데이터만 정리)
-    # ...
-    # [병렬화 결과 획득]
-    try:
-        # 이미 획득했거나 아주 짧은 대기 (0.1초)
-        await asyncio.wait_for(asyncio.shield(weather_future), timeout=0.1)
-        actual_weather = weather_cache.get("mapped_weather")
-    except:
-        actual_weather = weather_cache.get("mapped_weather")
     # 추가된 마스터모드 이스터 에그
     if utterance == "마스터모드":
         logger.info("Easter Egg: Master Mode Activated")
         return get_final_kakao_response("마스터 모드가 활성화되었습니다. (디버깅용)")
 
-    # [병렬화 결과 획득]
-    try:
-        # 이미 획득했거나 타임아웃 0.2초 내에 확보 시도
-        res_weather = await asyncio.wait_for(asyncio.shield(weather_future), timeout=0.2)
-        actual_weather = weather_cache.get("mapped_weather") # 캐시 업데이트된 값 사용
-    except:
-        actual_weather = weather_cache.get("mapped_weather") # 실패 시 기존 캐시
-
-    # 4. 의도 분석 (Smart Patch - Fallback First)
-
-
-    # 4.1 "날씨" 질문 단독 처리 (Gemini 불필요)
+    # "날씨" 질문 단독 처리 (Gemini 불필요)
     if (
         "날씨" in utterance
         and len(utterance) < 10
         and not any(k in utterance for k in ["추천", "메뉴", "점심", "밥"])
     ):
-        cond, temp = r.get_weather() # Use global r
+        return get_weather_info_response(user_id, utterance, meal_label)
+    return None
 
-        cond_display = cond if cond else "정보 없음"
-        temp_display = temp if temp else "정보 없음"
 
-        response_text = f"🌡️ 현재 날씨 정보\n\n상태: {cond_display}\n기온: {temp_display}\n\n날씨에 맞는 {meal_label} 추천해드릴까요? 😊"
+def get_store_list_response(utterance: str) -> Dict:
+    """[관리자] 구역별 가게 목록"""
+    try:
+        logger.info(f"🏪 Admin: Restaurant List Requested - utterance='{utterance}'")
+        menus_by_area = lunch_data.get_menus_by_area()
+        total_count = sum(len(menus) for menus in menus_by_area.values())
+        logger.info(f"📊 총 {total_count}개의 가게를 로드했습니다.")
+
+        list_text = f"📋 **식당 목록** (총 {total_count}개)\n\n"
+
+        for area in sorted(menus_by_area.keys()):
+            menus = menus_by_area[area]
+            list_text += f"🏢 **{area}**\n"
+            for idx, menu in enumerate(menus, 1):
+                category = menu.get('category', '기타')
+                list_text += f"{idx}. {menu['name']} ({category})\n"
+            list_text += "\n"
+
+        logger.info("✅ 가게목록 전송 완료")
+        return get_final_kakao_response(list_text.strip())
+    except Exception as e:
+        logger.exception(f"🏪 Admin: Restaurant List Query Failed - Full traceback and error details")
+        return get_final_kakao_response("❌ 오류가 발생했습니다. 관리자에게 문의하세요.")
 
-        session_manager.add_conversation(user_id, "user", utterance)
-        session_manager.add_conversation(user_id, "bot", response_text)
 
-        return {
-            "version": "2.0",
-            "template": {
-                "outputs": [{"simpleText": {"text": response_text}}],
-                "quickReplies": [
-                    {"label": "☔ 날씨에 맞게 추천", "action": "message", "messageText": "날씨에 맞게 추천해줘"}
-                ],
-            },
-        }
+def get_weather_info_response(user_id: str, utterance: str, meal_label: str) -> Dict:
+    """현재 날씨 안내 (백그라운드 캐시 값 사용)"""
+    trigger_weather_revalidation()
+    cond, temp = weather_cache.get("condition"), weather_cache.get("temp")
+
+    cond_display = cond if cond else "정보 없음"
+    temp_display = temp if temp else "정보 없음"
+    age = get_weather_age_sec()
+    age_note = f"\n(약 {int(age // 60)}분 전 기준)" if age is not None and is_weather_stale() else ""
+
+    response_text = f"🌡️ 현재 날씨 정보\n\n상태: {cond_display}\n기온: {temp_display}{age_note}\n\n날씨에 맞는 {meal_label} 추천해드릴까요? 😊"
 
-    # 4.2 로컬 의도 분석 (Fallback) 선행 호출
-    # 키워드 기반으로 1차 판단을 먼저 합니다.
-    fast_intent = analyze_intent_fallback(utterance)
+    session_manager.add_conversation(user_id, "user", utterance)
+    session_manager.add_conversation(user_id, "bot", response_text)
+
+    return {
+        "version": "2.0",
+        "template": {
+            "outputs": [{"simpleText": {"text": response_text}}],
+            "quickReplies": [
+                {"label": "☔ 날씨에 맞게 추천", "action": "message", "messageText": "날씨에 맞게 추천해줘"}
+            ],
+        },
+    }
+
+
+def enrich_request(ctx: RequestContext) -> RequestContext:
+    """[enrich] 세션/대화 기록과 날씨 (날씨는 백그라운드 캐시만 사용, 오래됐으면 재검증만 걸어두고 기다리지 않음)"""
+    trigger_weather_revalidation()
+    # 관리 앱/CLI가 menus.json을 고쳤으면 (mtime 비교, stat 한 번) 다시 읽고 _on_menu_change 호출
+    lunch_data.check_menus_file()
+    weather = weather_cache.get("mapped_weather")
+    if ctx.requested_meal_label and ctx.requested_meal_label != ctx.current_meal_label:
+        # 다른 끼니를 물어보면 그 시각의 예보 날씨로 추천 (예: 점심에 저녁 메뉴)
+        weather = get_meal_weather(ctx.requested_meal_label)
+    return ctx.with_(
+        session=session_manager.get_session(ctx.user_id),
+        conversation_history=session_manager.get_conversation_history(ctx.user_id),
+        weather=weather,
+    )
+
+
+async def decide_request(ctx: RequestContext):
+    """[decide] 최종 의도 결정 (필요할 때만 Gemini) + 추천 메뉴 선택. (컨텍스트, 즉시 응답 또는 None) 반환"""
+    utterance = ctx.utterance
+    local_intent = ctx.local_intent
     has_target_keyword = bool(
-        fast_intent.get("cuisine_filters") or 
-        fast_intent.get("tag_filters") or
-        fast_intent.get("mood") or
-        fast_intent.get("weather")
+        local_intent.get("cuisine_filters") or
+        local_intent.get("tag_filters") or
+        local_intent.get("mood") or
+        local_intent.get("weather")
     )
-    is_help_request = fast_intent.get("intent") == "help"
-    is_welcome_event = not utterance.strip() or utterance in ["웰컴", "welcome", "시작"]
-
-    # 4.3 의도 결정 로직 (Short-circuit)
-    if is_welcome_event:
-        logger.info("⚡ Fast Track: Welcome Event")
-        intent_data = {"intent": "casual", "casual_type": "greeting"}
-        GEMINI_AVAILABLE_FOR_REQUEST = False
-    elif is_help_request:
+
+    # 의도 결정 로직 (Short-circuit)
+    if local_intent.get("intent") == "help":
+        # 도움말 단어 + 왜/이유 (gate에서 설명으로 넘어온 경우) -> 아래에서 로컬 설명으로 처리
         logger.info("⚡ Fast Track: Help Request (Skipping Gemini)")
-        intent_data = fast_intent
-        GEMINI_AVAILABLE_FOR_REQUEST = False
+        intent_data = dict(local_intent)
+        use_gemini = False
     elif has_target_keyword:
         logger.info("⚡ Smart Patch: Target Keyword Detected (Skipping Gemini Intent)")
-        intent_data = fast_intent
         # 키워드가 있으면 intent를 'recommend'로 강제 (fallback 내부에서 처리되지만 확실히 함)
-        intent_data["intent"] = "recommend"
-        # 의도 분석은 스킵하지만, 응답 생성 시 Gemini 분위기 조성을 위해 GEMINI_AVAILABLE_FOR_REQUEST는 유지
-        GEMINI_AVAILABLE_FOR_REQUEST = GEMINI_AVAILABLE
-    elif len(utterance.strip()) <= 2:
+        intent_data = {**local_intent, "intent": "recommend"}
+        # 의도 분석은 스킵하지만, 응답 생성 시 Gemini 분위기 조성을 위해 Gemini 사용은 유지
+        use_gemini = GEMINI_AVAILABLE
+    elif ctx.is_short:
+        # 단답형(야, 왜, 어, ㄴ, ㅇ 등)은 Gemini를 거치지 않고 바로 답변 ('왜'는 로컬 설명 생성기로 연결)
         logger.info(f"⚡ Super-Fast Track: Very Short Utterance ({utterance})")
-        # 단답형(야, 왜, 어, ㄴ, ㅇ 등)은 Gemini를 거치지 않고 바로 답변
-        intent_data = fast_intent
-        
-        # [FIX] '왜' 같은 질문이 들어왔을 때 intent가 'explain'이면 그대로 유지
-        if intent_data.get("intent") == "explain":
-            logger.info("  -> Intent is EXPLAIN (Preserving)")
-            GEMINI_AVAILABLE_FOR_REQUEST = False # 로컬 설명 생성기로 연결
-        else:
-            GEMINI_AVAILABLE_FOR_REQUEST = False
+        intent_data = dict(local_intent)
+        use_gemini = False
     elif len(utterance) < 15 and any(
         k in utterance for k in ["점심", "밥", "뭐먹", "배고파", "랜덤"]
     ):
         logger.info("⚡ Fast Track: Simple Recommend (Skipping Gemini)")
-        intent_data = fast_intent
-        GEMINI_AVAILABLE_FOR_REQUEST = False
+        intent_data = dict(local_intent)
+        use_gemini = False
     elif not GEMINI_AVAILABLE:
         logger.info("⚡ Fallback: Gemini Not Configured")
-        intent_data = fast_intent
-        GEMINI_AVAILABLE_FOR_REQUEST = False
+        intent_data = dict(local_intent)
+        use_gemini = False
     elif _gemini_in_cooldown():
         logger.info("⚡ Fallback: Gemini Rate Limited (Cooldown)")
-        intent_data = fast_intent
-        GEMINI_AVAILABLE_FOR_REQUEST = False
+        intent_data = dict(local_intent)
+        use_gemini = False
     else:
-        # 키워드에 걸리지 않는 복잡한 문장이나 일상 대화만 Gemini 사용
-        logger.info("🤖 Engine: Gemini Intent Analysis")
-        # Gemini 호출 시 타임아웃을 2.5초로 줄여 안전성 확보
-        intent_data = await analyze_intent_with_gemini(
-            utterance, conversation_history
-        )  # Assuming analyze_intent_with_gemini has its own timeout or is wrapped
-        GEMINI_AVAILABLE_FOR_REQUEST = True
+        # 로컬 분류기가 충분히 확신하면 Gemini 의도 분석 생략 (응답 생성은 Gemini 유지)
+        predicted, confidence = intent_classifier.predict(utterance)
+        if predicted and confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            logger.info(f"⚡ Local Classifier: {predicted} ({confidence:.2f}, Skipping Gemini Intent)")
+            intent_data = {**local_intent, "intent": predicted}
+            use_gemini = True
+        elif GEMINI_COMBINED_MODE:
+            # 의도 분석 + 답변을 한 번에 (후보 메뉴는 로컬에서 미리 골라 프롬프트에 넣음)
+            logger.info("🤖 Engine: Gemini Combined (Intent + Reply)")
+            combined = await analyze_and_reply_with_gemini(ctx, build_candidate_shortlist(ctx))
+            if combined is not None:
+                intent_data = {**local_intent, **combined["intent_data"]}
+                ctx = ctx.with_(combined_choice=combined["choice"], combined_reply=combined["reply"])
+            else:
+                intent_data = dict(local_intent)
+            # 두 번째 왕복은 하지 않음 (답변이 없으면 로컬/캐시 문구)
+            use_gemini = False
+        else:
+            # 키워드에 걸리지 않는 복잡한 문장이나 일상 대화만 Gemini 사용
+            logger.info("🤖 Engine: Gemini Intent Analysis")
+            intent_data = await analyze_intent_with_gemini(utterance, ctx.conversation_history, deadline_at=ctx.deadline_at)
+            use_gemini = True
 
     intent = intent_data.get("intent", "recommend")
     casual_type = intent_data.get("casual_type")
 
     # "왜/이유" 질문은 help보다 explain을 우선
-    if contains_explain_keyword(utterance):
+    if ctx.wants_explain:
         intent = "explain"
-        intent_data["intent"] = "explain"
+        intent_data = {**intent_data, "intent": "explain"}
 
     logger.info(
-        f"User: {user_id} | Intent: {intent} | Weather: {actual_weather} | Mood: {intent_data.get('mood')} | Utterance: '{utterance}'"
+        f"User: {ctx.user_id} | Intent: {intent} | Weather: {ctx.weather} | Mood: {intent_data.get('mood')} | Utterance: '{utterance}'"
     )
 
-    # 5. 의도별 처리 (기존 로직과 동일하나 요약)
-    response_text = ""
     # [특수] 도움말은 즉시 반환
     if intent == "help":
-        return get_help_response()
+        return ctx, get_help_response()
+
+    ctx = ctx.with_(intent=intent, casual_type=casual_type, intent_data=intent_data, use_gemini=use_gemini)
 
-    # 인텐트에 따른 처리 분기
+    # 추천 메뉴 선택
     if intent == "casual":
-        if GEMINI_AVAILABLE_FOR_REQUEST and not _gemini_in_cooldown():
-            casual_response = await generate_casual_response_with_gemini(
-                utterance, casual_type, conversation_history, user_id, meal_label=meal_label
+        has_strong_keyword = any(word in ctx.lower for word in ["점심", "추천", "메뉴", "배고", "식사"])
+        has_weak_keyword = "먹" in ctx.lower
+        should_recommend = (
+            has_strong_keyword
+            or (has_weak_keyword and not ctx.is_question)  # "먹"은 질문이 아닐 때만 추천 트리거
+            or (len(ctx.text) < 3 and casual_type == "chitchat")
+        )
+        choice = None
+        if should_recommend and ctx.combined_choice:
+            choice = ctx.combined_choice
+        elif should_recommend:
+            choice = r.recommend( # Use global r
+                weather=ctx.weather,
+                mood=intent_data.get("mood"),
+                meal_label=ctx.meal_label,
+                is_late_evening=ctx.is_late_evening,
             )
-        else:
-            casual_response = generate_casual_response_fallback(casual_type, user_id, meal_label=meal_label)
+        return ctx.with_(should_recommend=should_recommend, choice=choice), None
 
-        is_question = any(utterance.strip().endswith(m) for m in ["?", "냐", "까", "니", "요", "죠"])
-        has_strong_keyword = any(
-            word in utterance.lower() for word in ["점심", "추천", "메뉴", "배고", "식사"]
+    if intent == "reject":
+        last_rec = session_manager.get_last_recommendation(ctx.user_id)
+        excluded = [last_rec["name"]] if last_rec and "name" in last_rec else []
+        choice = ctx.combined_choice or r.recommend( # Use global r
+            weather=ctx.weather,
+            cuisine_filters=intent_data.get("cuisine_filters"),
+            mood=intent_data.get("mood"),
+            excluded_menus=excluded,
+            tag_filters=intent_data.get("tag_filters", []),
+            meal_label=ctx.meal_label,
+            is_late_evening=ctx.is_late_evening,
         )
-        has_weak_keyword = "먹" in utterance.lower()
-
-        should_recommend = (
-            (has_strong_keyword)
-            or (has_weak_keyword and not is_question)  # "먹"은 질문이 아닐 때만 추천 트리거
-            or (len(utterance.strip()) < 3 and casual_type == "chitchat")
+        return ctx.with_(last_rec=last_rec, choice=choice), None
+
+    if intent in ("accept", "explain"):
+        return ctx.with_(last_rec=session_manager.get_last_recommendation(ctx.user_id)), None
+
+    # recommend
+    choice = ctx.combined_choice or r.recommend( # Use global r
+        weather=ctx.weather or intent_data.get("weather"),
+        cuisine_filters=intent_data.get("cuisine_filters"),
+        mood=intent_data.get("mood"),
+        tag_filters=intent_data.get("tag_filters", []),
+        meal_label=ctx.meal_label,
+        is_late_evening=ctx.is_late_evening,
+    )
+    return ctx.with_(choice=choice), None
+
+
+async def _render_menu_text(ctx: RequestContext, choice: Dict) -> str:
+    """추천 메뉴 멘트 (Gemini 가능하면 Gemini, 아니면 로컬 템플릿)"""
+    if ctx.combined_reply and choice is ctx.combined_choice and ctx.intent in ("recommend", "reject"):
+        # 한 번에 받은 답변 + 로컬에서 붙이는 위치/종류
+        prefix = build_emotion_prefix(ctx.intent_data, choice, short_mode=True)
+        return f"{prefix}{ctx.combined_reply}\n\n{menu_footer(choice)}"
+    if ctx.use_gemini and not _gemini_in_cooldown("generation"):
+        return await generate_response_with_gemini(
+            ctx.utterance, choice, ctx.intent_data, ctx.conversation_history,
+            meal_label=ctx.meal_label, deadline_at=ctx.deadline_at,
         )
+    key, _ = build_recommend_copy_request(ctx.utterance, choice, ctx.intent_data, ctx.meal_label)
+    pooled = await pooled_copy(key)
+    if pooled:
+        return build_emotion_prefix(ctx.intent_data, choice, short_mode=True) + pooled
+    return generate_response_message(choice, ctx.intent_data, meal_label=ctx.meal_label)
 
-        if should_recommend:
-            choice = r.recommend( # Use global r
-                weather=actual_weather,
-                mood=intent_data.get("mood"),
-                meal_label=meal_label,
-                is_late_evening=is_late_evening,
+
+async def render_response(ctx: RequestContext) -> Dict:
+    """[render] 의도별 응답 문구 생성 + 대화 기록 + 카카오 응답 구성"""
+    user_id, utterance, meal_label = ctx.user_id, ctx.utterance, ctx.meal_label
+    intent, choice, last_rec = ctx.intent, ctx.choice, ctx.last_rec
+    response_text = ""
+    recommended_in_response = False
+
+    if intent == "casual":
+        if ctx.combined_reply:
+            casual_response = ctx.combined_reply
+        elif ctx.use_gemini and not _gemini_in_cooldown("generation"):
+            casual_response = await generate_casual_response_with_gemini(
+                utterance, ctx.casual_type, ctx.conversation_history, user_id,
+                meal_label=meal_label, deadline_at=ctx.deadline_at,
             )
+        else:
+            key, _ = build_casual_copy_request(utterance, ctx.casual_type, ctx.conversation_history, meal_label)
+            casual_response = await pooled_copy(key) or generate_casual_response_fallback(ctx.casual_type, user_id, meal_label=meal_label)
+
+        if ctx.should_recommend:
             if choice:
                 recommended_in_response = True
                 session_manager.set_last_recommendation(user_id, choice)
-                menu_response = (
-                    await generate_response_with_gemini(
-                        utterance, choice, intent_data, conversation_history, meal_label=meal_label
-                    )
-                    if (GEMINI_AVAILABLE_FOR_REQUEST and not _gemini_in_cooldown())
-                    else generate_response_message(choice, intent_data, meal_label=meal_label)
-                )
+                menu_response = await _render_menu_text(ctx, choice)
                 response_text = (
                     f"{casual_response}\n\n오늘 {meal_label}은 이 메뉴 어떠세요?\n\n{menu_response}"
                 )
@@ -1230,29 +2128,11 @@ async def handle_recommendation_logic(
             session_manager.add_conversation(user_id, "user", utterance)
         session_manager.add_conversation(user_id, "bot", response_text)
 
-
     elif intent == "reject":
-        last_rec = session_manager.get_last_recommendation(user_id)
-        excluded = [last_rec["name"]] if last_rec and "name" in last_rec else []
-        choice = r.recommend( # Use global r
-            weather=actual_weather,
-            cuisine_filters=intent_data.get("cuisine_filters"),
-            mood=intent_data.get("mood"),
-            excluded_menus=excluded,
-            tag_filters=intent_data.get("tag_filters", []),
-            meal_label=meal_label,
-            is_late_evening=is_late_evening,
-        )
         if choice:
             recommended_in_response = True
             session_manager.set_last_recommendation(user_id, choice)
-            menu_res = (
-                await generate_response_with_gemini(
-                    utterance, choice, intent_data, conversation_history, meal_label=meal_label
-                )
-                if (GEMINI_AVAILABLE_FOR_REQUEST and not _gemini_in_cooldown())
-                else generate_response_message(choice, intent_data, meal_label=meal_label)
-            )
+            menu_res = await _render_menu_text(ctx, choice)
             response_text = f"알겠습니다! 다른 메뉴로 추천드릴게요 😊\n\n" + menu_res
             session_manager.add_conversation(user_id, "user", utterance, choice)
         else:
@@ -1260,7 +2140,6 @@ async def handle_recommendation_logic(
         session_manager.add_conversation(user_id, "bot", response_text)
 
     elif intent == "accept":
-        last_rec = session_manager.get_last_recommendation(user_id)
         response_text = (
             f"좋은 선택이에요! {last_rec['name']} 맛있게 드세요~ 🍽️😊"
             if last_rec
@@ -1270,54 +2149,41 @@ async def handle_recommendation_logic(
         session_manager.add_conversation(user_id, "bot", response_text)
 
     elif intent == "explain":
-        last_rec = session_manager.get_last_recommendation(user_id)
         if last_rec:
             # Gemini가 가능하면 Gemini로, 아니면 로컬 설명 생성
-            if GEMINI_AVAILABLE_FOR_REQUEST and not _gemini_in_cooldown():
+            if ctx.use_gemini and not _gemini_in_cooldown("generation"):
                 response_text = await generate_explanation_with_gemini(
                     utterance,
                     last_rec,
-                    conversation_history,
-                    weather=actual_weather,
-                    mood=intent_data.get("mood"),
+                    ctx.conversation_history,
+                    weather=ctx.weather,
+                    mood=ctx.intent_data.get("mood"),
+                    deadline_at=ctx.deadline_at,
                 )
             else:
-                response_text = generate_explanation_fallback(last_rec, weather=actual_weather, mood=intent_data.get("mood"))
+                mood = ctx.intent_data.get("mood")
+                key, _ = build_explanation_copy_request(utterance, last_rec, weather=ctx.weather, mood=mood)
+                response_text = await pooled_copy(key) or generate_explanation_fallback(last_rec, weather=ctx.weather, mood=mood)
         else:
             response_text = "아직 추천해드린 메뉴가 없어요! 먼저 메뉴를 추천해드릴까요? 😊"
-        
+
         session_manager.add_conversation(user_id, "user", utterance)
         session_manager.add_conversation(user_id, "bot", response_text)
 
     else:  # recommend
-        weather = actual_weather or intent_data.get("weather")
-        choice = r.recommend( # Use global r
-            weather=weather,
-            cuisine_filters=intent_data.get("cuisine_filters"),
-            mood=intent_data.get("mood"),
-            tag_filters=intent_data.get("tag_filters", []),
-            meal_label=meal_label,
-            is_late_evening=is_late_evening,
-        )
-
         if choice:
             recommended_in_response = True
             session_manager.set_last_recommendation(user_id, choice)
-            if GEMINI_AVAILABLE_FOR_REQUEST and not _gemini_in_cooldown():
-                response_text = await generate_response_with_gemini(
-                    utterance, choice, intent_data, conversation_history, meal_label=meal_label
-                )
-            else:
-                response_text = generate_response_message(choice, intent_data, meal_label=meal_label)
+            response_text = await _render_menu_text(ctx, choice)
             session_manager.add_conversation(user_id, "user", utterance, choice)
             session_manager.add_conversation(user_id, "bot", response_text)
         else:
             response_text = "추천할 만한 메뉴가 없어요 ㅠㅠ 조건을 바꿔보세요."
 
-    # 6. 재시도 횟수에 따른 멘트 추가 (Sticky Retry Logic)
-    retry_count = session.get("recommendation_count", 0)
+    # 재시도 횟수에 따른 멘트 추가 (Sticky Retry Logic)
+    retry_count = ctx.session.get("recommendation_count", 0)
     retry_prefix = ""
-    
+
     if intent in ["recommend", "reject", "casual"]:
         # 추천이 포함된 응답일 때만 적용
         if "추천" in response_text or "어떠세요" in response_text:
@@ -1327,13 +2193,13 @@ async def handle_recommendation_logic(
                 retry_prefix = "이럴 거면 왜 물어보세요?\n\n"
             elif retry_count >= 6:
                 retry_prefix = "😭 저기요... 저도 이제 힘들어요... 그냥 아까 추천드린 것 중에 하나 드시죠! 마지막이에요!\n\n"
-    
-    if mismatch_notice and recommended_in_response:
-        response_text = f"{mismatch_notice}\n\n{response_text}"
+
+    if ctx.mismatch_notice and recommended_in_response:
+        response_text = f"{ctx.mismatch_notice}\n\n{response_text}"
 
     final_text = f"{retry_prefix}{response_text}"
 
-    # 7. Kakao Response 구성
+    # Kakao Response 구성
     return get_final_kakao_response(final_text)
 
 
@@ -0,0 +1,167 @@
+"""
+서킷 브레이커 모듈
+Gemini 키 하나 + 호출 종류(의도 분석 / 문구 생성 등) 하나마다 최근 호출 결과(실패/타임아웃)를 슬라이딩 윈도우로 모아
+실패율이 높으면 차단(open)해 잠시 로컬 모드로 돌리고, 차단 시간이 지나면 시험 호출 하나만 보내(half-open)
+성공하면 다시 열고(closed) 실패하면 더 길게 차단합니다.
+호출 시작 시각(allow에 넘긴 now)을 결과와 함께 넘기면, 시험 호출이 아닌 호출이나
+차단 전에 나간 호출의 늦은 결과가 시험 호출 결과로 잘못 세어지지 않습니다.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+WINDOW_SEC = 30.0          # 이 시간 안의 호출 결과만 봄
+MIN_CALLS = 4              # 표본이 이보다 적으면 차단하지 않음
+FAILURE_RATE = 0.5         # 실패(오류 + 타임아웃) 비율이 이 이상이면 차단
+OPEN_SEC = 10.0            # 첫 차단 시간
+MAX_OPEN_SEC = 120.0       # 시험 호출이 계속 실패할 때 최대 차단 시간
+PROBE_TIMEOUT_SEC = 15.0   # 시험 호출 결과가 이만큼 안 오면 다른 시험 호출 허용
+
+
+class CircuitBreaker:
+    def __init__(self, name: str = "", window_sec: float = WINDOW_SEC, min_calls: int = MIN_CALLS,
+                 failure_rate: float = FAILURE_RATE, open_sec: float = OPEN_SEC, max_open_sec: float = MAX_OPEN_SEC):
+        self.name = name
+        self.window_sec = window_sec
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.base_open_sec = open_sec
+        self.max_open_sec = max_open_sec
+        self.state = CLOSED
+        self.open_sec = open_sec
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.results = deque()   # (시각, 성공 여부)
+        # 지표
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.trips = 0
+        self.probes = 0
+        self.lock = threading.Lock()
+
+    # --- 내부 ---
+    def _trim(self, now: float) -> None:
+        while self.results and now - self.results[0][0] > self.window_sec:
+            self.results.popleft()
+
+    def _current_state(self, now: float) -> str:
+        """차단 시간이 지났으면 half-open으로 (lock 안에서 호출)"""
+        if self.state == OPEN and now - self.opened_at >= self.open_sec:
+            self.state = HALF_OPEN
+            self.probe_started_at = None
+        return self.state
+
+    def _probe_in_flight(self, now: float) -> bool:
+        return self.probe_started_at is not None and now - self.probe_started_at < PROBE_TIMEOUT_SEC
+
+    def _trip(self, now: float, reason: str) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.probe_started_at = None
+        self.trips += 1
+        print(f"Circuit {self.name} open for {self.open_sec:.0f}s ({reason})")
+
+    # --- 호출 전/후 ---
+    def available(self, now: Optional[float] = None) -> bool:
+        """지금 호출할 수 있는지 (상태를 바꾸지 않음 - 키 고를 때 사용)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            return state == HALF_OPEN and not self._probe_in_flight(now)
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """호출 허가. half-open이면 시험 호출 하나만 허가하고 나머지는 거절"""
+        now = time.time() if now is None else now
+        with self.lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight(now):
+                self.probe_started_at = now
+                self.probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def _is_probe(self, started_at: Optional[float]) -> bool:
+        """이 호출이 지금의 시험 호출인지 (시작 시각을 모르면 그렇다고 봄, lock 안에서 호출)"""
+        return started_at is None or started_at == self.probe_started_at
+
+    def record(self, ok: bool, timed_out: bool = False, now: Optional[float] = None,
+               started_at: Optional[float] = None) -> None:
+        """호출 결과 반영 (타임아웃도 실패로 셈). started_at은 그 호출의 allow 시각"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+                if timed_out:
+                    self.timeouts += 1
+            state = self._current_state(now)
+            if started_at is not None and started_at < self.opened_at:
+                return   # 마지막 차단 전에 나간 호출의 늦은 결과
+            if state == HALF_OPEN:
+                if not self._is_probe(started_at):
+                    return   # 시험 호출이 아닌 호출 (예: 시간 초과로 대체된 이전 시험 호출)
+                if ok:
+                    # 시험 호출 성공 -> 다시 열고 윈도우/차단 시간 초기화
+                    self.state = CLOSED
+                    self.open_sec = self.base_open_sec
+                    self.probe_started_at = None
+                    self.results.clear()
+                    print(f"Circuit {self.name} closed (probe ok)")
+                else:
+                    self.open_sec = min(self.max_open_sec, self.open_sec * 2)
+                    self._trip(now, "probe failed")
+                return
+            if state == OPEN:
+                return   # 차단 전에 나간 호출의 늦은 결과
+            self.results.append((now, ok))
+            self._trim(now)
+            failed = sum(1 for _, success in self.results if not success)
+            if len(self.results) >= self.min_calls and failed / len(self.results) >= self.failure_rate:
+                self._trip(now, f"{failed}/{len(self.results)} failed in {self.window_sec:.0f}s")
+                self.results.clear()
+
+    def release_probe(self, started_at: Optional[float] = None) -> None:
+        """결과 없이 끝난(취소된) 호출이 시험 호출이었다면 다른 시험 호출을 허용"""
+        with self.lock:
+            if self.state == HALF_OPEN and self._is_probe(started_at):
+                self.probe_started_at = None
+
+    def reset(self) -> None:
+        with self.lock:
+            self.state = CLOSED
+            self.open_sec = self.base_open_sec
+            self.probe_started_at = None
+            self.results.clear()
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        with self.lock:
+            state = self._current_state(now)
+            self._trim(now)
+            window = len(self.results)
+            failed = sum(1 for _, success in self.results if not success)
+            return {
+                "state": state,
+                "window_calls": window,
+                "window_failure_rate": round(failed / window, 3) if window else 0.0,
+                "open_left_sec": round(max(0.0, self.opened_at + self.open_sec - now), 1) if state == OPEN else 0.0,
+                "successes": self.successes,
+                "failures": self.failures,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "trips": self.trips,
+                "probes": self.probes,
+            }
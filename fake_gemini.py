@@ -0,0 +1,191 @@
+"""
+가짜 Gemini 모듈
+API 키/네트워크 없이 bot_server의 헤지, 쿨다운, 서킷 브레이커, 캐시 로직을 시험하기 위한
+generate_content_async 대역입니다. 녹화해 둔 응답을 재생하고, 응답 시간 분포와
+429 / 타임아웃(응답 없음) / 서버 오류 / 깨진 JSON을 확률 또는 순서(script)로 흉내 냅니다.
+
+사용:
+    GEMINI_FAKE=normal python bot_server.py        # 가짜 키 풀로 서버 실행 (GEMINI_FAKE_KEYS개, 기본 2개)
+    GEMINI_FAKE=degraded GEMINI_FAKE_RECORDING=recorded.jsonl GEMINI_FAKE_SEED=7 python bot_server.py
+"""
+import asyncio
+import json
+import math
+import random
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+FAKE_KINDS = ("generation", "intent", "combined")
+HANG_SEC = 30.0   # "timeout" 장애: 이만큼 응답하지 않음 (호출 측 wait_for가 먼저 끊음)
+
+# 이름 -> 응답 시간(중앙값/p90, 초) + 장애 비율
+PROFILES: Dict[str, Dict[str, float]] = {
+    "fast": {"median": 0.35, "p90": 0.7},
+    "normal": {"median": 0.9, "p90": 1.9},
+    "slow": {"median": 1.6, "p90": 3.2, "timeout_rate": 0.05},
+    "degraded": {"median": 2.4, "p90": 5.0, "timeout_rate": 0.2, "error_rate": 0.1},
+    "quota": {"median": 0.9, "p90": 1.9, "rate_limit_rate": 0.5},
+}
+
+DEFAULT_RESPONSES: Dict[str, str] = {
+    "intent": '{"intent": "recommend", "casual_type": null, "emotion": "neutral", "filter": [], "weather": null, "mood": null}',
+    "combined": json.dumps({
+        "intent": "recommend", "casual_type": None, "emotion": "neutral", "filter": [],
+        "weather": None, "mood": None, "pick": 0,
+        "reply": "오늘은 이 메뉴 어떠세요? 든든하게 드시고 오후도 힘내세요 😊",
+    }, ensure_ascii=False),
+    "generation": "오늘은 이 메뉴 어떠세요? 든든하게 드시고 오후도 힘내세요 😊",
+}
+
+FAULTS = ("ok", "rate_limit", "timeout", "error", "malformed")
+
+
+class FakeResponse:
+    """generate_content_async 응답 / 스트리밍 조각 대역 (.text만 제공)"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LatencyProfile:
+    """응답 시간 분포: 녹화한 표본이 있으면 그중에서, 없으면 (중앙값, p90)에 맞춘 로그정규분포에서 뽑음"""
+
+    def __init__(self, median: float = 0.9, p90: float = 1.9, samples: Optional[Iterable[float]] = None):
+        self.median = median
+        self.sigma = math.log(p90 / median) / 1.2816 if p90 > median > 0 else 0.0
+        self.samples = list(samples or [])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.samples:
+            return rng.choice(self.samples)
+        if self.median <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+
+def load_recording(path: str) -> List[Dict[str, Any]]:
+    """
+    녹화 파일(JSONL) 읽기. 한 줄에 {"kind": "intent", "contains": "프롬프트 일부"(선택), "text": 응답, "latency": 초(선택)}
+    """
+    rows = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(row, dict) and "text" in row:
+                    rows.append(row)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Fake Gemini recording load error: {e}")
+    return rows
+
+
+class FakeGeminiModel:
+    """
+    generate_content_async(prompt, stream=False)를 흉내 내는 모델 하나 (호출 종류 하나용).
+    장애는 script()로 넣은 순서가 먼저, 없으면 비율에 따라 무작위 (seed를 주면 재현 가능)
+    """
+
+    def __init__(self, kind: str = "generation", recording: Optional[List[Dict[str, Any]]] = None,
+                 latency: Optional[LatencyProfile] = None, rate_limit_rate: float = 0.0, timeout_rate: float = 0.0,
+                 error_rate: float = 0.0, malformed_rate: float = 0.0, time_scale: float = 1.0, seed: Optional[int] = None):
+        self.kind = kind
+        self.recording = [row for row in (recording or []) if row.get("kind", kind) == kind]
+        self.latency = latency or LatencyProfile(0.0, 0.0)
+        self.rates = {"rate_limit": rate_limit_rate, "timeout": timeout_rate, "error": error_rate, "malformed": malformed_rate}
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        self.scripted = deque()
+        self.calls = 0
+        self.outcomes: Dict[str, int] = {}
+        self._replay_index = 0
+
+    def script(self, faults: Iterable[str]) -> "FakeGeminiModel":
+        """다음 호출들의 결과를 순서대로 지정 ("ok" / "rate_limit" / "timeout" / "error" / "malformed")"""
+        for fault in faults:
+            if fault not in FAULTS:
+                raise ValueError(f"unknown fault: {fault}")
+            self.scripted.append(fault)
+        return self
+
+    def _next_fault(self) -> str:
+        if self.scripted:
+            return self.scripted.popleft()
+        roll = self.rng.random()
+        for fault, rate in self.rates.items():
+            if roll < rate:
+                return fault
+            roll -= rate
+        return "ok"
+
+    def _replay(self, prompt: str):
+        """(응답 글, 녹화된 응답 시간 또는 None) - 프롬프트 일부가 맞는 녹화 우선, 없으면 차례로 재생"""
+        for row in self.recording:
+            if row.get("contains") and row["contains"] in prompt:
+                return row["text"], row.get("latency")
+        generic = [row for row in self.recording if not row.get("contains")]
+        if generic:
+            row = generic[self._replay_index % len(generic)]
+            self._replay_index += 1
+            return row["text"], row.get("latency")
+        return DEFAULT_RESPONSES.get(self.kind, DEFAULT_RESPONSES["generation"]), None
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        self.calls += 1
+        fault = self._next_fault()
+        self.outcomes[fault] = self.outcomes.get(fault, 0) + 1
+        text, recorded_latency = self._replay(str(prompt))
+        delay = (recorded_latency if recorded_latency is not None else self.latency.sample(self.rng)) * self.time_scale
+
+        if fault == "rate_limit":
+            await asyncio.sleep(delay * 0.2)
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        if fault == "error":
+            await asyncio.sleep(delay * 0.5)
+            raise RuntimeError("500 Internal error encountered.")
+        if fault == "timeout":
+            await asyncio.sleep(HANG_SEC)
+        if fault == "malformed":
+            # JSON이면 중간에서 잘린 형태, 글이면 문장 중간에서 끊김
+            text = text[:max(1, len(text) // 2)]
+
+        if stream:
+            return self._stream(text, delay)
+        await asyncio.sleep(delay)
+        return FakeResponse(text)
+
+    async def _stream(self, text: str, delay: float, parts: int = 3):
+        """첫 조각은 전체 시간의 40% 시점, 나머지는 고르게 나눠 보냄"""
+        size = max(1, math.ceil(len(text) / parts))
+        pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        first, rest = delay * 0.4, delay * 0.6 / max(1, len(pieces) - 1)
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(first if index == 0 else rest)
+            yield FakeResponse(piece)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "calls": self.calls, "outcomes": dict(self.outcomes)}
+
+
+def build_fake_models(profile: str = "normal", recording: Optional[List[Dict[str, Any]]] = None,
+                      time_scale: float = 1.0, seed: Optional[int] = None) -> Dict[str, FakeGeminiModel]:
+    """
+    키 하나 분량의 가짜 모델 {"generation", "intent", "combined"} (bot_server.build_gemini_models 대역).
+    profile은 PROFILES 이름
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"unknown fake Gemini profile: {profile} (choose from {', '.join(PROFILES)})")
+    settings = dict(PROFILES[profile])
+    latency = LatencyProfile(settings.pop("median"), settings.pop("p90"))
+    return {
+        kind: FakeGeminiModel(kind, recording=recording, latency=latency, time_scale=time_scale,
+                              seed=None if seed is None else seed + offset, **settings)
+        for offset, kind in enumerate(FAKE_KINDS)
+    }
@@ -0,0 +1,174 @@
+"""
+Gemini 키 풀 모듈
+GEMINI_API_KEY에 등록된 키마다 미리 만든 클라이언트(문구 생성용 / 의도 분석용 모델)를 두고,
+키별로 쿨다운/백오프, 진행 중 호출 수, 최근 1분 호출 수(쿼터 추정)를 따로 관리합니다.
+호출은 쓸 수 있는 키 중 가장 한가한 키로 분산하며, 전역 설정(genai.configure)이나 모델 재생성을 하지 않습니다.
+키 + 호출 종류마다 서킷 브레이커(circuit_breaker)를 두어 오류/타임아웃이 잦은 조합은 잠시 쓰지 않습니다.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from circuit_breaker import CircuitBreaker
+
+INITIAL_COOLDOWN_SEC = 30.0   # 429를 받은 키의 첫 쿨다운
+MAX_COOLDOWN_SEC = 600.0      # 최대 쿨다운 10분
+BACKOFF_FACTOR = 2.0
+DEFAULT_RPM_LIMIT = 15        # 키당 분당 요청 한도 추정치 (무료 등급 flash-lite 기준)
+QUOTA_WINDOW_SEC = 60.0
+
+
+def mask_key(key: str) -> str:
+    """로그/상태 확인용 키 표시 (끝 4자리만)"""
+    return f"…{key[-4:]}" if len(key) > 4 else "…"
+
+
+class KeyClient:
+    """API 키 하나의 클라이언트와 상태"""
+
+    def __init__(self, label: str, models: Dict[str, Any], rpm_limit: int = DEFAULT_RPM_LIMIT):
+        self.label = label
+        self.models = models              # {"generation": 모델, "intent": 모델}
+        self.rpm_limit = rpm_limit
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.cooldown_sec = INITIAL_COOLDOWN_SEC
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.recent_calls = deque()       # 최근 호출 시각 (쿼터 추정용)
+        self.breakers = {kind: CircuitBreaker(f"{label}/{kind}") for kind in models}
+
+    def in_cooldown(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def usable(self, kind: Optional[str], now: float) -> bool:
+        """쿨다운이 아니고 (kind가 있으면) 그 종류의 브레이커가 호출을 받을 수 있으면 True"""
+        if self.in_cooldown(now):
+            return False
+        if kind is None:
+            return True
+        breaker = self.breakers.get(kind)
+        return breaker is not None and breaker.available(now)
+
+    def quota_used(self, now: float) -> int:
+        while self.recent_calls and now - self.recent_calls[0] > QUOTA_WINDOW_SEC:
+            self.recent_calls.popleft()
+        return len(self.recent_calls)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "key": self.label,
+            "in_flight": self.in_flight,
+            "cooldown_left_sec": round(max(0.0, self.cooldown_until - now), 1),
+            "next_cooldown_sec": self.cooldown_sec,
+            "calls_last_min": self.quota_used(now),
+            "rpm_limit": self.rpm_limit,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "breakers": {kind: breaker.snapshot(now) for kind, breaker in self.breakers.items()},
+        }
+
+
+class GeminiClientPool:
+    def __init__(self, clients: Iterable[KeyClient] = ()):
+        self.clients: List[KeyClient] = list(clients)
+        self.lock = threading.Lock()
+        self._next = 0   # 부하가 같을 때 돌아가며 고르기 위한 시작 위치
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], model_factory: Callable[[str], Dict[str, Any]],
+                  rpm_limit: int = DEFAULT_RPM_LIMIT) -> "GeminiClientPool":
+        """키마다 model_factory(key) -> {"generation": ..., "intent": ...}로 클라이언트를 한 번만 생성"""
+        clients = []
+        for key in keys:
+            try:
+                clients.append(KeyClient(mask_key(key), model_factory(key), rpm_limit))
+            except Exception as e:
+                print(f"Gemini client init error ({mask_key(key)}): {e}")
+        return cls(clients)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    # --- 선택/반납 ---
+    def acquire(self, kind: str, now: Optional[float] = None) -> Optional[KeyClient]:
+        """
+        쿨다운이 아니고 브레이커가 열린 키 중 (쿼터 여유 있음, 진행 중 호출 적음, 최근 호출 적음) 순으로 하나 골라 점유.
+        쓸 수 있는 키가 없으면 None (half-open인 브레이커는 시험 호출 하나만 허가).
+        now(호출 시작 시각)를 release의 started_at으로 다시 넘기면 시험 호출을 잡은 호출만 그 결과를 반영
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            count = len(self.clients)
+            best, best_rank = None, None
+            for offset in range(count):
+                client = self.clients[(self._next + offset) % count]
+                if not client.usable(kind, now):
+                    continue
+                used = client.quota_used(now)
+                rank = (used >= client.rpm_limit, client.in_flight, used)
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = client, rank
+            if best is None or not best.breakers[kind].allow(now):
+                return None
+            self._next = (self.clients.index(best) + 1) % count
+            best.in_flight += 1
+            best.recent_calls.append(now)
+            return best
+
+    def release(self, client: KeyClient, ok: bool, rate_limited: bool = False, kind: Optional[str] = None,
+                timed_out: bool = False, aborted: bool = False, started_at: Optional[float] = None) -> None:
+        """
+        호출 결과 반영: 성공이면 백오프 초기화, 429면 이 키만 쿨다운(지수 백오프).
+        kind가 있으면 그 종류의 브레이커에도 기록 (취소(aborted)된 호출은 결과로 세지 않음).
+        started_at은 acquire에 넘긴 시작 시각 (시험 호출을 잡은 호출인지 가리는 데 사용)
+        """
+        breaker = client.breakers.get(kind) if kind else None
+        if breaker is not None:
+            if aborted:
+                breaker.release_probe(started_at)
+            else:
+                breaker.record(ok, timed_out=timed_out, started_at=started_at)
+        with self.lock:
+            client.in_flight = max(0, client.in_flight - 1)
+            if ok:
+                client.successes += 1
+                client.cooldown_sec = INITIAL_COOLDOWN_SEC
+                return
+            client.failures += 1
+            if rate_limited:
+                client.rate_limited += 1
+                client.cooldown_until = time.time() + client.cooldown_sec
+                print(f"Gemini key {client.label} rate-limited; cooldown {client.cooldown_sec:.0f}s")
+                client.cooldown_sec = min(MAX_COOLDOWN_SEC, client.cooldown_sec * BACKOFF_FACTOR)
+
+    # --- 상태 ---
+    def all_in_cooldown(self, kind: Optional[str] = None) -> bool:
+        """
+        등록된 키가 모두 쿨다운이면 True (키가 없는 경우는 GEMINI_AVAILABLE로 따로 판단).
+        kind가 있으면 그 종류의 브레이커가 막힌 키도 쓸 수 없는 것으로 봄
+        """
+        now = time.time()
+        with self.lock:
+            return bool(self.clients) and not any(c.usable(kind, now) for c in self.clients)
+
+    def cooldown_remaining(self) -> float:
+        """가장 먼저 풀리는 키까지 남은 시간 (쓸 수 있는 키가 있으면 0)"""
+        now = time.time()
+        with self.lock:
+            if not self.clients:
+                return 0.0
+            return max(0.0, min(c.cooldown_until for c in self.clients) - now)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.lock:
+            keys = [c.snapshot(now) for c in self.clients]
+        return {
+            "keys": keys,
+            "healthy": sum(1 for k in keys if not k["cooldown_left_sec"]),
+            "open_circuits": sum(1 for k in keys for b in k["breakers"].values() if b["state"] != "closed"),
+        }
@@ -0,0 +1,97 @@
+"""
+Gemini 스트리밍 모듈
+generate_content_async(stream=True)의 응답 조각을 도착하는 대로 모아 두고,
+마감이 되면 그때까지 받은 글 중 문장이 끝난 곳까지만 잘라 씁니다.
+스트림은 마감 뒤에도 (최대 시간까지) 계속 받아 완성본을 캐시에 채울 수 있습니다.
+"""
+import asyncio
+import time
+from typing import Any, Callable, List, Optional
+
+SENTENCE_ENDINGS = ".!?~…"
+MIN_PARTIAL_CHARS = 15      # 잘라 쓴 글이 이보다 짧으면 쓰지 않음 (로컬 문구 사용)
+
+
+def _is_emoji(ch: str) -> bool:
+    code = ord(ch)
+    return 0x2600 <= code <= 0x27BF or code >= 0x1F000
+
+
+def sentence_complete_prefix(text: str) -> str:
+    """문장 부호/이모지/줄바꿈으로 끝난 마지막 문장까지 (끝난 문장이 없으면 빈 문자열)"""
+    text = text or ""
+    cut = 0
+    for i, ch in enumerate(text):
+        if ch in SENTENCE_ENDINGS or ch == "\n" or _is_emoji(ch):
+            # "ㅎㅎ!!" / "😊😊"처럼 이어지는 부호는 끝까지 포함, 숫자 사이의 점(3.5)은 문장 끝이 아님
+            nxt = text[i + 1] if i + 1 < len(text) else ""
+            if ch == "." and nxt.isdigit():
+                continue
+            if not nxt or nxt.isspace() or nxt in SENTENCE_ENDINGS or _is_emoji(nxt) or _is_emoji(ch):
+                cut = i + 1
+    return text[:cut].strip()
+
+
+class StreamCollector:
+    """스트리밍 응답을 백그라운드에서 모으는 수집기 (여러 대기자가 각자의 마감으로 기다릴 수 있음)"""
+
+    def __init__(self, stream: Any, max_sec: float, on_done: Optional[Callable[["StreamCollector"], None]] = None):
+        self.parts: List[str] = []
+        self.started = time.perf_counter()
+        self.first_chunk_sec: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self._on_done = on_done
+        self.task = asyncio.ensure_future(self._consume(stream, max_sec))
+        self.task.add_done_callback(self._finish)
+
+    async def _consume(self, stream: Any, max_sec: float) -> str:
+        await asyncio.wait_for(self._drain(stream), timeout=max_sec)
+        return self.text
+
+    async def _drain(self, stream: Any) -> None:
+        async for chunk in stream:
+            try:
+                piece = chunk.text or ""
+            except ValueError:
+                # 안전 필터 등으로 텍스트가 없는 조각
+                continue
+            if self.first_chunk_sec is None:
+                self.first_chunk_sec = time.perf_counter() - self.started
+            self.parts.append(piece)
+
+    def _finish(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            self.error = asyncio.CancelledError()
+        else:
+            self.error = task.exception()
+        if self._on_done is not None:
+            self._on_done(self)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    @property
+    def complete(self) -> bool:
+        """스트림을 오류 없이 끝까지 받았으면 True"""
+        return self.task.done() and self.error is None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    async def wait(self, timeout: float) -> bool:
+        """timeout 초까지 완성을 기다림 (스트림은 취소하지 않음). 반환: 완성 여부"""
+        if timeout > 0 and not self.task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self.task), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                pass
+        return self.complete
+
+    def partial(self, min_chars: int = MIN_PARTIAL_CHARS) -> Optional[str]:
+        """지금까지 받은 글 중 문장이 끝난 부분 (너무 짧으면 None)"""
+        prefix = sentence_complete_prefix(self.text)
+        return prefix if len(prefix) >= min_chars else None
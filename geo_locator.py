@@ -0,0 +1,132 @@
+"""
+IP 위치 추정 모듈
+ipapi.co 조회 결과를 디스크에 오래(기본 7일) 보관하여 Streamlit 세션 / Tk 자동 감지마다
+다시 호출하지 않도록 합니다. (ipapi.co는 호출 제한이 엄격함)
+조회는 별도 스레드에서 실행할 수 있어 UI 첫 화면이 위치 조회를 기다리지 않습니다.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import lunch_data
+from weather_client import IPAPI_HOST, REQUESTS_AVAILABLE, weather_http
+
+GEO_CACHE_FILE = os.path.join(lunch_data.DATA_DIR, "geo_cache.json")
+GEO_TTL_SEC = 7 * 24 * 3600       # 성공한 위치는 일주일 재사용
+GEO_FAILURE_BACKOFF_SEC = 600     # 실패(호출 제한 등) 후 10분간 재시도하지 않음
+
+
+def parse_ipapi(data: Dict[str, Any]) -> Optional[str]:
+    """ipapi.co 응답 -> "도시,국가코드" (국가코드 없으면 도시만)"""
+    city = (data or {}).get("city")
+    country = (data or {}).get("country_code")
+    if city and country:
+        return f"{city},{country}"
+    return city or None
+
+
+class GeoLocator:
+    def __init__(self, ttl_sec: float = GEO_TTL_SEC, path: Optional[str] = GEO_CACHE_FILE):
+        self.ttl_sec = ttl_sec
+        self.path = path
+        self.city: Optional[str] = None
+        self.fetched_at = 0.0
+        self.failed_at = 0.0
+        self.lookups = 0
+        self.lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._executor = None
+        self._future: Optional[Future] = None
+        self._load()
+
+    def cached(self, max_age: Optional[float] = None) -> Optional[str]:
+        """저장된 위치 (max_age 안이면). 외부 호출 없음"""
+        with self.lock:
+            limit = self.ttl_sec if max_age is None else max_age
+            if self.city and time.time() - self.fetched_at <= limit:
+                return self.city
+            return None
+
+    def detect(self, force: bool = False) -> Optional[str]:
+        """캐시가 유효하면 바로 반환, 아니면 ipapi.co 한 번 조회 (동시 호출은 하나로 합침)"""
+        if not force:
+            city = self.cached()
+            if city:
+                return city
+        with self._fetch_lock:
+            # 기다리는 동안 다른 스레드가 채웠을 수 있음
+            if not force:
+                city = self.cached()
+                if city:
+                    return city
+            if time.time() - self.failed_at < GEO_FAILURE_BACKOFF_SEC:
+                return self.last_known()
+            city = self._lookup()
+            with self.lock:
+                if city:
+                    self.city, self.fetched_at, self.failed_at = city, time.time(), 0.0
+                else:
+                    self.failed_at = time.time()
+            if city:
+                self._save()
+            return city or self.last_known()
+
+    def detect_in_background(self) -> Future:
+        """detect()를 별도 스레드에서 실행 (이미 진행 중이면 같은 Future 반환)"""
+        with self.lock:
+            if self._future is not None and not self._future.done():
+                return self._future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geo")
+            self._future = self._executor.submit(self.detect)
+            return self._future
+
+    def last_known(self) -> Optional[str]:
+        """나이와 상관없이 마지막으로 알아낸 위치"""
+        with self.lock:
+            return self.city
+
+    def _lookup(self) -> Optional[str]:
+        if not REQUESTS_AVAILABLE:
+            return None
+        self.lookups += 1
+        try:
+            res = weather_http.get(f"https://{IPAPI_HOST}/json")
+            if res.status_code == 200:
+                return parse_ipapi(res.json())
+        except Exception:
+            pass
+        return None
+
+    # --- 디스크 저장 ---
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.city = data.get("city")
+            self.fetched_at = float(data.get("fetched_at", 0))
+        except Exception as e:
+            print(f"Geo cache load error: {e}")
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self.lock:
+            snapshot = {"city": self.city, "fetched_at": self.fetched_at}
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".geo_", suffix=".json", dir=os.path.dirname(self.path) or ".")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Geo cache save error: {e}")
+
+
+# 전역 위치 추정 인스턴스
+geo_locator = GeoLocator()
@@ -0,0 +1,65 @@
+"""
+한글 정규화 모듈
+자모 분해, 반복 글자 줄이기, 공백 제거 등 키워드 매칭 전에 쓰는 텍스트 처리 함수 모음.
+"""
+import re
+from typing import List, Tuple
+
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+             "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+_REPEATS = re.compile(r"(.)\1{2,}")
+
+
+def decompose(text: str) -> str:
+    """완성형 한글을 호환 자모로 분해 ("밥" -> "ㅂㅏㅂ"). 한글이 아닌 글자는 그대로."""
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            idx = code - _HANGUL_BASE
+            out.append(CHOSEONG[idx // 588])
+            out.append(JUNGSEONG[(idx % 588) // 28])
+            out.append(JONGSEONG[idx % 28])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def squash_repeats(text: str, keep: int = 2) -> str:
+    """같은 글자가 3번 이상 반복되면 keep번으로 줄임 ("배고파아아아" -> "배고파아아", "ㅋㅋㅋㅋ" -> "ㅋㅋ")"""
+    return _REPEATS.sub(lambda m: m.group(1) * keep, text)
+
+
+def compact_with_positions(text: str) -> Tuple[str, List[int]]:
+    """공백을 모두 제거한 문자열과 각 글자의 원래 위치"""
+    chars, positions = [], []
+    for i, ch in enumerate(text):
+        if not ch.isspace():
+            chars.append(ch)
+            positions.append(i)
+    return "".join(chars), positions
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """편집 거리(삽입/삭제/치환/인접 교환) 1 이하 여부"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        # 인접한 두 글자가 뒤바뀐 경우
+        return i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    return a[i:] == b[i + 1:]
@@ -0,0 +1,77 @@
+"""
+의도 분석 캐시 모듈
+정규화한 발화 -> 의도 분석 결과(로컬 키워드 / Gemini)를 LRU로 보관하여
+같은 말(바로가기 버튼, "점심 추천" 등)이 반복되면 분석을 건너뜁니다.
+"""
+import copy
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from hangul_text import squash_repeats
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_utterance(utterance: str) -> str:
+    """캐시 키용 정규화: 앞뒤 공백 제거, 소문자, 연속 공백 -> 한 칸, 3번 이상 반복 글자 -> 2번"""
+    return squash_repeats(_WHITESPACE.sub(" ", (utterance or "").strip().lower()))
+
+
+class IntentCache:
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, utterance: str, source: str) -> Optional[Dict[str, Any]]:
+        """source("local" / "gemini" / "dispatch")별 저장된 결과 사본 (없으면 None)"""
+        key = (source, normalize_utterance(utterance))
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses[source] = self.misses.get(source, 0) + 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits[source] = self.hits.get(source, 0) + 1
+        # 호출 측에서 결과를 수정해도 캐시는 그대로 유지
+        return copy.deepcopy(result)
+
+    def put(self, utterance: str, source: str, result: Dict[str, Any]) -> None:
+        key = (source, normalize_utterance(utterance))
+        with self.lock:
+            self.entries[key] = copy.deepcopy(result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def record_hit(self, source: str) -> None:
+        """캐시 밖(고정 바로가기 표 등)에서 처리된 조회도 통계에 반영"""
+        with self.lock:
+            self.hits[source] = self.hits.get(source, 0) + 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            sources = sorted(set(self.hits) | set(self.misses))
+            by_source = {}
+            for source in sources:
+                hits, misses = self.hits.get(source, 0), self.misses.get(source, 0)
+                by_source[source] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                }
+            return {"entries": len(self.entries), "sources": by_source}
+
+
+# 전역 의도 캐시 인스턴스
+intent_cache = IntentCache()
@@ -0,0 +1,183 @@
+"""
+로컬 의도 분류기 모듈
+글자 n-gram(해시) 특징 + 소프트맥스 선형 모델(NumPy)로 recommend/explain/reject/accept/casual/help를 분류합니다.
+Gemini가 붙인 의도 라벨을 로그로 모아 오프라인으로 학습하고(intent_train.py),
+확신도가 높은 발화는 Gemini 없이 바로 처리합니다.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+import lunch_data
+from intent_cache import normalize_utterance
+
+INTENT_LABELS = ["recommend", "explain", "reject", "accept", "casual", "help"]
+INTENT_MODEL_FILE = os.path.join(lunch_data.DATA_DIR, "intent_model.npz")
+INTENT_LOG_FILE = os.path.join(lunch_data.DATA_DIR, "intent_log.jsonl")
+INTENT_LOG_MAX_BYTES = 5 * 1024 * 1024   # 넘으면 .1 백업으로 넘기고 새로 시작 (학습 때 두 파일만 읽음)
+
+FEATURE_DIM = 4096
+NGRAM_RANGE = (1, 3)
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8   # 이 이상이면 Gemini 의도 분석을 건너뜀
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = NGRAM_RANGE) -> List[str]:
+    """정규화한 발화의 글자 n-gram (앞뒤 경계 표시 포함)"""
+    padded = f"^{normalize_utterance(text)}$"
+    low, high = ngram_range
+    return [padded[i:i + n] for n in range(low, high + 1) for i in range(len(padded) - n + 1)]
+
+
+def featurize(texts: Sequence[str], dim: int = FEATURE_DIM, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+    """발화 목록 -> (N, dim) 특징 행렬 (n-gram 해시 빈도, 행별 L2 정규화)"""
+    x = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for gram in char_ngrams(text, ngram_range):
+            # hash()는 실행마다 달라지므로 crc32로 고정
+            x[row, zlib.crc32(gram.encode("utf-8")) % dim] += 1.0
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-6)
+
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class IntentClassifier:
+    def __init__(self, weights=None, bias=None, labels: Optional[List[str]] = None,
+                 dim: int = FEATURE_DIM, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        self.weights = weights
+        self.bias = bias
+        self.labels = list(labels or INTENT_LABELS)
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+
+    @property
+    def is_trained(self) -> bool:
+        return NUMPY_AVAILABLE and self.weights is not None
+
+    # --- 학습 ---
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[str, str]], epochs: int = 300, learning_rate: float = 2.0,
+              l2: float = 1e-4, dim: int = FEATURE_DIM) -> "IntentClassifier":
+        """(발화, 의도) 목록으로 소프트맥스 회귀 학습 (전체 배치 경사하강, 결정적)"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy가 설치되어 있지 않습니다.")
+        samples = [(u, label) for u, label in samples if label in INTENT_LABELS and u]
+        if not samples:
+            raise ValueError("학습할 데이터가 없습니다.")
+        labels = [l for l in INTENT_LABELS if any(label == l for _, label in samples)]
+        index = {label: i for i, label in enumerate(labels)}
+
+        x = featurize([u for u, _ in samples], dim)
+        y = np.zeros((len(samples), len(labels)), dtype=np.float32)
+        y[np.arange(len(samples)), [index[label] for _, label in samples]] = 1.0
+
+        w = np.zeros((dim, len(labels)), dtype=np.float32)
+        b = np.zeros(len(labels), dtype=np.float32)
+        n = float(len(samples))
+        for _ in range(epochs):
+            grad = (_softmax(x @ w + b) - y) / n
+            w -= learning_rate * (x.T @ grad + l2 * w)
+            b -= learning_rate * grad.sum(axis=0)
+        return cls(w, b, labels, dim)
+
+    # --- 예측 ---
+    def predict(self, utterance: str) -> Tuple[Optional[str], float]:
+        """(의도, 확신도). 학습된 모델이 없으면 (None, 0.0)"""
+        if not self.is_trained:
+            return None, 0.0
+        probs = _softmax(featurize([utterance], self.dim, self.ngram_range) @ self.weights + self.bias)[0]
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def accuracy(self, samples: Sequence[Tuple[str, str]]) -> float:
+        if not samples:
+            return 0.0
+        return sum(1 for u, label in samples if self.predict(u)[0] == label) / len(samples)
+
+    # --- 저장/불러오기 ---
+    def save(self, path: str = INTENT_MODEL_FILE) -> None:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, weights=self.weights, bias=self.bias, labels=np.array(self.labels),
+                 dim=self.dim, ngram_range=np.array(self.ngram_range))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_FILE) -> "IntentClassifier":
+        """저장된 모델 불러오기 (없거나 numpy가 없으면 학습 안 된 빈 분류기)"""
+        if not NUMPY_AVAILABLE or not os.path.exists(path):
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls(data["weights"], data["bias"], [str(l) for l in data["labels"]],
+                           int(data["dim"]), tuple(int(n) for n in data["ngram_range"]))
+        except Exception as e:
+            print(f"Intent model load error: {e}")
+            return cls()
+
+
+# --- 학습 데이터 로그 (발화 + Gemini 라벨) ---
+_log_lock = threading.Lock()
+
+
+def log_labeled_utterance(utterance: str, intent: Optional[str], source: str = "gemini",
+                          path: Optional[str] = None) -> None:
+    """학습용으로 (발화, 의도) 한 줄 기록"""
+    if not utterance or intent not in INTENT_LABELS:
+        return
+    path = path or INTENT_LOG_FILE
+    row = {"utterance": utterance, "intent": intent, "source": source, "ts": int(time.time())}
+    try:
+        with _log_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                size = f.tell()
+            # 크기 상한: 이전 백업은 버리고 현재 파일을 .1로 넘김 (학습 시 다시 읽는 양이 최대 두 배로 고정)
+            if size > INTENT_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+    except Exception as e:
+        print(f"Intent log write error: {e}")
+
+
+async def alog_labeled_utterance(utterance: str, intent: Optional[str], source: str = "gemini",
+                                 path: Optional[str] = None) -> None:
+    """log_labeled_utterance의 asyncio 버전 (파일 쓰기를 스레드에서 실행해 이벤트 루프를 막지 않음)"""
+    await asyncio.to_thread(log_labeled_utterance, utterance, intent, source, path)
+
+
+def load_labeled_utterances(path: str = INTENT_LOG_FILE, sources: Optional[Sequence[str]] = None) -> List[Tuple[str, str]]:
+    """로그(.1 백업 포함) -> (발화, 의도) 목록. 같은 발화는 마지막 라벨만 사용"""
+    latest = {}
+    # 오래된 백업부터 읽어야 최신 라벨이 덮어씀
+    for log_path in (path + ".1", path):
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if sources and row.get("source") not in sources:
+                    continue
+                if row.get("intent") in INTENT_LABELS and row.get("utterance"):
+                    latest[normalize_utterance(row["utterance"])] = row["intent"]
+    return list(latest.items())
+
+
+# 전역 분류기 인스턴스 (모델 파일이 없으면 항상 (None, 0.0) -> 기존처럼 Gemini 사용)
+intent_classifier = IntentClassifier.load()
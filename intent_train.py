@@ -0,0 +1,59 @@
+"""
+로컬 의도 분류기 학습 도구
+봇이 기록한 발화 + Gemini 의도 라벨(intent_log.jsonl)로 분류기를 학습해 저장합니다.
+저장된 모델은 봇 서버 재시작 시 자동으로 불러옵니다.
+
+사용 예:
+    python intent_train.py
+    python intent_train.py --log my_log.jsonl --holdout 0.2
+    python intent_train.py --dry-run
+"""
+import argparse
+import random
+import sys
+
+import intent_classifier
+from intent_classifier import INTENT_LOG_FILE, INTENT_MODEL_FILE, IntentClassifier
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="로컬 의도 분류기 학습")
+    parser.add_argument("--log", default=INTENT_LOG_FILE, help="학습 데이터 (JSON Lines, 회전된 .1 백업도 함께 읽음)")
+    parser.add_argument("--out", default=INTENT_MODEL_FILE, help="모델 저장 경로 (.npz)")
+    parser.add_argument("--source", action="append", help="사용할 라벨 출처 (기본: 전부)")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--holdout", type=float, default=0.2, help="검증용으로 떼어 둘 비율")
+    parser.add_argument("--threshold", type=float, default=intent_classifier.DEFAULT_CONFIDENCE_THRESHOLD)
+    parser.add_argument("--dry-run", action="store_true", help="학습/검증만 하고 저장하지 않음")
+    args = parser.parse_args(argv)
+
+    if not intent_classifier.NUMPY_AVAILABLE:
+        print("❌ numpy가 설치되어 있지 않습니다. (pip install numpy)")
+        return 1
+
+    samples = intent_classifier.load_labeled_utterances(args.log, sources=args.source)
+    if not samples:
+        print(f"❌ 학습 데이터가 없습니다: {args.log}")
+        return 1
+
+    random.Random(0).shuffle(samples)
+    n_holdout = int(len(samples) * args.holdout) if len(samples) >= 10 else 0
+    holdout, train = samples[:n_holdout], samples[n_holdout:]
+
+    model = IntentClassifier.train(train, epochs=args.epochs)
+    print(f"✅ 학습 완료: {len(train)}개 / 학습 정확도 {model.accuracy(train):.1%}")
+    if holdout:
+        confident = [(u, label) for u, label in holdout if model.predict(u)[1] >= args.threshold]
+        print(f"📊 검증 {len(holdout)}개: 정확도 {model.accuracy(holdout):.1%}")
+        print(f"📊 확신도 {args.threshold} 이상: {len(confident)}개 ({len(confident) / len(holdout):.1%}), "
+              f"정확도 {model.accuracy(confident):.1%}")
+
+    if args.dry_run:
+        return 0
+    model.save(args.out)
+    print(f"💾 저장: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
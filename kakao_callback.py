@@ -0,0 +1,183 @@
+"""
+카카오 콜백 모듈
+카카오 스킬 콜백(useCallback)으로 느린 응답(Gemini)을 나중에 보내기 위한 전송기입니다.
+엔드포인트는 먼저 "잠시만요" 응답(useCallback)을 돌려주고, 최종 응답이 준비되면
+정해진 수의 워커가 callbackUrl로 POST 합니다 (실패하면 백오프로 재시도, 콜백 URL 유효 시간 안에서만).
+응답을 기다리는 일은 워커 밖에서 하므로, 느린 응답이 워커를 붙잡아 다른 콜백 전송을 막지 않습니다.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+    requests = None
+
+CALLBACK_WORKERS = 4          # 동시에 전송하는 콜백 수
+CALLBACK_QUEUE_SIZE = 64      # 대기 + 전송 전 콜백이 이보다 많으면 콜백을 받지 않음 (기존 방식으로 응답)
+CALLBACK_TTL_SEC = 60.0       # 카카오 callbackUrl 유효 시간 (요청 수신 후 1분)
+DELIVERY_RESERVE_SEC = 8.0    # 유효 시간 중 전송/재시도용으로 남겨 둘 시간
+POST_TIMEOUT_SEC = 5.0
+MAX_ATTEMPTS = 3
+RETRY_BASE_SEC = 0.5          # 재시도 간격 0.5 -> 1 -> 2초
+
+
+def callback_ack_response(text: str) -> Dict:
+    """콜백 사용 응답 (카카오가 사용자에게 대기 문구를 보여 주고 callbackUrl 응답을 기다림)"""
+    return {"version": "2.0", "useCallback": True, "data": {"text": text}}
+
+
+def _retryable_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+class CallbackDispatcher:
+    def __init__(self, workers: int = CALLBACK_WORKERS, queue_size: int = CALLBACK_QUEUE_SIZE,
+                 ttl_sec: float = CALLBACK_TTL_SEC, max_attempts: int = MAX_ATTEMPTS,
+                 retry_base_sec: float = RETRY_BASE_SEC, transport: Any = None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl_sec = ttl_sec
+        self.max_attempts = max_attempts
+        self.retry_base_sec = retry_base_sec
+        self.transport = transport    # 테스트용 httpx 전송 계층 (없으면 실제 네트워크)
+        self._queue: Optional[asyncio.Queue] = None   # 준비된 응답 (url, 본문, 만료 시각)
+        self._tasks = []
+        self._waiting = set()                          # 응답을 기다리는 중인 콜백
+        self._client = None
+        self.busy = 0
+        self.counters = {"submitted": 0, "rejected": 0, "delivered": 0, "failed": 0, "retries": 0, "fallbacks": 0}
+
+    # --- 워커 ---
+    def _ensure_workers(self) -> asyncio.Queue:
+        # 이벤트 루프 안에서 처음 쓸 때 시작 (루프가 바뀌었으면 새로)
+        loop = asyncio.get_running_loop()
+        if self._queue is None or any(t.get_loop() is not loop for t in self._tasks) or all(t.done() for t in self._tasks):
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._waiting = set()
+            self._client = None
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        return self._queue
+
+    def submit(self, callback_url: str, result: Awaitable[Dict], fallback: Callable[[], Dict],
+               received_at: Optional[float] = None) -> bool:
+        """
+        최종 응답(result)이 준비되면 callback_url로 전송하도록 예약.
+        result가 실패하거나 유효 시간 안에 끝나지 않으면 fallback()을 전송. 큐가 가득 차면 False
+        """
+        queue = self._ensure_workers()
+        if len(self._waiting) + queue.qsize() >= self.queue_size:
+            self.counters["rejected"] += 1
+            return False
+        waiter = asyncio.ensure_future(self._wait_for_result(callback_url, result, fallback, received_at or time.time()))
+        self._waiting.add(waiter)
+        waiter.add_done_callback(self._waiting.discard)
+        self.counters["submitted"] += 1
+        return True
+
+    async def _wait_for_result(self, callback_url: str, result: Awaitable[Dict], fallback: Callable[[], Dict],
+                               received_at: float) -> None:
+        """워커 밖에서 최종 응답을 기다렸다가 (늦거나 실패하면 fallback) 전송 큐에 넣음"""
+        wait = received_at + self.ttl_sec - DELIVERY_RESERVE_SEC - time.time()
+        try:
+            body = await asyncio.wait_for(result, timeout=max(0.0, wait))
+        except (asyncio.TimeoutError, Exception) as e:
+            print(f"Kakao callback: final answer not ready ({e!r}); sending fallback")
+            self.counters["fallbacks"] += 1
+            try:
+                body = fallback()
+            except Exception as fallback_error:
+                self.counters["failed"] += 1
+                print(f"Kakao callback error: {fallback_error}")
+                return
+        await self._queue.put((callback_url, body, received_at + self.ttl_sec))
+
+    async def _worker(self) -> None:
+        while True:
+            callback_url, body, expires_at = await self._queue.get()
+            self.busy += 1
+            try:
+                if await self.post(callback_url, body, expires_at=expires_at):
+                    self.counters["delivered"] += 1
+                else:
+                    self.counters["failed"] += 1
+            except Exception as e:
+                self.counters["failed"] += 1
+                print(f"Kakao callback error: {e}")
+            finally:
+                self.busy -= 1
+                self._queue.task_done()
+
+    # --- 전송 ---
+    async def post(self, url: str, body: Dict, expires_at: Optional[float] = None) -> bool:
+        """callback_url로 POST (네트워크 오류/429/5xx는 백오프 재시도, 그 외 4xx는 바로 포기)"""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.counters["retries"] += 1
+                await asyncio.sleep(self.retry_base_sec * (2 ** (attempt - 1)))
+            if expires_at is not None and time.time() >= expires_at:
+                print("Kakao callback: callbackUrl expired")
+                return False
+            try:
+                status = await self._send(url, body)
+            except Exception as e:
+                print(f"Kakao callback POST error (attempt {attempt + 1}): {e}")
+                continue
+            if 200 <= status < 300:
+                return True
+            print(f"Kakao callback POST status {status} (attempt {attempt + 1})")
+            if not _retryable_status(status):
+                return False
+        return False
+
+    async def _send(self, url: str, body: Dict) -> int:
+        if HTTPX_AVAILABLE:
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=POST_TIMEOUT_SEC, transport=self.transport)
+            response = await self._client.post(url, json=body)
+            return response.status_code
+        if REQUESTS_AVAILABLE:
+            response = await asyncio.to_thread(requests.post, url, json=body, timeout=POST_TIMEOUT_SEC)
+            return response.status_code
+        raise RuntimeError("httpx/requests not installed")
+
+    # --- 종료/상태 ---
+    async def join(self) -> None:
+        """예약된 콜백을 모두 처리할 때까지 대기 (테스트/종료용)"""
+        while self._waiting:
+            await asyncio.gather(*list(self._waiting), return_exceptions=True)
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def aclose(self) -> None:
+        for task in [*self._waiting, *self._tasks]:
+            task.cancel()
+        self._waiting = set()
+        self._tasks = []
+        self._queue = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "waiting": len(self._waiting),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "busy_workers": self.busy,
+            "workers": self.workers,
+        }
+
+
+# 전역 카카오 콜백 전송기
+kakao_callbacks = CallbackDispatcher()
@@ -0,0 +1,171 @@
+"""
+키워드 매칭 모듈
+여러 키워드 사전(요리/태그/날씨/기분/의도 단어)을 Aho–Corasick 오토마톤 하나로 묶어
+발화를 한 번만 훑으면서 모든 (분류, 라벨, 위치) 매칭을 찾습니다.
+오타/띄어쓰기 변형은 자모 단위 퍼지 색인(FuzzyKeywordIndex)으로 보완합니다.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from hangul_text import compact_with_positions, decompose, within_one_edit
+
+
+class KeywordHit(NamedTuple):
+    category: str   # 예: "cuisine", "weather", "intent"
+    label: str      # 예: "한식", "비", "greeting"
+    position: int   # 발화 내 시작 위치
+    keyword: str
+
+
+class KeywordMatcher:
+    """Aho–Corasick 다중 패턴 매처 (한 번 컴파일 후 여러 스레드에서 읽기 전용으로 사용)"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, str]]] = [[]]
+        self._compiled = False
+
+    def add(self, keyword: str, category: str, label: str) -> None:
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        payload = (category, label, keyword)
+        if payload not in self._out[node]:
+            self._out[node].append(payload)
+        self._compiled = False
+
+    def add_table(self, category: str, table: Dict[str, Iterable[str]]) -> None:
+        """{라벨: [키워드, ...]} 사전을 한 분류로 등록"""
+        for label, keywords in table.items():
+            for keyword in keywords:
+                self.add(keyword, category, label)
+
+    def compile(self) -> "KeywordMatcher":
+        """실패 링크 계산 (BFS). 출력 목록에 접미사 패턴도 합쳐 둠"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + [p for p in self._out[self._fail[child]] if p not in self._out[child]]
+        self._compiled = True
+        return self
+
+    def find_all(self, text: str) -> List[KeywordHit]:
+        """text 안의 모든 키워드 매칭 (겹치는 매칭 포함, 시작 위치 순)"""
+        if not self._compiled:
+            self.compile()
+        hits = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for category, label, keyword in self._out[node]:
+                hits.append(KeywordHit(category, label, i - len(keyword) + 1, keyword))
+        hits.sort(key=lambda h: h.position)
+        return hits
+
+
+class FuzzyKeywordIndex:
+    """
+    두 글자 이상 키워드를 자모로 분해해 미리 색인 (삭제 이웃 방식).
+    공백을 뺀 발화의 같은 길이 구간을 찾아보며, 띄어쓰기 변형("배 고파")과
+    세 글자 이상 키워드의 자모 편집 거리 1 오타("배곺파", "스트레쓰")를 찾습니다.
+    """
+
+    def __init__(self, min_fuzzy_len: int = 3):
+        # 이보다 짧은 키워드는 띄어쓰기 변형만 허용 (두 글자 단어는 오타 1개 허용 시 "영화"->"영하"처럼 오인식이 많음)
+        self.min_fuzzy_len = min_fuzzy_len
+        self.exact: Dict[str, List[Tuple[str, str, str]]] = {}
+        self.deletes: Dict[str, Set[str]] = {}
+        self.lengths: Set[int] = set()
+
+    def add(self, keyword: str, category: str, label: str) -> None:
+        compact, _ = compact_with_positions(keyword)
+        if len(compact) < 2:
+            return
+        jamo = decompose(compact)
+        payload = (category, label, keyword)
+        rows = self.exact.setdefault(jamo, [])
+        if payload not in rows:
+            rows.append(payload)
+        self.lengths.add(len(compact))
+        if len(compact) >= self.min_fuzzy_len:
+            for variant in {jamo[:i] + jamo[i + 1:] for i in range(len(jamo))} | {jamo}:
+                self.deletes.setdefault(variant, set()).add(jamo)
+
+    def add_table(self, category: str, table: Dict[str, Iterable[str]]) -> None:
+        for label, keywords in table.items():
+            for keyword in keywords:
+                self.add(keyword, category, label)
+
+    def _lookup(self, window_jamo: str) -> List[Tuple[str, str, str]]:
+        rows = self.exact.get(window_jamo)
+        if rows:
+            return rows
+        candidates = set(self.deletes.get(window_jamo, ()))
+        for i in range(len(window_jamo)):
+            candidates |= self.deletes.get(window_jamo[:i] + window_jamo[i + 1:], set())
+        matched = [k for k in candidates if k[0] == window_jamo[0] and within_one_edit(k, window_jamo)]
+        # 서로 다른 키워드 여러 개와 비슷하면 애매하므로 버림 (한 키워드가 여러 분류에 속하는 건 괜찮음)
+        if len(matched) != 1:
+            return []
+        return self.exact[matched[0]]
+
+    def find_all(self, text: str, exclude: Iterable[KeywordHit] = ()) -> List[KeywordHit]:
+        """정확 매칭(exclude)과 겹치지 않는 구간에서 띄어쓰기/오타 변형 매칭"""
+        covered = set()
+        for hit in exclude:
+            # 한 글자 키워드("응", "고", "비")는 우연히 걸리는 경우가 많아 구간을 막지 않음
+            if len(hit.keyword) >= 2:
+                covered.update(range(hit.position, hit.position + len(hit.keyword)))
+        compact, positions = compact_with_positions(text)
+        hits, seen = [], set()
+        for length in sorted(self.lengths):
+            for start in range(len(compact) - length + 1):
+                span = positions[start:start + length]
+                if covered.intersection(span):
+                    continue
+                # 두 글자 구간이 띄어쓰기를 건너뛰면 ("말고 기다려" -> "고기") 오인식이 많으므로 제외
+                if length < 3 and span[-1] - span[0] != length - 1:
+                    continue
+                for category, label, keyword in self._lookup(decompose(compact[start:start + length])):
+                    if (category, label, span[0]) not in seen:
+                        seen.add((category, label, span[0]))
+                        hits.append(KeywordHit(category, label, span[0], keyword))
+        hits.sort(key=lambda h: h.position)
+        return hits
+
+
+def hit_labels(hits: Iterable[KeywordHit]) -> Dict[str, Set[str]]:
+    """매칭 목록 -> {분류: {라벨, ...}}"""
+    labels: Dict[str, Set[str]] = {}
+    for hit in hits:
+        labels.setdefault(hit.category, set()).add(hit.label)
+    return labels
+
+
+def first_label(order: Iterable[str], found: Set[Any]):
+    """사전 순서(우선순위)대로 처음 발견된 라벨"""
+    for label in order:
+        if label in found:
+            return label
+    return None
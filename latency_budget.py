@@ -0,0 +1,96 @@
+"""
+지연 시간 예산 모듈
+Gemini 호출 종류(의도 분석 / 문구 생성)별 최근 응답 시간을 모아 p50/p90을 계산하고,
+요청의 남은 전체 예산과 합쳐 이번 호출을 얼마나 기다릴지(헤지 마감)를 정합니다.
+마감 안에 오지 않으면 로컬 결과로 응답하고, Gemini 호출은 백그라운드에서 마저 끝나 캐시를 채웁니다.
+"""
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+WINDOW_SIZE = 200          # 종류별로 최근 이만큼의 응답 시간만 사용
+MIN_SAMPLES = 10           # 이보다 적으면 고정 상한(ceiling)까지 기다림
+MIN_WAIT_SEC = 0.6         # 아무리 빨라도 이만큼은 기다려 줌
+HEADROOM = 1.15            # p90에 약간의 여유
+RESPONSE_RESERVE_SEC = 0.4 # 전체 예산에서 응답 조립/전송용으로 남겨 둘 시간
+
+
+class LatencyTracker:
+    def __init__(self, window: int = WINDOW_SIZE, min_samples: int = MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self.samples: Dict[str, deque] = {}
+        self.timeouts: Dict[str, int] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, seconds: float, timed_out: bool = False) -> None:
+        """응답 시간 기록 (타임아웃이면 실제 시간은 그 이상이지만 타임아웃 값으로 기록)"""
+        with self.lock:
+            self.samples.setdefault(kind, deque(maxlen=self.window)).append(seconds)
+            if timed_out:
+                self.timeouts[kind] = self.timeouts.get(kind, 0) + 1
+
+    def record_outcome(self, kind: str, winner: str) -> None:
+        """헤지 결과 ("gemini" / "local") 집계"""
+        with self.lock:
+            row = self.outcomes.setdefault(kind, {})
+            row[winner] = row.get(winner, 0) + 1
+
+    def percentile(self, kind: str, p: float) -> Optional[float]:
+        """최근 응답 시간의 p 백분위 (표본이 min_samples보다 적으면 None)"""
+        with self.lock:
+            values = sorted(self.samples.get(kind, ()))
+        if len(values) < self.min_samples:
+            return None
+        rank = max(0, math.ceil(p / 100 * len(values)) - 1)
+        return values[rank]
+
+    def deadline(self, kind: str, ceiling: float, remaining: Optional[float] = None,
+                 floor: float = MIN_WAIT_SEC) -> float:
+        """
+        이번 호출을 기다릴 시간(초).
+        - 표본이 부족하면 ceiling, 있으면 p90(+여유)을 [floor, ceiling]로 자름
+        - 중앙값조차 그 시간에 닿으면(느린 날) 기다리지 않음 (0)
+        - 요청의 남은 전체 예산(remaining)에서 응답 조립 시간을 뺀 값을 넘지 않음
+        """
+        wait = ceiling
+        p90 = self.percentile(kind, 90)
+        if p90 is not None:
+            wait = min(ceiling, max(floor, p90 * HEADROOM))
+            p50 = self.percentile(kind, 50)
+            # 타임아웃은 상한 값으로 기록되므로, 중앙값이 상한에 닿았다면 절반 이상이 마감을 넘긴 것
+            if p50 is not None and p50 >= wait:
+                wait = 0.0
+        if remaining is not None:
+            wait = min(wait, max(0.0, remaining - RESPONSE_RESERVE_SEC))
+        return wait
+
+    def reset(self) -> None:
+        with self.lock:
+            self.samples.clear()
+            self.timeouts.clear()
+            self.outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        kinds = sorted(set(self.samples) | set(self.outcomes))
+        result = {}
+        for kind in kinds:
+            p50, p90 = self.percentile(kind, 50), self.percentile(kind, 90)
+            with self.lock:
+                count = len(self.samples.get(kind, ()))
+                timeouts = self.timeouts.get(kind, 0)
+                outcomes = dict(self.outcomes.get(kind, {}))
+            result[kind] = {
+                "samples": count,
+                "timeouts": timeouts,
+                "p50_sec": round(p50, 3) if p50 is not None else None,
+                "p90_sec": round(p90, 3) if p90 is not None else None,
+                "outcomes": outcomes,
+            }
+        return result
+
+
+# 전역 Gemini 응답 시간 기록
+gemini_latency = LatencyTracker()
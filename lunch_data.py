@@ -1,15 +1,22 @@
 
 # 메뉴 데이터베이스
 # (이름, 구역, 태그 리스트, 기본 카테고리명, 음식 종류)
+import csv
 import json
 import os
 import shutil
+import stat
 import sys
+import tempfile
+import threading
 
 # 구역 상수
 AREA_BASEMENT = "회사 지하식당"
 AREA_YTN = "YTN 지하식당"
 AREA_MEOKJA = "건너편 먹자골목"
+AREA_FIRST_FLOOR = "회사 1층"   # 비싼 곳 (플렉스 전용)
+
+VALID_AREAS = [AREA_BASEMENT, AREA_YTN, AREA_MEOKJA, AREA_FIRST_FLOOR]
 
 # 태그 상수
 TAG_HEAVY = "heavy"      # 무거운/든든한
@@ -22,6 +29,8 @@ TAG_MEAT = "meat"        # 고기
 TAG_HOT = "hot"          # 뜨거운 요리
 TAG_PREMIUM = "premium"    # 비싼/고급 (월급날, 법카 등)
 
+VALID_TAGS = [TAG_HEAVY, TAG_LIGHT, TAG_SOUP, TAG_SPICY, TAG_NOODLE, TAG_RICE, TAG_MEAT, TAG_HOT, TAG_PREMIUM]
+
 # 음식 종류 (Cuisine)
 CUISINE_KOREAN = "한식"
 CUISINE_CHINESE = "중식"
@@ -89,110 +98,357 @@ def load_menus():
         print(f"Error loading menus: {e}")
         return list(DEFAULT_MENUS)
 
+MENUS_FILE_MODE = 0o644   # 새로 만드는 menus.json 권한 (기존 파일은 그 권한 유지)
+
+# menus.json 읽기-수정-쓰기를 한 번에 하나씩 (Streamlit은 세션마다 스레드)
+_menus_lock = threading.RLock()
+
+def _menus_file_mode():
+    try:
+        return stat.S_IMODE(os.stat(JSON_FILE).st_mode)
+    except FileNotFoundError:
+        return MENUS_FILE_MODE
+
+def _write_menus(menus):
+    """메뉴 리스트를 임시 파일에 쓴 뒤 교체 (원자적 저장, 중간에 죽어도 파일이 깨지지 않음)"""
+    target_dir = os.path.dirname(JSON_FILE) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".menus_", suffix=".json", dir=target_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(menus, f, ensure_ascii=False, indent=4)
+        # mkstemp는 0600으로 만들므로 기존 파일 권한(없으면 MENUS_FILE_MODE)을 유지
+        os.chmod(tmp_path, _menus_file_mode())
+        os.replace(tmp_path, JSON_FILE)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# 메뉴 변경 리스너: callback(변경된 메뉴 이름 목록) (응답 문구 캐시 무효화 등)
+_menu_listeners = []
+
+def add_menu_listener(callback):
+    if callback not in _menu_listeners:
+        _menu_listeners.append(callback)
+
+def remove_menu_listener(callback):
+    if callback in _menu_listeners:
+        _menu_listeners.remove(callback)
+
+def _notify_menu_change(names):
+    for callback in list(_menu_listeners):
+        try:
+            callback(list(names))
+        except Exception as e:
+            print(f"Menu listener error: {e}")
+
 def save_new_menu(name, area, category, cuisine, tags):
     """새 메뉴 저장"""
-    menus = load_menus()
-    
-    # 중복 체크 (이름 기준)
-    for m in menus:
-        if m['name'] == name:
-            return False # 이미 존재
-            
-    new_menu = {
+    with _menus_lock:
+        menus = load_menus()
+
+        # 중복 체크 (이름 기준)
+        for m in menus:
+            if m['name'] == name:
+                return False # 이미 존재
+
+        new_menu = {
+            "name": name,
+            "area": area,
+            "category": category,
+            "cuisine": cuisine,
+            "tags": tags
+        }
+        menus.append(new_menu)
+
+        try:
+            _write_menus(menus)
+            refresh_menus()
+        except Exception as e:
+            print(f"Error saving menu: {e}")
+            return False
+    _notify_menu_change([name])
+    return True
+
+def delete_menu(name):
+    """메뉴 삭제"""
+    with _menus_lock:
+        menus = load_menus() # 파일에서 최신 로드
+
+        # 해당 이름 제외하고 필터링
+        new_menus = [m for m in menus if m['name'] != name]
+
+        if len(menus) == len(new_menus):
+            return False # 삭제할 게 없음
+
+        try:
+            _write_menus(new_menus)
+            refresh_menus() # 전역 변수 갱신
+        except Exception as e:
+            print(f"Error deleting menu: {e}")
+            return False
+    _notify_menu_change([name])
+    return True
+
+def update_menu(original_name, new_data):
+    """메뉴 정보 수정"""
+    with _menus_lock:
+        menus = load_menus()
+
+        # 1. 이름이 변경되었다면 중복 체크
+        if original_name != new_data['name']:
+            for m in menus:
+                if m['name'] == new_data['name']:
+                    return False, "이미 존재하는 이름입니다."
+
+        # 2. 찾아서 업데이트
+        found = False
+        for i, m in enumerate(menus):
+            if m['name'] == original_name:
+                menus[i] = new_data
+                found = True
+                break
+
+        if not found:
+            return False, "수정할 메뉴를 찾을 수 없습니다."
+
+        try:
+            _write_menus(menus)
+            refresh_menus()
+        except Exception as e:
+            print(f"Error updating menu: {e}")
+            return False, f"저장 중 오류 발생: {e}"
+    _notify_menu_change({original_name, new_data['name']})
+    return True, "수정되었습니다."
+
+# --- 대량 가져오기/내보내기 (CSV / JSON Lines) ---
+# CSV 헤더: name,area,category,cuisine,tags (tags는 "soup|spicy" 처럼 | 로 구분)
+MENU_FIELDS = ["name", "area", "category", "cuisine", "tags"]
+
+def _detect_menu_format(path, fmt=None):
+    """확장자로 파일 형식 추정 (.csv -> csv, 그 외 -> jsonl)"""
+    if fmt:
+        return fmt.lower()
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def iter_menu_rows(path, fmt=None):
+    """파일을 한 줄씩 읽어 (줄 번호, 원본 dict) 를 돌려줌. JSON 파싱 실패 줄은 dict 대신 None."""
+    fmt = _detect_menu_format(path, fmt)
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == "csv":
+            # 1번 줄은 헤더
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_no, row if isinstance(row, dict) else None
+
+def validate_menu_row(row):
+    """원본 행을 메뉴 dict로 정규화. 반환: (menu, 오류 메시지)"""
+    if not isinstance(row, dict):
+        return None, "JSON 형식이 올바르지 않습니다."
+
+    # 문자열 필드는 타입부터 확인 (숫자 등이 들어와도 파일 전체가 아니라 그 행만 오류)
+    fields = {}
+    for key in ("name", "area", "cuisine", "category"):
+        value = row.get(key)
+        if value is not None and not isinstance(value, str):
+            return None, f"'{key}' 값은 문자열이어야 합니다: {value!r}"
+        fields[key] = (value or "").strip()
+
+    name = fields["name"]
+    if not name:
+        return None, "이름이 비어 있습니다."
+
+    area = fields["area"]
+    if area not in VALID_AREAS:
+        return None, f"알 수 없는 구역입니다: '{area}'"
+
+    tags = row.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.replace(",", "|").split("|")
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        return None, f"'tags' 값은 문자열 목록이어야 합니다: {row.get('tags')!r}"
+    tags = [t.strip() for t in tags if t and t.strip()]
+    unknown = [t for t in tags if t not in VALID_TAGS]
+    if unknown:
+        return None, f"알 수 없는 태그입니다: {', '.join(unknown)}"
+
+    cuisine = fields["cuisine"] or CUISINE_OTHER
+    category = fields["category"] or cuisine
+    return {
         "name": name,
         "area": area,
         "category": category,
         "cuisine": cuisine,
         "tags": tags
-    }
-    menus.append(new_menu)
-    
-    try:
-        with open(JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(menus, f, ensure_ascii=False, indent=4)
-        return True
-    except Exception as e:
-        print(f"Error saving menu: {e}")
-        return False
+    }, None
 
-def delete_menu(name):
-    """메뉴 삭제"""
-    menus = load_menus() # 파일에서 최신 로드
-    
-    # 해당 이름 제외하고 필터링
-    new_menus = [m for m in menus if m['name'] != name]
-    
-    if len(menus) == len(new_menus):
-         return False # 삭제할 게 없음
-         
-    try:
-        with open(JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(new_menus, f, ensure_ascii=False, indent=4)
-        refresh_menus() # 전역 변수 갱신
-        return True
-    except Exception as e:
-        print(f"Error deleting menu: {e}")
-        return False
+def bulk_import_menus(path, fmt=None, dry_run=False):
+    """
+    CSV/JSON Lines 파일의 메뉴를 한 번에 추가 (검증 -> 이름 중복 제거 -> 한 번의 원자적 저장)
+    반환: {"added": [이름], "duplicates": [이름], "errors": [(줄 번호, 메시지)]}
+    """
+    # 파일을 먼저 다 읽고 검증한 뒤, 잠금 안에서 최신 메뉴에 합쳐 저장 (그 사이 다른 저장이 사라지지 않도록)
+    rows = []
+    result = {"added": [], "duplicates": [], "errors": []}
+    for line_no, row in iter_menu_rows(path, fmt):
+        menu, error = validate_menu_row(row)
+        if error:
+            result["errors"].append((line_no, error))
+        else:
+            rows.append(menu)
 
-def update_menu(original_name, new_data):
-    """메뉴 정보 수정"""
-    menus = load_menus()
-    
-    # 1. 이름이 변경되었다면 중복 체크
-    if original_name != new_data['name']:
-        for m in menus:
-            if m['name'] == new_data['name']:
-                return False, "이미 존재하는 이름입니다."
-    
-    # 2. 찾아서 업데이트
-    found = False
-    for i, m in enumerate(menus):
-        if m['name'] == original_name:
-            menus[i] = new_data
-            found = True
-            break
-            
-    if not found:
-        return False, "수정할 메뉴를 찾을 수 없습니다."
-        
-    try:
-        with open(JSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(menus, f, ensure_ascii=False, indent=4)
+    with _menus_lock:
+        menus = load_menus()
+        name_index = {m['name'] for m in menus}
+        for menu in rows:
+            # 기존 데이터 + 같은 파일 안의 중복 모두 제외
+            if menu['name'] in name_index:
+                result["duplicates"].append(menu['name'])
+                continue
+            name_index.add(menu['name'])
+            menus.append(menu)
+            result["added"].append(menu['name'])
+
+        if not result["added"] or dry_run:
+            return result
+        _write_menus(menus)
         refresh_menus()
-        return True, "수정되었습니다."
-    except Exception as e:
-        print(f"Error updating menu: {e}")
-        return False, f"저장 중 오류 발생: {e}"
+    _notify_menu_change(result["added"])
+    return result
+
+def export_menus(path, fmt=None):
+    """현재 메뉴를 CSV/JSON Lines 파일로 한 줄씩 내보냄. 반환: 내보낸 개수"""
+    fmt = _detect_menu_format(path, fmt)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MENU_FIELDS) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for m in load_menus():
+            row = {field: m.get(field, "") for field in MENU_FIELDS}
+            row["tags"] = list(m.get("tags", []))
+            if writer:
+                row["tags"] = "|".join(row["tags"])
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
 
 DEFAULT_CONFIG = {"location": "Seoul"}
 
-def load_config():
-    """설정 로드"""
+# 설정 캐시: 한 번 읽은 뒤 파일 mtime이 바뀔 때만 다시 파싱
+_config_cache = {"data": None, "mtime": None}
+_config_listeners = []
+_config_lock = threading.Lock()
+
+def _config_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def _read_config_file():
     if not os.path.exists(CONFIG_FILE):
-        return DEFAULT_CONFIG
+        return dict(DEFAULT_CONFIG)
     try:
         with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            data = json.load(f)
+        return data if isinstance(data, dict) else dict(DEFAULT_CONFIG)
     except:
-        return DEFAULT_CONFIG
+        return dict(DEFAULT_CONFIG)
+
+def _update_config_cache(data, mtime):
+    """캐시 교체 후 내용이 바뀌었으면 리스너 호출"""
+    with _config_lock:
+        old = _config_cache["data"]
+        _config_cache["data"] = data
+        _config_cache["mtime"] = mtime
+    if old is not None and old != data:
+        for callback in list(_config_listeners):
+            try:
+                callback(dict(old), dict(data))
+            except Exception as e:
+                print(f"Config listener error: {e}")
+
+def add_config_listener(callback):
+    """설정 변경 시 callback(old_config, new_config) 호출 (날씨 캐시 무효화 등)"""
+    if callback not in _config_listeners:
+        _config_listeners.append(callback)
+
+def remove_config_listener(callback):
+    if callback in _config_listeners:
+        _config_listeners.remove(callback)
+
+def load_config():
+    """설정 로드 (메모리 캐시, 파일이 바뀐 경우에만 다시 읽음)"""
+    mtime = _config_mtime()
+    with _config_lock:
+        cached = _config_cache["data"]
+        if cached is not None and _config_cache["mtime"] == mtime:
+            return dict(cached)
+    data = _read_config_file()
+    _update_config_cache(data, mtime)
+    return dict(data)
 
 def save_config(new_config):
-    """설정 저장"""
+    """설정 저장 (메모리 캐시도 함께 갱신)"""
     try:
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(new_config, f, indent=4)
+        _update_config_cache(dict(new_config), _config_mtime())
         return True
     except Exception as e:
         print(f"Config save error: {e}")
         return False
 
-# 초기 로드 (전역 변수로 사용될 때)
-MENUS = load_menus()
+# menus.json 감시: 다른 프로세스(app.py/main.py/대량 가져오기 CLI)가 고친 파일도 mtime으로 감지
+_menus_state = {"mtime": None, "snapshot": {}}
+
+def _menus_mtime():
+    try:
+        return os.stat(JSON_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def _changed_menu_names(old, new):
+    """이름 기준으로 추가/수정/삭제된 메뉴 이름 목록"""
+    return sorted(name for name in set(old) | set(new) if old.get(name) != new.get(name))
 
 def refresh_menus():
-    """메뉴 다시 로드 (추가 후 호출용)"""
+    """메뉴 다시 로드 (추가 후 호출용). 반환: 직전 로드 대비 바뀐 메뉴 이름 목록"""
     global MENUS
-    MENUS = load_menus()
+    with _menus_lock:
+        # 읽기 전에 mtime을 잡아 두면 그 사이 바뀐 파일은 다음 확인에서 다시 읽힘
+        mtime = _menus_mtime()
+        MENUS = load_menus()
+        snapshot = {m.get('name'): m for m in MENUS}
+        changed = _changed_menu_names(_menus_state["snapshot"], snapshot)
+        _menus_state["mtime"] = mtime
+        _menus_state["snapshot"] = snapshot
+    return changed
+
+def check_menus_file():
+    """menus.json이 밖에서 바뀌었으면 다시 읽고 바뀐 메뉴 이름으로 리스너 호출. 반환: 바뀐 이름 목록"""
+    if _menus_mtime() == _menus_state["mtime"]:
+        return []
+    changed = refresh_menus()
+    if changed:
+        _notify_menu_change(changed)
+    return changed
+
+# 초기 로드 (전역 변수로 사용될 때)
+MENUS = []
+refresh_menus()
 
 def get_menus_by_area():
     """지역별로 그룹화된 가게 목록 반환"""
@@ -0,0 +1,47 @@
+"""
+메뉴 대량 가져오기/내보내기 도구
+푸드코트처럼 가게를 한꺼번에 등록할 때 사용합니다.
+
+사용 예:
+    python menu_bulk.py import food_court.csv
+    python menu_bulk.py import food_court.jsonl --dry-run
+    python menu_bulk.py export menus_backup.csv
+"""
+import argparse
+import sys
+
+import lunch_data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="메뉴 CSV / JSON Lines 가져오기/내보내기")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="파일의 메뉴를 한 번에 추가")
+    p_import.add_argument("path")
+    p_import.add_argument("--format", choices=["csv", "jsonl"], default=None)
+    p_import.add_argument("--dry-run", action="store_true", help="검증만 하고 저장하지 않음")
+
+    p_export = sub.add_parser("export", help="현재 메뉴를 파일로 내보내기")
+    p_export.add_argument("path")
+    p_export.add_argument("--format", choices=["csv", "jsonl"], default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        count = lunch_data.export_menus(args.path, fmt=args.format)
+        print(f"✅ {count}개 메뉴를 내보냈습니다: {args.path}")
+        return 0
+
+    result = lunch_data.bulk_import_menus(args.path, fmt=args.format, dry_run=args.dry_run)
+    for line_no, msg in result["errors"]:
+        print(f"❌ {line_no}번째 줄: {msg}")
+    for name in result["duplicates"]:
+        print(f"⏭️ 이미 있는 가게 건너뜀: {name}")
+    verb = "추가 예정" if args.dry_run else "추가 완료"
+    print(f"✅ {len(result['added'])}개 {verb} / 중복 {len(result['duplicates'])}개 / 오류 {len(result['errors'])}개")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
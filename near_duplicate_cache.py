@@ -0,0 +1,190 @@
+"""
+유사 발화 캐시 모듈
+글자 n-gram MinHash + LSH로 "점심 뭐먹지?" / "점심 뭐 먹지ㅠ"처럼 표현만 조금 다른 발화를 찾아
+이전 Gemini 의도 분석 결과를 재사용합니다. (외부 서비스 없음)
+"중식 말고 한식" / "한식 말고 중식"처럼 글자는 거의 같아도 조건이 다른 발화가 있으므로
+재사용은 의도(intent/casual_type)까지만 하고, 조건(음식 종류/날씨/기분)은 새 발화에서 다시 뽑아야 합니다.
+재사용한 결과 중 일부는 나중에 실제 분석 결과와 (의도 + 조건) 비교해 오답(false hit) 비율을 기록합니다.
+"""
+import copy
+import re
+import threading
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+NUM_PERM = 64            # MinHash 서명 길이
+LSH_BANDS = 16           # 밴드 16개 x 4행 -> 자카드 ~0.5부터 후보로 잡힘
+SHINGLE_SIZE = 2
+DEFAULT_SIMILARITY = 0.7 # 실제 자카드 유사도가 이 이상이어야 재사용
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+REUSABLE_FIELDS = ("intent", "casual_type")               # 유사 발화에서 그대로 가져다 쓰는 항목
+AUDIT_FIELDS = ("intent", "cuisine_filters", "weather", "mood")  # 감사 때 실제 분석 결과와 비교하는 항목
+
+# 의미 없는 공백/문장부호/감탄 자모는 비교에서 제외
+_NOISE = re.compile(r"[\s?!.,~…]+")
+_TRAILING_JAMO = re.compile(r"[ㅠㅜㅋㅎ]+$")
+
+
+def canonical_text(utterance: str) -> str:
+    text = _NOISE.sub("", (utterance or "").lower())
+    return _TRAILING_JAMO.sub("", text)
+
+
+def shingles(utterance: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    text = canonical_text(utterance)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _slot_value(value: Any) -> Any:
+    """비교용 값 (없음/빈 목록은 같게, 목록은 순서 무관)"""
+    if value in (None, "", [], ()):
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return frozenset(value)
+    return value
+
+
+def mismatched_fields(served: Dict[str, Any], actual: Dict[str, Any]) -> List[str]:
+    """응답에 쓴 결과와 실제 분석 결과가 다른 AUDIT_FIELDS 항목"""
+    return [name for name in AUDIT_FIELDS if _slot_value(served.get(name)) != _slot_value(actual.get(name))]
+
+
+def _permutations(num_perm: int) -> List[Tuple[int, int]]:
+    # 실행마다 같은 서명이 나오도록 고정 시드의 선형 해시 (a*x + b) mod p
+    params, state = [], 0x9E3779B97F4A7C15
+    for _ in range(num_perm):
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        a = (state >> 3) % (_MERSENNE_PRIME - 1) + 1
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        b = (state >> 3) % _MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations(NUM_PERM)
+
+
+def minhash(shingle_set: Set[str]) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) if hashes else _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+
+class NearDuplicateCache:
+    def __init__(self, threshold: float = DEFAULT_SIMILARITY, max_entries: int = 1024, bands: int = LSH_BANDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.audited = 0
+        self.false_hits = 0
+        self.recent_audits = deque(maxlen=50)
+        self.lock = threading.Lock()
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    # --- 조회/저장 ---
+    def lookup(self, utterance: str) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        """유사한 발화가 있으면 (결과 사본, 원래 발화, 유사도), 없으면 None"""
+        query = shingles(utterance)
+        if not query:
+            return None
+        signature = minhash(query)
+        with self.lock:
+            self.lookups += 1
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self.buckets.get(key, set())
+            best, best_score = None, 0.0
+            for text in candidates:
+                score = jaccard(query, self.entries[text]["shingles"])
+                if score > best_score:
+                    best, best_score = text, score
+            if best is None or best_score < self.threshold:
+                return None
+            self.hits += 1
+            self.entries.move_to_end(best)
+            result = copy.deepcopy(self.entries[best]["result"])
+        return result, best, best_score
+
+    def put(self, utterance: str, result: Dict[str, Any]) -> None:
+        text = canonical_text(utterance)
+        shingle_set = shingles(utterance)
+        if not shingle_set:
+            return
+        signature = minhash(shingle_set)
+        with self.lock:
+            if text in self.entries:
+                self._remove(text)
+            self.entries[text] = {"shingles": shingle_set, "signature": signature, "result": copy.deepcopy(result)}
+            for key in self._band_keys(signature):
+                self.buckets.setdefault(key, set()).add(text)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, text: str) -> None:
+        entry = self.entries.pop(text)
+        for key in self._band_keys(entry["signature"]):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(text)
+                if not bucket:
+                    del self.buckets[key]
+
+    # --- 감사 (재사용한 결과가 맞았는지) ---
+    def audit(self, utterance: str, matched: str, similarity: float, served: Dict[str, Any], actual: Dict[str, Any]) -> bool:
+        """유사 캐시로 응답한 결과와 실제 분석 결과를 의도 + 조건까지 비교. 틀렸으면 True(false hit)"""
+        mismatched = mismatched_fields(served, actual)
+        false_hit = bool(mismatched)
+        with self.lock:
+            self.audited += 1
+            if false_hit:
+                self.false_hits += 1
+            self.recent_audits.append({
+                "utterance": utterance, "matched": matched, "similarity": round(similarity, 3),
+                "reused": served.get("intent"), "actual": actual.get("intent"),
+                "mismatched": mismatched, "false_hit": false_hit,
+            })
+        return false_hit
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.buckets.clear()
+            self.lookups = self.hits = self.audited = self.false_hits = 0
+            self.recent_audits.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "audited": self.audited,
+                "false_hits": self.false_hits,
+                "false_hit_rate": round(self.false_hits / self.audited, 3) if self.audited else 0.0,
+                "recent_audits": list(self.recent_audits)[-10:],
+            }
+
+
+# 전역 유사 발화 캐시 인스턴스 (Gemini 의도 분석 결과용)
+near_intent_cache = NearDuplicateCache()
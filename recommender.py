@@ -1,13 +1,10 @@
 import random
-import urllib.parse
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-    requests = None
 
 import lunch_data
+import weather_client
+from weather_client import weather_http, REQUESTS_AVAILABLE
+from weather_store import weather_store, forecast_store
+from geo_locator import geo_locator
 from lunch_data import TAG_SOUP, TAG_HOT, TAG_NOODLE, TAG_SPICY, TAG_HEAVY, TAG_LIGHT, TAG_MEAT, TAG_RICE, TAG_PREMIUM
 from history_manager import LunchHistory
 
@@ -18,119 +15,44 @@ class LunchRecommender:
 
     def _get_coords(self, location):
         """간단한 좌표 매핑 (키 입력이 없으면 서울 기준)."""
-        # 최소 맵핑만 사용 (무료 API라 폭넓은 지오코딩을 하지 않음)
-        coords_map = {
-            "seoul": (37.5665, 126.9780),
-            "서울": (37.5665, 126.9780),
-            "sangam-dong": (37.5795, 126.8890),
-            "상암동": (37.5795, 126.8890),
-            "mapo-gu": (37.5665, 126.9018),
-            "마포구": (37.5665, 126.9018),
-            "gangnam": (37.4979, 127.0276),
-            "강남": (37.4979, 127.0276),
-        }
-        key = (location or "").lower().strip()
-        # 단순히 쉼표 앞부분만 사용 (예: "Seoul,KR")
-        if "," in key:
-            key = key.split(",")[0].strip()
-        return coords_map.get(key, coords_map["seoul"])
+        return weather_client.get_coords(location)
 
     def _weather_from_code(self, code):
         """Open-Meteo weathercode -> 간단한 한글 상태."""
-        if code in [0]:
-            return "맑음"
-        if code in [1, 2, 3, 45, 48]:
-            return "흐림"
-        if code in [51, 53, 55, 56, 57, 61, 63, 65, 80, 81, 82, 95, 96, 99]:
-            return "비"
-        if code in [71, 73, 75, 77, 85, 86]:
-            return "눈"
-        return "흐림"
+        return weather_client.weather_from_code(code)
 
     def _fetch_wttr(self, target_location):
-        encoded_loc = urllib.parse.quote_plus(target_location)
-        res = requests.get(f"https://wttr.in/{encoded_loc}?format=%C+%t", timeout=3)
+        res = weather_http.get(weather_client.wttr_url(target_location))
         if res.status_code != 200:
             return None, None
-
-        text = res.text.strip()
-        parts = text.split()
-        if len(parts) >= 2:
-            cond_text = " ".join(parts[:-1]).lower()
-            temp_text = parts[-1]
-        else:
-            cond_text = text.lower()
-            temp_text = ""
-
-        condition = "맑음"
-        if "rain" in cond_text or "drizzle" in cond_text or "shower" in cond_text:
-            condition = "비"
-        elif "snow" in cond_text:
-            condition = "눈"
-        elif "cloud" in cond_text or "overcast" in cond_text or "mist" in cond_text or "fog" in cond_text:
-            condition = "흐림"
-        elif "sun" in cond_text or "clear" in cond_text:
-            condition = "맑음"
-
-        try:
-            t_val_str = temp_text.replace("+", "").replace("°C", "").replace("C", "")
-            t_val = int(t_val_str)
-            if t_val >= 28 and condition not in ["비", "눈"]:
-                condition = "더움"
-        except:
-            pass
-
-        return condition, temp_text
+        return weather_client.parse_wttr(res.text)
 
     def _fetch_open_meteo(self, target_location):
-        lat, lon = self._get_coords(target_location)
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true"
-        res = requests.get(url, timeout=4)
+        res = weather_http.get(weather_client.open_meteo_url(target_location))
         if res.status_code != 200:
             return None, None
-
-        data = res.json()
-        current = data.get("current_weather") or {}
-        temp = current.get("temperature")
-        code = current.get("weathercode")
-        if temp is None or code is None:
-            return None, None
-        condition = self._weather_from_code(code)
-        return condition, f"{round(temp)}°C"
+        return weather_client.parse_open_meteo(res.json())
 
     def detect_city_by_ip(self):
-        """간단한 IP 기반 위치 추정 (도시명 반환)"""
-        if not REQUESTS_AVAILABLE:
-            return None
-            
-        try:
-            res = requests.get("https://ipapi.co/json", timeout=3)
-            if res.status_code == 200:
-                data = res.json()
-                city = data.get("city")
-                country = data.get("country_code")
-                if city and country:
-                    return f"{city},{country}"
-                if city:
-                    return city
-        except Exception:
-            pass
-        return None
+        """간단한 IP 기반 위치 추정 (도시명 반환, 디스크 캐시 우선)"""
+        return geo_locator.detect()
 
     def get_weather(self, location=None):
-        """날씨 가져오기: wttr.in 우선, 실패 시 Open-Meteo fallback (상태 + 온도)"""
+        """날씨 가져오기: wttr.in / Open-Meteo 헤지 조회, 먼저 온 유효한 결과 사용 (상태 + 온도)"""
         if not REQUESTS_AVAILABLE:
             return None, None
             
         try:
             config = lunch_data.load_config()
             target_location = location or config.get("location", "Seoul")
-            # 1) wttr.in 우선
-            cond, temp = self._fetch_wttr(target_location)
-            # 2) 실패 시 Open-Meteo fallback
-            if cond is None:
-                cond, temp = self._fetch_open_meteo(target_location)
-            return cond, temp
+            # 시간별 예보 표(몇 시간에 한 번 조회)에 현재 시각이 있으면 그 값 사용
+            forecast = forecast_store.get_or_fetch(target_location, lambda: weather_http.get_hourly_forecast(target_location))
+            if forecast:
+                cond, temp = forecast.at(weather_client.forecast_now())
+                if cond is not None:
+                    return cond, temp
+            # 위치별 캐시 우선 (봇/Streamlit/Tk 공용, 디스크 저장). 없으면 헤지 조회 한 번만 실행
+            return weather_store.get_or_fetch(target_location, lambda: weather_http.get_weather(target_location))
         except Exception:
             return None, None # 에러 시 None
 
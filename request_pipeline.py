@@ -0,0 +1,116 @@
+"""
+요청 파이프라인 모듈
+카카오 요청 한 건을 단계(normalize -> fast_intent -> gate -> enrich -> decide -> render)로 나눠 처리할 때
+단계 사이에 넘기는 불변 컨텍스트와 단계별 소요 시간 기록을 제공합니다.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+PIPELINE_STAGES = ("normalize", "fast_intent", "gate", "enrich", "decide", "render")
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    """요청 하나의 상태. 단계는 값을 바꾸지 않고 with_()로 새 컨텍스트를 만들어 넘깁니다."""
+    user_id: str
+    utterance: str
+    # normalize
+    text: str = ""                      # 앞뒤 공백 제거
+    compact: str = ""                   # 공백 전부 제거
+    lower: str = ""
+    is_welcome: bool = False
+    is_short: bool = False
+    has_random_keyword: bool = False
+    is_question: bool = False
+    wants_explain: bool = False         # 왜/이유/why 등
+    current_meal_label: str = "점심"
+    requested_meal_label: Optional[str] = None
+    meal_label: str = "점심"
+    is_late_evening: bool = False
+    mismatch_notice: str = ""
+    deadline_at: Optional[float] = None  # 전체 예산 마감 시각 (time.time() 기준)
+    # fast_intent
+    local_intent: Dict[str, Any] = field(default_factory=dict)
+    fast_intent: Dict[str, Any] = field(default_factory=dict)
+    # enrich
+    session: Dict[str, Any] = field(default_factory=dict)
+    conversation_history: List[Dict] = field(default_factory=list)
+    weather: Optional[str] = None
+    # decide
+    intent: Optional[str] = None
+    casual_type: Optional[str] = None
+    intent_data: Dict[str, Any] = field(default_factory=dict)
+    use_gemini: bool = False
+    should_recommend: bool = False
+    choice: Optional[Dict] = None
+    last_rec: Optional[Dict] = None
+    combined_choice: Optional[Dict] = None  # 의도+답변 한 번에 받은 경우 Gemini가 고른 후보
+    combined_reply: str = ""
+
+    def with_(self, **changes) -> "RequestContext":
+        return replace(self, **changes)
+
+
+class StageTimings:
+    """요청 하나의 단계별 소요 시간 (ms)"""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - start) * 1000))
+
+    def total_ms(self) -> float:
+        return sum(ms for _, ms in self.stages)
+
+    def summary(self) -> str:
+        return " ".join(f"{name}={ms:.1f}ms" for name, ms in self.stages)
+
+
+class PipelineStats:
+    """단계별 누적 소요 시간 (어디서 시간이 쓰이는지 확인용)"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def record(self, timings: StageTimings) -> None:
+        with self.lock:
+            self.requests += 1
+            for name, ms in timings.stages:
+                row = self.stages.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                row["count"] += 1
+                row["total_ms"] += ms
+                row["max_ms"] = max(row["max_ms"], ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "stages": {
+                    name: {
+                        "count": row["count"],
+                        "avg_ms": round(row["total_ms"] / row["count"], 2),
+                        "max_ms": round(row["max_ms"], 2),
+                    }
+                    for name, row in self.stages.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stages.clear()
+            self.requests = 0
+
+
+# 전역 파이프라인 통계 인스턴스
+pipeline_stats = PipelineStats()
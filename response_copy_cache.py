@@ -0,0 +1,253 @@
+"""
+응답 문구 캐시 모듈
+Gemini가 만든 추천/설명/잡담 문구를 (종류, 메뉴, 카테고리, 구역, 태그, 기분, 날씨, 식사, 톤) 키로 보관합니다.
+키마다 문구를 여러 개(변형) 모아 두고 무작위로 골라 쓰며,
+메모리 LRU(앞단) + SQLite(뒷단) 2단 구조라 재시작 후에도 그대로 재사용합니다.
+메뉴가 수정/삭제되면 그 메뉴의 문구를 지웁니다.
+봇 서버(asyncio)는 aget/aput을 써서 SQLite 읽기/쓰기를 이벤트 루프 밖(스레드)에서 실행합니다.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import lunch_data
+
+COPY_CACHE_FILE = os.path.join(lunch_data.DATA_DIR, "response_copy.sqlite3")
+COPY_TTL_SEC = 7 * 24 * 3600   # 일주일 지난 문구는 새로 생성
+MAX_VARIANTS = 4               # 키마다 모아 둘 문구 수 (다양성)
+MEMORY_ENTRIES = 256           # 메모리에 올려 둘 키 수
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS copy_variants (
+    key TEXT NOT NULL,
+    menu TEXT,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (key, text)
+);
+CREATE INDEX IF NOT EXISTS copy_variants_menu ON copy_variants (menu);
+"""
+
+
+def copy_key(kind: str, **context: Any) -> str:
+    """문구 종류 + 상황 -> 캐시 키 (값이 없는 항목은 빼고, 목록은 순서와 무관하게)"""
+    normalized = {}
+    for name, value in context.items():
+        if value in (None, "", [], ()):
+            continue
+        normalized[name] = sorted(value) if isinstance(value, (list, tuple, set)) else value
+    return f"{kind}:{json.dumps(normalized, ensure_ascii=False, sort_keys=True)}"
+
+
+class ResponseCopyCache:
+    def __init__(self, path: Optional[str] = None, ttl_sec: float = COPY_TTL_SEC,
+                 max_variants: int = MAX_VARIANTS, memory_entries: int = MEMORY_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_variants = max_variants
+        self.memory_entries = memory_entries
+        # key -> {"menu": 메뉴 이름, "variants": [{"text", "created_at"}, ...]} (빈 목록 = 디스크에도 없음)
+        self.memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            try:
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                self.db.executescript(_SCHEMA)
+            except Exception as e:
+                print(f"Copy cache open error: {e}")
+                self.db = None
+
+    # --- 내부: 메모리/디스크 ---
+    def _fresh(self, variants: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        return [v for v in variants if now - v["created_at"] < self.ttl_sec]
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _load_from_disk(self, key: str, now: float) -> Dict[str, Any]:
+        entry = {"menu": None, "variants": []}
+        if self.db is None:
+            return entry
+        try:
+            rows = self.db.execute(
+                "SELECT menu, text, created_at FROM copy_variants WHERE key = ? AND created_at > ? ORDER BY created_at",
+                (key, now - self.ttl_sec),
+            ).fetchall()
+        except Exception as e:
+            print(f"Copy cache read error: {e}")
+            return entry
+        for menu, text, created_at in rows:
+            entry["menu"] = menu
+            entry["variants"].append({"text": text, "created_at": created_at})
+        return entry
+
+    def _entry(self, key: str, now: float):
+        """(항목, 출처) - 출처는 "memory" / "disk" / None(없음)"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+            entry["variants"] = self._fresh(entry["variants"], now)
+            return entry, ("memory" if entry["variants"] else None)
+        entry = self._load_from_disk(key, now)
+        self._remember(key, entry)
+        return entry, ("disk" if entry["variants"] else None)
+
+    # --- 조회/저장 ---
+    def get(self, key: str) -> Optional[str]:
+        """저장된 문구 중 하나를 무작위로 (없거나 모두 만료됐으면 None)"""
+        now = time.time()
+        with self.lock:
+            entry, tier = self._entry(key, now)
+            if tier == "memory":
+                self.memory_hits += 1
+            elif tier == "disk":
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                return None
+            return random.choice(entry["variants"])["text"]
+
+    def variant_count(self, key: str) -> int:
+        with self.lock:
+            entry, _ = self._entry(key, time.time())
+            return len(entry["variants"])
+
+    def stored_count(self, key: str) -> int:
+        """유효한 변형 수 (메모리에 없으면 디스크만 세고 메모리 LRU는 건드리지 않음 - 사전 생성용)"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                return len(self._fresh(entry["variants"], now))
+            if self.db is None:
+                return 0
+            try:
+                return self.db.execute(
+                    "SELECT COUNT(*) FROM copy_variants WHERE key = ? AND created_at > ?", (key, now - self.ttl_sec)
+                ).fetchone()[0]
+            except Exception as e:
+                print(f"Copy cache read error: {e}")
+                return 0
+
+    def needs_variants(self, key: str) -> bool:
+        """변형이 아직 max_variants개보다 적으면 True (백그라운드로 더 만들어 둘 때 사용)"""
+        return self.variant_count(key) < self.max_variants
+
+    def put(self, key: str, text: str, menu: Optional[str] = None, created_at: Optional[float] = None) -> None:
+        """문구 추가 (같은 문구는 무시, 가득 차면 가장 오래된 변형을 교체)"""
+        text = (text or "").strip()
+        if not text:
+            return
+        created_at = time.time() if created_at is None else created_at
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                # 사전 생성처럼 아직 요청이 없던 키는 메모리 LRU를 밀어내지 않도록 디스크에만 저장
+                entry = self._load_from_disk(key, time.time()) if self.db is not None else None
+            else:
+                entry["variants"] = self._fresh(entry["variants"], time.time())
+            if entry is None:
+                entry = {"menu": menu, "variants": []}
+                self._remember(key, entry)
+            if any(v["text"] == text for v in entry["variants"]):
+                return
+            entry["menu"] = menu
+            entry["variants"].append({"text": text, "created_at": created_at})
+            entry["variants"].sort(key=lambda v: v["created_at"])
+            dropped = entry["variants"][:-self.max_variants]
+            entry["variants"] = entry["variants"][-self.max_variants:]
+            if self.db is None:
+                return
+            try:
+                with self.db:
+                    self.db.executemany("DELETE FROM copy_variants WHERE key = ? AND text = ?",
+                                        [(key, v["text"]) for v in dropped])
+                    self.db.execute("INSERT OR REPLACE INTO copy_variants (key, menu, text, created_at) VALUES (?, ?, ?, ?)",
+                                    (key, menu, text, created_at))
+            except Exception as e:
+                print(f"Copy cache write error: {e}")
+
+    # --- asyncio용 (SQLite 작업은 스레드에서) ---
+    async def aget(self, key: str) -> Optional[str]:
+        """get의 asyncio 버전. 메모리에 있는 키는 디스크를 읽지 않으므로 바로, 아니면 스레드에서 조회"""
+        if self.db is None or key in self.memory:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, text: str, menu: Optional[str] = None, created_at: Optional[float] = None) -> None:
+        """put의 asyncio 버전 (디스크가 있으면 스레드에서 저장)"""
+        if self.db is None:
+            self.put(key, text, menu=menu, created_at=created_at)
+            return
+        await asyncio.to_thread(self.put, key, text, menu, created_at)
+
+    # --- 무효화 ---
+    def invalidate_menu(self, name: str) -> int:
+        """메뉴 수정/삭제 시 해당 메뉴의 문구 삭제. 반환: 지운 키 수(메모리 기준)"""
+        with self.lock:
+            keys = [k for k, entry in self.memory.items() if entry["menu"] == name]
+            for key in keys:
+                del self.memory[key]
+            if self.db is not None:
+                try:
+                    with self.db:
+                        self.db.execute("DELETE FROM copy_variants WHERE menu = ?", (name,))
+                except Exception as e:
+                    print(f"Copy cache delete error: {e}")
+        return len(keys)
+
+    def purge_expired(self) -> None:
+        """만료된 문구를 디스크에서 정리 (시작 시 한 번)"""
+        if self.db is None:
+            return
+        with self.lock:
+            try:
+                with self.db:
+                    self.db.execute("DELETE FROM copy_variants WHERE created_at <= ?", (time.time() - self.ttl_sec,))
+            except Exception as e:
+                print(f"Copy cache purge error: {e}")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+            if self.db is not None:
+                try:
+                    with self.db:
+                        self.db.execute("DELETE FROM copy_variants")
+                except Exception as e:
+                    print(f"Copy cache clear error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stored = None
+            if self.db is not None:
+                try:
+                    stored = self.db.execute("SELECT COUNT(*) FROM copy_variants").fetchone()[0]
+                except Exception:
+                    stored = None
+            return {
+                "memory_keys": len(self.memory),
+                "stored_variants": stored,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+# 전역 응답 문구 캐시 인스턴스
+response_copy_cache = ResponseCopyCache(COPY_CACHE_FILE)
@@ -0,0 +1,51 @@
+"""
+단일 호출(single-flight) 모듈
+같은 키(정규화한 프롬프트 등)의 비동기 호출이 동시에 여러 번 들어오면
+실제 호출은 한 번만 하고 나머지는 그 결과(또는 예외)를 함께 받습니다.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def normalize_prompt(prompt: str) -> str:
+    """공백/줄바꿈 차이만 있는 프롬프트는 같은 호출로 취급"""
+    return " ".join((prompt or "").split())
+
+
+class SingleFlight:
+    def __init__(self):
+        self.flights: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0     # 실제로 나간 호출
+        self.shared = 0    # 진행 중인 호출에 합류한 횟수
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """key로 진행 중인 호출이 있으면 합류, 없으면 factory()로 새 호출 시작"""
+        task = self.flights.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(factory())
+            self.flights[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda t, key=key: self._finish(key, t))
+        else:
+            self.shared += 1
+        # 기다리던 쪽이 취소돼도(타임아웃 등) 다른 대기자를 위해 실제 호출은 계속
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.flights.get(key) is task:
+            del self.flights[key]
+        if not task.cancelled():
+            task.exception()   # 대기자가 모두 떠난 경우에도 "never retrieved" 경고가 나지 않도록
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.calls + self.shared
+        return {
+            "in_flight": len(self.flights),
+            "calls": self.calls,
+            "shared": self.shared,
+            "shared_rate": round(self.shared / total, 3) if total else 0.0,
+        }
+
+
+# 전역 Gemini 단일 호출 관리자
+gemini_flights = SingleFlight()
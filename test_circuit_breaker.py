@@ -0,0 +1,115 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import bot_server
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from gemini_pool import GeminiClientPool, KeyClient
+
+
+def test_breaker_states():
+    print("--- Testing circuit breaker states ---")
+    breaker = CircuitBreaker("test", window_sec=30, min_calls=4, failure_rate=0.5, open_sec=10)
+    now = 1000.0
+    breaker.record(True, now=now)
+    breaker.record(False, timed_out=True, now=now + 1)
+    breaker.record(True, now=now + 2)
+    assert breaker.state == CLOSED      # 표본 부족
+    breaker.record(False, now=now + 3)  # 2/4 실패 -> 차단
+    assert breaker.state == OPEN
+    assert not breaker.allow(now + 5) and breaker.snapshot(now + 5)["rejected"] == 1
+
+    # 차단 시간이 지나면 시험 호출 하나만
+    assert breaker.available(now + 14)
+    assert breaker.allow(now + 14) and breaker.state == HALF_OPEN
+    assert not breaker.available(now + 14) and not breaker.allow(now + 14)
+    breaker.record(False, now=now + 15)  # 시험 실패 -> 두 배로 차단
+    assert breaker.state == OPEN and breaker.open_sec == 20
+    assert not breaker.available(now + 30)
+    assert breaker.allow(now + 36)
+    breaker.record(True, now=now + 36)   # 시험 성공 -> 정상
+    snapshot = breaker.snapshot(now + 36)
+    assert snapshot["state"] == CLOSED and breaker.open_sec == 10
+    assert snapshot["trips"] == 2 and snapshot["probes"] == 2 and snapshot["timeouts"] == 1
+
+    # 오래된 실패는 윈도우에서 빠짐
+    breaker.record(False, now=now + 40)
+    breaker.record(False, now=now + 41)
+    breaker.record(True, now=now + 100)
+    breaker.record(True, now=now + 101)
+    assert breaker.state == CLOSED
+    print("✅ Circuit breaker states passed!")
+
+
+def test_probe_belongs_to_its_caller():
+    print("--- Testing half-open probe ownership ---")
+    breaker = CircuitBreaker("test", window_sec=30, min_calls=4, failure_rate=0.5, open_sec=10)
+    now = 1000.0
+    early = now + 2.5   # 차단 전에 시작해 아직 결과가 없는 호출
+    assert breaker.allow(early)
+    for offset, ok in ((0, True), (1, False), (2, True), (3, False)):
+        breaker.record(ok, now=now + offset, started_at=now + offset)
+    assert breaker.state == OPEN
+
+    probe_at = now + 14
+    assert breaker.allow(probe_at) and breaker.state == HALF_OPEN
+    # 차단 전 호출의 늦은 성공/취소는 시험 호출 결과가 아님
+    breaker.record(True, now=now + 15, started_at=early)
+    breaker.release_probe(started_at=early)
+    assert breaker.state == HALF_OPEN and not breaker.available(now + 15)
+    # 시험 호출을 잡은 호출의 결과만 반영
+    breaker.record(True, now=now + 16, started_at=probe_at)
+    assert breaker.state == CLOSED
+
+    # 풀: 시험 호출이 아닌 호출이 취소돼도 다른 요청의 시험 호출은 그대로
+    client = KeyClient("k", {"generation": MagicMock()})
+    pool = GeminiClientPool([client])
+    gen = client.breakers["generation"]
+    gen.state, gen.opened_at = OPEN, 0.0
+    assert pool.acquire("generation", now=500.0) is client and gen.state == HALF_OPEN
+    pool.release(client, ok=False, kind="generation", aborted=True, started_at=400.0)
+    assert pool.acquire("generation", now=501.0) is None
+    pool.release(client, ok=False, kind="generation", aborted=True, started_at=500.0)
+    assert pool.acquire("generation", now=502.0) is client
+    print("✅ Probe ownership passed!")
+
+
+def test_timeouts_cut_over_to_local():
+    print("--- Testing circuit breaker on Gemini timeouts ---")
+    slow = MagicMock()
+
+    async def hang(prompt):
+        await asyncio.sleep(1)
+        return MagicMock(text="늦음")
+    slow.generate_content_async.side_effect = hang
+    client = KeyClient("slow", {"generation": slow})
+    pool = GeminiClientPool([client])
+
+    async def run(count):
+        return [await bot_server.run_gemini_with_timeout("prompt", 0.02, "Test") for _ in range(count)]
+
+    original = bot_server.gemini_pool
+    bot_server.gemini_pool = pool
+    try:
+        assert asyncio.run(run(6)) == [None] * 6
+        # 타임아웃 4번이면 차단 -> 이후는 호출하지 않고 바로 로컬
+        assert slow.generate_content_async.call_count == 4
+        assert bot_server._gemini_in_cooldown("generation") and not bot_server._gemini_in_cooldown()
+        breaker = client.breakers["generation"]
+        assert pool.stats()["open_circuits"] == 1 and breaker.snapshot()["timeouts"] == 4
+
+        # 차단 시간이 지나면 시험 호출 하나, 성공하면 다시 정상
+        async def ok(prompt):
+            return MagicMock(text="회복")
+        slow.generate_content_async.side_effect = ok
+        breaker.opened_at -= breaker.open_sec
+        assert asyncio.run(run(2)) == ["회복", "회복"]
+        assert breaker.state == CLOSED and not bot_server._gemini_in_cooldown("generation")
+    finally:
+        bot_server.gemini_pool = original
+    print("✅ Timeout cut-over passed!")
+
+
+if __name__ == "__main__":
+    test_breaker_states()
+    test_probe_belongs_to_its_caller()
+    test_timeouts_cut_over_to_local()
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock
+
+import bot_server
+import intent_classifier
+from gemini_pool import GeminiClientPool, KeyClient
+from response_copy_cache import ResponseCopyCache
+
+CANDIDATES = [
+    {"name": "우동", "area": "YTN 지하식당", "tags": ["noodle"], "category": "일식"},
+    {"name": "김치찌개", "area": "DDMC 지하", "tags": ["soup"], "category": "한식"},
+]
+
+
+def _run_combined(utterance, payload):
+    """의도+답변 모드로 요청 한 건 처리. (응답 텍스트, combined 호출 수, generation 호출 수, 저장된 문구 키 수)"""
+    combined_model, generation_model = MagicMock(), MagicMock()
+
+    async def combined_generate(prompt):
+        assert "후보 메뉴" in prompt and "김치찌개" in prompt
+        return MagicMock(text=f"```json\n{json.dumps(payload, ensure_ascii=False)}\n```")
+    combined_model.generate_content_async.side_effect = combined_generate
+
+    async def generation_generate(prompt):
+        return MagicMock(text="두 번째 호출")
+    generation_model.generate_content_async.side_effect = generation_generate
+
+    recommender = MagicMock()
+    recommender.recommend.side_effect = lambda **kwargs: next(
+        (c for c in CANDIDATES if c["name"] not in (kwargs.get("excluded_menus") or [])), None
+    )
+    classifier = MagicMock()
+    classifier.predict.return_value = (None, 0.0)
+    original = (bot_server.gemini_pool, bot_server.GEMINI_AVAILABLE, bot_server.GEMINI_COMBINED_MODE, bot_server.r,
+                bot_server.response_copy_cache, bot_server.intent_classifier, intent_classifier.INTENT_LOG_FILE)
+    with tempfile.TemporaryDirectory() as tmp:
+        bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"combined": combined_model, "generation": generation_model})])
+        bot_server.GEMINI_AVAILABLE = True
+        bot_server.GEMINI_COMBINED_MODE = True
+        bot_server.r = recommender
+        bot_server.response_copy_cache = ResponseCopyCache(path=None)
+        bot_server.intent_classifier = classifier
+        intent_classifier.INTENT_LOG_FILE = os.path.join(tmp, "intent_log.jsonl")
+        bot_server.intent_cache.clear()
+        bot_server.near_intent_cache.clear()
+        try:
+            response = asyncio.run(bot_server.handle_recommendation_logic("combined_user", utterance, None, 0.0))
+            stored = bot_server.response_copy_cache.stats()["memory_keys"]
+        finally:
+            (bot_server.gemini_pool, bot_server.GEMINI_AVAILABLE, bot_server.GEMINI_COMBINED_MODE, bot_server.r,
+             bot_server.response_copy_cache, bot_server.intent_classifier, intent_classifier.INTENT_LOG_FILE) = original
+            bot_server.intent_cache.clear()
+            bot_server.near_intent_cache.clear()
+            bot_server.session_manager.clear_session("combined_user")
+    text = response["template"]["outputs"][0]["simpleText"]["text"]
+    return text, combined_model.generate_content_async.call_count, generation_model.generate_content_async.call_count, stored
+
+
+def test_combined_recommend_in_one_call():
+    print("--- Testing combined intent + reply (recommend) ---")
+    payload = {"intent": "recommend", "emotion": "neutral", "filter": [], "pick": 1,
+               "reply": "오늘 같은 날엔 뜨끈한 김치찌개가 딱이에요! 든든하게 드시고 힘내세요 😊"}
+    text, combined_calls, generation_calls, stored = _run_combined("회의가 길어져서 정신이 하나도 없네요 어떡하죠", payload)
+    assert combined_calls == 1 and generation_calls == 0
+    assert "김치찌개가 딱이에요" in text
+    # 위치/종류는 로컬에서 붙임
+    assert "📍 위치: DDMC 지하" in text and "🍽️ 종류: 한식" in text
+    assert stored == 1   # 받은 답변은 추천 멘트 캐시에도 저장
+    print("✅ Combined recommend passed!")
+
+
+def test_combined_casual_and_bad_pick():
+    print("--- Testing combined intent + reply (casual) ---")
+    payload = {"intent": "casual", "casual_type": "chitchat", "emotion": "negative", "pick": 7,
+               "reply": "고생 많으셨어요 ㅠㅠ 잠깐이라도 쉬어가세요 ☕"}
+    text, combined_calls, generation_calls, _ = _run_combined("회의가 길어져서 정신이 하나도 없네요 어떡하죠", payload)
+    assert combined_calls == 1 and generation_calls == 0
+    assert "고생 많으셨어요" in text
+    assert "📍" not in text
+    print("✅ Combined casual passed!")
+
+
+if __name__ == "__main__":
+    test_combined_recommend_in_one_call()
+    test_combined_casual_and_bad_pick()
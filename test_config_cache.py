@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+import lunch_data
+
+
+def test_config_cache_and_listeners():
+    print("--- Testing cached config ---")
+    original = lunch_data.CONFIG_FILE
+    events = []
+
+    def listener(old, new):
+        events.append((old.get("location"), new.get("location")))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lunch_data.CONFIG_FILE = os.path.join(tmp, "config.json")
+        lunch_data._config_cache.update(data=None, mtime=None)
+        lunch_data.add_config_listener(listener)
+        try:
+            # 파일이 없으면 기본값
+            assert lunch_data.load_config() == lunch_data.DEFAULT_CONFIG
+
+            # 저장하면 메모리 캐시가 바로 갱신되고 리스너가 호출됨
+            assert lunch_data.save_config({"location": "Gangnam"})
+            assert lunch_data.load_config()["location"] == "Gangnam"
+            assert events == [("Seoul", "Gangnam")]
+
+            # mtime이 그대로면 파일을 다시 파싱하지 않음
+            real_read = lunch_data._read_config_file
+            lunch_data._read_config_file = lambda: (_ for _ in ()).throw(AssertionError("re-read"))
+            try:
+                lunch_data.load_config()
+            finally:
+                lunch_data._read_config_file = real_read
+
+            # 외부에서 파일을 고치면 mtime으로 감지
+            with open(lunch_data.CONFIG_FILE, 'w', encoding='utf-8') as f:
+                f.write('{"location": "Sangam-dong"}')
+            st = os.stat(lunch_data.CONFIG_FILE)
+            os.utime(lunch_data.CONFIG_FILE, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+            assert lunch_data.load_config()["location"] == "Sangam-dong"
+            assert events[-1] == ("Gangnam", "Sangam-dong")
+
+            # 반환값을 수정해도 캐시는 오염되지 않음
+            lunch_data.load_config()["location"] = "Busan"
+            assert lunch_data.load_config()["location"] == "Sangam-dong"
+        finally:
+            lunch_data.remove_config_listener(listener)
+            lunch_data.CONFIG_FILE = original
+            lunch_data._config_cache.update(data=None, mtime=None)
+    print("✅ Cached config test passed!")
+
+
+if __name__ == "__main__":
+    test_config_cache_and_listeners()
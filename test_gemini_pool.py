@@ -0,0 +1,78 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import bot_server
+from gemini_pool import INITIAL_COOLDOWN_SEC, GeminiClientPool, KeyClient, mask_key
+
+
+def _client(label, rpm_limit=15):
+    return KeyClient(label, {"generation": MagicMock(), "intent": MagicMock()}, rpm_limit)
+
+
+def test_least_loaded_selection():
+    print("--- Testing least-loaded key selection ---")
+    pool = GeminiClientPool([_client("a"), _client("b"), _client("c")])
+    first, second, third = (pool.acquire("generation") for _ in range(3))
+    assert {first.label, second.label, third.label} == {"a", "b", "c"}
+    pool.release(second, ok=True)
+    assert pool.acquire("intent") is second          # 진행 중 호출이 없는 키 우선
+    assert mask_key("AIzaSyExample1234") == "…1234"
+    print("✅ Least-loaded selection passed!")
+
+
+def test_per_key_cooldown_and_quota():
+    print("--- Testing per-key cooldown / quota estimate ---")
+    a, b = _client("a"), _client("b", rpm_limit=1)
+    pool = GeminiClientPool([a, b])
+    client = pool.acquire("generation")
+    pool.release(client, ok=False, rate_limited=True)
+    assert client.in_cooldown(time.time()) and client.cooldown_sec == INITIAL_COOLDOWN_SEC * 2
+    other = pool.acquire("generation")
+    assert other is not client and not pool.all_in_cooldown()
+    pool.release(other, ok=False, rate_limited=True)
+    assert pool.all_in_cooldown() and pool.acquire("generation") is None
+    assert pool.cooldown_remaining() > 0
+
+    # 분당 한도에 닿은 키는 다른 키가 있으면 피함
+    a, b = _client("a", rpm_limit=1), _client("b", rpm_limit=1)
+    pool = GeminiClientPool([a, b])
+    pool.release(pool.acquire("generation"), ok=True)
+    pool.release(pool.acquire("generation"), ok=True)
+    assert a.quota_used(time.time()) == b.quota_used(time.time()) == 1
+    assert pool.stats()["healthy"] == 2
+    print("✅ Per-key cooldown / quota passed!")
+
+
+def test_rate_limited_key_does_not_stop_others():
+    print("--- Testing Gemini calls across keys ---")
+    limited, healthy = MagicMock(), MagicMock()
+
+    async def quota_error(prompt):
+        raise RuntimeError("429 You exceeded your current quota")
+
+    async def ok(prompt):
+        return MagicMock(text="좋아요!")
+    limited.generate_content_async.side_effect = quota_error
+    healthy.generate_content_async.side_effect = ok
+    pool = GeminiClientPool([KeyClient("limited", {"generation": limited}), KeyClient("healthy", {"generation": healthy})])
+
+    async def run():
+        return [await bot_server.run_gemini_with_timeout("prompt", 1.0, "Test") for _ in range(4)]
+
+    original = bot_server.gemini_pool
+    bot_server.gemini_pool = pool
+    try:
+        results = asyncio.run(run())
+    finally:
+        bot_server.gemini_pool = original
+    assert results.count("좋아요!") == 3 and results.count(None) == 1
+    assert limited.generate_content_async.call_count == 1
+    assert pool.stats()["healthy"] == 1
+    print("✅ Calls across keys passed!")
+
+
+if __name__ == "__main__":
+    test_least_loaded_selection()
+    test_per_key_cooldown_and_quota()
+    test_rate_limited_key_does_not_stop_others()
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import bot_server
+from gemini_pool import GeminiClientPool, KeyClient
+from gemini_stream import sentence_complete_prefix
+from latency_budget import LatencyTracker
+from response_copy_cache import ResponseCopyCache
+
+CHOICE = {"name": "김치찌개", "category": "한식", "area": "DDMC 지하", "tags": ["soup"]}
+INTENT = {"intent": "recommend", "emotion": "neutral"}
+
+
+def _stream_model(chunks):
+    """(대기 초, 조각) 목록을 차례로 흘려보내는 스트리밍 모델"""
+    model = MagicMock()
+
+    async def generate(prompt, stream=False):
+        assert stream
+
+        async def iterate():
+            for delay, text in chunks:
+                await asyncio.sleep(delay)
+                yield MagicMock(text=text)
+        return iterate()
+    model.generate_content_async.side_effect = generate
+    return model
+
+
+def _generate(model, budget):
+    async def run():
+        text = await bot_server.generate_response_with_gemini(
+            "점심", CHOICE, INTENT, [], deadline_at=time.time() + budget
+        )
+        # 스트림이 끝나면 캐시 저장도 백그라운드로 이어지므로 남은 작업이 없을 때까지
+        while bot_server._background_tasks:
+            await asyncio.gather(*list(bot_server._background_tasks))
+        return text
+
+    original = (bot_server.gemini_pool, bot_server.response_copy_cache, bot_server.gemini_latency, bot_server.GEMINI_STREAMING)
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"generation": model})])
+    bot_server.response_copy_cache = ResponseCopyCache(path=None)
+    bot_server.gemini_latency = LatencyTracker()
+    bot_server.GEMINI_STREAMING = True
+    try:
+        text = asyncio.run(run())
+        key, _ = bot_server.build_recommend_copy_request("점심", CHOICE, INTENT)
+        cached = bot_server.response_copy_cache.get(key)
+        outcomes = bot_server.gemini_latency.stats()["generation"]["outcomes"]
+        in_flight = bot_server.gemini_pool.stats()["keys"][0]["in_flight"]
+    finally:
+        (bot_server.gemini_pool, bot_server.response_copy_cache, bot_server.gemini_latency, bot_server.GEMINI_STREAMING) = original
+    return text, cached, outcomes, in_flight
+
+
+def test_sentence_complete_prefix():
+    print("--- Testing sentence-complete prefix ---")
+    assert sentence_complete_prefix("오늘은 김치찌개 어때요! 뜨끈해서 좋") == "오늘은 김치찌개 어때요!"
+    assert sentence_complete_prefix("가격은 3.5천원이에요. 그리고") == "가격은 3.5천원이에요."
+    assert sentence_complete_prefix("든든하게 드세요 😊😊 다음") == "든든하게 드세요 😊😊"
+    assert sentence_complete_prefix("아직 문장이 안 끝남") == ""
+    print("✅ Sentence prefix passed!")
+
+
+def test_stream_cut_at_deadline_keeps_sentences():
+    print("--- Testing streaming cutoff at deadline ---")
+    model = _stream_model([
+        (0.02, "오늘 같은 날엔 뜨끈한 김치찌개 어떠세요? "),
+        (0.02, "든든하게 드시고 오후도 힘"),
+        (0.5, "내세요 😊\n\n📍 위치: DDMC 지하\n🍽️ 종류: 한식"),
+    ])
+    # 남은 예산 0.6초 -> 0.2초만 기다리고 그때까지 끝난 문장 + 로컬 위치/종류
+    text, cached, outcomes, in_flight = _generate(model, 0.6)
+    assert "김치찌개 어떠세요?" in text and "오후도 힘" not in text
+    assert text.endswith("📍 위치: DDMC 지하\n🍽️ 종류: 한식")
+    assert outcomes == {"partial": 1}
+    # 스트림은 끝까지 받아 완성본을 캐시에 (위치/종류 한 번만)
+    assert "힘내세요 😊" in cached and cached.count("📍") == 1
+    assert in_flight == 0
+    print("✅ Streaming cutoff passed!")
+
+
+def test_stream_short_prefix_falls_back():
+    print("--- Testing streaming fallback on short prefix ---")
+    model = _stream_model([(0.02, "네! "), (0.5, "김치찌개 추천드려요.")])
+    text, _, outcomes, _ = _generate(model, 0.6)
+    # 완성된 문장이 너무 짧으면 로컬 템플릿 멘트
+    assert "김치찌개" in text and not text.startswith("네!")
+    assert outcomes == {"local": 1}
+    print("✅ Short prefix fallback passed!")
+
+
+if __name__ == "__main__":
+    test_sentence_complete_prefix()
+    test_stream_cut_at_deadline_keeps_sentences()
+    test_stream_short_prefix_falls_back()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+import geo_locator
+from geo_locator import GeoLocator
+
+
+def _fake_http(data=None, status=200, delay=0.0):
+    fake = MagicMock()
+
+    def get(url, timeout=None):
+        time.sleep(delay)
+        return MagicMock(status_code=status, json=lambda: data or {})
+    fake.get.side_effect = get
+    return fake
+
+
+def _with_http(fake, func):
+    original = geo_locator.weather_http
+    geo_locator.weather_http = fake
+    try:
+        return func()
+    finally:
+        geo_locator.weather_http = original
+
+
+def test_result_is_persisted_and_reused():
+    print("--- Testing persistent geo cache ---")
+    fake = _fake_http({"city": "Mapo-gu", "country_code": "KR"})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "geo_cache.json")
+        assert _with_http(fake, GeoLocator(path=path).detect) == "Mapo-gu,KR"
+        # 새 세션(새 인스턴스)에서도 외부 호출 없이 재사용
+        assert _with_http(fake, GeoLocator(path=path).detect) == "Mapo-gu,KR"
+        assert GeoLocator(path=path, ttl_sec=0).cached() is None
+    assert fake.get.call_count == 1
+    print("✅ Persistent geo cache passed!")
+
+
+def test_failure_backoff_and_coalescing():
+    print("--- Testing failure backoff / coalescing ---")
+    failing = _fake_http(status=429)
+    locator = GeoLocator(path=None)
+    assert _with_http(failing, locator.detect) is None
+    assert _with_http(failing, locator.detect) is None      # 제한 걸린 직후엔 재호출하지 않음
+    assert failing.get.call_count == 1
+
+    slow = _fake_http({"city": "Seoul", "country_code": "KR"}, delay=0.2)
+    locator = GeoLocator(path=None)
+    results = []
+
+    def run():
+        threads = [threading.Thread(target=lambda: results.append(locator.detect())) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    _with_http(slow, run)
+    assert results == ["Seoul,KR"] * 5
+    assert slow.get.call_count == 1
+    print("✅ Failure backoff / coalescing passed!")
+
+
+def test_background_detection_does_not_block():
+    print("--- Testing background detection ---")
+    slow = _fake_http({"city": "Gangnam-gu"}, delay=0.3)
+    locator = GeoLocator(path=None)
+
+    def run():
+        start = time.time()
+        future = locator.detect_in_background()
+        assert locator.detect_in_background() is future
+        elapsed = time.time() - start
+        return elapsed, future.result(timeout=2)
+    elapsed, city = _with_http(slow, run)
+    assert elapsed < 0.1
+    assert city == "Gangnam-gu"
+    assert locator.cached() == "Gangnam-gu"
+    print("✅ Background detection passed!")
+
+
+if __name__ == "__main__":
+    test_result_is_persisted_and_reused()
+    test_failure_backoff_and_coalescing()
+    test_background_detection_does_not_block()
@@ -0,0 +1,70 @@
+from hangul_text import compact_with_positions, decompose, squash_repeats, within_one_edit
+from intent_cache import normalize_utterance
+from keyword_matcher import FuzzyKeywordIndex, KeywordHit, KeywordMatcher
+
+
+def test_hangul_helpers():
+    print("--- Testing Hangul helpers ---")
+    assert decompose("밥") == "ㅂㅏㅂ"
+    assert decompose("배고파 ok") == "ㅂㅐㄱㅗㅍㅏ ok"
+    assert squash_repeats("배고파아아아아") == "배고파아아"
+    assert squash_repeats("ㅋㅋㅋㅋㅋ") == "ㅋㅋ"
+    assert normalize_utterance("  배고파아아아  ") == normalize_utterance("배고파아아")
+    assert compact_with_positions("배 고파") == ("배고파", [0, 2, 3])
+    assert within_one_edit("abc", "abd")
+    assert within_one_edit("abc", "acb")
+    assert within_one_edit("abc", "abxc")
+    assert not within_one_edit("abc", "xyc")
+    print("✅ Hangul helpers passed!")
+
+
+def _index():
+    index = FuzzyKeywordIndex()
+    index.add_table("cuisine", {"분식": ["떡볶이"], "한식": ["고기"]})
+    index.add_table("mood", {"배고픔": ["배고파"], "화남": ["스트레스", "짜증"]})
+    index.add_table("intent", {"recommend": ["배고파"]})
+    index.add_table("weather", {"추움": ["영하"]})
+    return index
+
+
+def test_fuzzy_index_spacing_and_typos():
+    print("--- Testing fuzzy keyword index ---")
+    index = _index()
+    assert index.find_all("떡 볶이") == [KeywordHit("cuisine", "분식", 0, "떡볶이")]
+    assert index.find_all("떡복이 먹자") == [KeywordHit("cuisine", "분식", 0, "떡볶이")]
+    assert {h.category for h in index.find_all("배 고파")} == {"intent", "mood"}
+    assert {h.label for h in index.find_all("배곺아")} == {"recommend", "배고픔"}
+    assert index.find_all("스트레쓰 받아") == [KeywordHit("mood", "화남", 0, "스트레스")]
+    print("✅ Fuzzy keyword index passed!")
+
+
+def test_fuzzy_index_avoids_false_hits():
+    index = _index()
+    # 두 글자 키워드는 오타를 허용하지 않음
+    assert index.find_all("영화 보러 가자") == []
+    assert index.find_all("짜응 나") == []
+    # 두 글자 구간이 띄어쓰기를 건너뛰면 매칭하지 않음
+    assert index.find_all("말고 기다려") == []
+    # 이미 정확히 매칭된 구간은 다시 찾지 않음
+    exact = KeywordMatcher()
+    exact.add("떡볶이", "cuisine", "분식")
+    text = "떡볶이"
+    assert index.find_all(text, exclude=exact.compile().find_all(text)) == []
+
+
+def test_intent_fallback_uses_fuzzy_index():
+    import bot_server
+    assert bot_server.analyze_intent_fallback("배 고파")["mood"] == "배고픔"
+    assert bot_server.analyze_intent_fallback("떡 볶이 먹을래")["cuisine_filters"] == ["분식"]
+    assert bot_server.analyze_intent_fallback("스트레쓰 받아")["mood"] == "화남"
+    assert bot_server.analyze_intent_fallback("영화 보고 싶다")["weather"] is None
+    assert bot_server.analyze_intent_fallback("배곺파")["mood"] == "배고픔"
+    # 두 글자 키워드("짜증")의 오타는 잡지 않음
+    assert bot_server.analyze_intent_fallback("짜응나")["mood"] is None
+
+
+if __name__ == "__main__":
+    test_hangul_helpers()
+    test_fuzzy_index_spacing_and_typos()
+    test_fuzzy_index_avoids_false_hits()
+    test_intent_fallback_uses_fuzzy_index()
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import tempfile
+from unittest.mock import MagicMock
+
+import bot_server
+import intent_classifier
+from intent_cache import IntentCache, normalize_utterance
+from gemini_pool import GeminiClientPool, KeyClient
+
+
+def test_normalize_and_lru():
+    print("--- Testing intent LRU ---")
+    assert normalize_utterance("  점심   추천 ") == normalize_utterance("점심 추천")
+    cache = IntentCache(max_entries=2)
+    cache.put("점심 추천", "local", {"intent": "recommend", "tag_filters": []})
+    cached = cache.get(" 점심  추천", "local")
+    cached["tag_filters"].append("soup")                    # 사본이므로 캐시는 그대로
+    assert cache.get("점심 추천", "local")["tag_filters"] == []
+    assert cache.get("점심 추천", "gemini") is None          # 출처별로 따로 보관
+    cache.put("a", "local", {})
+    cache.put("b", "local", {})
+    assert cache.get("점심 추천", "local") is None           # 가장 오래 안 쓴 항목 제거
+    stats = cache.stats()["sources"]
+    assert stats["local"]["hits"] == 2 and stats["gemini"]["misses"] == 1
+    print("✅ Intent LRU passed!")
+
+
+def test_repeated_utterances_skip_analysis():
+    print("--- Testing dispatch table / cache hits ---")
+    bot_server.intent_cache.clear()
+    original = bot_server.INTENT_MATCHER
+    bot_server.INTENT_MATCHER = MagicMock(wraps=original)
+    try:
+        assert bot_server.analyze_intent_fallback("도움말")["intent"] == "help"
+        first = bot_server.analyze_intent_fallback("비오는데 국밥 땡긴다")
+        second = bot_server.analyze_intent_fallback("비오는데 국밥 땡긴다 ")
+        assert first == second
+        assert bot_server.INTENT_MATCHER.find_all.call_count == 1
+    finally:
+        bot_server.INTENT_MATCHER = original
+    sources = bot_server.intent_cache.stats()["sources"]
+    assert sources["dispatch"]["hits"] == 1
+    assert sources["local"]["hits"] == 1
+    print("✅ Dispatch table / cache hits passed!")
+
+
+def test_gemini_result_is_cached():
+    print("--- Testing Gemini intent cache ---")
+    bot_server.intent_cache.clear()
+    model = MagicMock()
+
+    async def generate(prompt):
+        return MagicMock(text='{"intent": "casual", "casual_type": "chitchat", "filter": []}')
+    model.generate_content_async.side_effect = generate
+    original, original_log = bot_server.gemini_pool, intent_classifier.INTENT_LOG_FILE
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"intent": model})])
+    with tempfile.TemporaryDirectory() as tmp:
+        intent_classifier.INTENT_LOG_FILE = os.path.join(tmp, "intent_log.jsonl")
+        try:
+            for _ in range(3):
+                result = asyncio.run(bot_server.analyze_intent_with_gemini("오늘 회의 너무 길었어", []))
+                assert result["intent"] == "casual"
+            # Gemini 라벨은 로컬 분류기 학습용으로 한 번만 기록
+            assert intent_classifier.load_labeled_utterances(intent_classifier.INTENT_LOG_FILE) == [("오늘 회의 너무 길었어", "casual")]
+        finally:
+            bot_server.gemini_pool, intent_classifier.INTENT_LOG_FILE = original, original_log
+    assert model.generate_content_async.call_count == 1
+    print("✅ Gemini intent cache passed!")
+
+
+if __name__ == "__main__":
+    test_normalize_and_lru()
+    test_repeated_utterances_skip_analysis()
+    test_gemini_result_is_cached()
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import tempfile
+import threading
+from unittest.mock import AsyncMock
+
+import bot_server
+import intent_classifier
+import intent_train
+from intent_classifier import IntentClassifier
+
+SAMPLES = [
+    ("오늘 뭐 먹을지 골라줘", "recommend"), ("점심 메뉴 하나만 정해줘", "recommend"), ("배고픈데 아무거나 추천", "recommend"),
+    ("그건 왜 고른 거야", "explain"), ("그 메뉴 고른 이유가 뭐야", "explain"), ("어째서 그거야", "explain"),
+    ("그거 말고 딴거", "reject"), ("별로야 다른 거", "reject"), ("싫어 바꿔줘", "reject"),
+    ("좋아 거기 가자", "accept"), ("오케이 그걸로", "accept"), ("콜 거기로 가자", "accept"),
+    ("오늘 회의 너무 길었어", "casual"), ("주말에 영화 봤어", "casual"), ("너 이름이 뭐야", "casual"),
+    ("사용법 알려줘", "help"), ("어떻게 쓰는 거야", "help"), ("기능 뭐 있어", "help"),
+]
+
+
+def test_train_predict_and_persist():
+    print("--- Testing local intent classifier ---")
+    model = IntentClassifier.train(SAMPLES)
+    assert model.accuracy(SAMPLES) == 1.0
+    label, confidence = model.predict("그거 말고 딴거")
+    assert label == "reject" and 0.0 < confidence <= 1.0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "intent_model.npz")
+        model.save(path)
+        reloaded = IntentClassifier.load(path)
+        assert reloaded.predict("그거 말고 딴거") == model.predict("그거 말고 딴거")
+    assert IntentClassifier().predict("아무 말") == (None, 0.0)   # 모델 없으면 항상 Gemini로
+    print("✅ Local intent classifier passed!")
+
+
+def test_train_command_from_log():
+    print("--- Testing offline training command ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "intent_log.jsonl")
+        out_path = os.path.join(tmp, "intent_model.npz")
+        for utterance, intent in SAMPLES:
+            intent_classifier.log_labeled_utterance(utterance, intent, path=log_path)
+        intent_classifier.log_labeled_utterance("무시될 라벨", "unknown", path=log_path)
+        assert len(intent_classifier.load_labeled_utterances(log_path)) == len(SAMPLES)
+        assert intent_train.main(["--log", log_path, "--out", out_path, "--holdout", "0"]) == 0
+        assert IntentClassifier.load(out_path).is_trained
+    print("✅ Offline training command passed!")
+
+
+def test_log_written_off_loop_and_rotated():
+    print("--- Testing intent log writer ---")
+    original_max = intent_classifier.INTENT_LOG_MAX_BYTES
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "intent_log.jsonl")
+        loop_thread = threading.get_ident()
+        write_threads = []
+        original_write = intent_classifier.log_labeled_utterance
+
+        def write(*args):
+            write_threads.append(threading.get_ident())
+            original_write(*args)
+        intent_classifier.log_labeled_utterance = write
+        intent_classifier.INTENT_LOG_MAX_BYTES = 300
+        try:
+            async def run():
+                for utterance, intent in SAMPLES:
+                    await intent_classifier.alog_labeled_utterance(utterance, intent, path=log_path)
+                await intent_classifier.alog_labeled_utterance("그거 말고 딴거", "accept", path=log_path)
+            asyncio.run(run())
+        finally:
+            intent_classifier.log_labeled_utterance = original_write
+            intent_classifier.INTENT_LOG_MAX_BYTES = original_max
+        # 파일 쓰기는 이벤트 루프 밖에서
+        assert len(write_threads) == len(SAMPLES) + 1 and loop_thread not in write_threads
+        # 상한을 넘으면 .1로 넘기고 새로 시작 (백업은 하나만)
+        assert os.path.exists(log_path + ".1")
+        assert not os.path.exists(log_path + ".2")
+        assert os.path.getsize(log_path + ".1") <= 300 + 200
+        # 학습 데이터는 백업 + 현재 파일에서, 같은 발화는 최신 라벨
+        labels = dict(intent_classifier.load_labeled_utterances(log_path))
+        assert labels[intent_classifier.normalize_utterance("그거 말고 딴거")] == "accept"
+    print("✅ Intent log writer passed!")
+
+
+def test_confident_prediction_skips_gemini():
+    print("--- Testing confidence gate before Gemini ---")
+    original = (bot_server.intent_classifier, bot_server.analyze_intent_with_gemini, bot_server.GEMINI_AVAILABLE)
+    bot_server.intent_classifier = IntentClassifier.train(SAMPLES)
+    gemini = bot_server.analyze_intent_with_gemini = AsyncMock(return_value={"intent": "casual"})
+    bot_server.GEMINI_AVAILABLE = True
+
+    def decide(utterance, threshold):
+        bot_server.INTENT_CONFIDENCE_THRESHOLD = threshold
+        ctx = bot_server.detect_fast_intent(bot_server.normalize_request("clf_user", utterance))
+        ctx, _ = asyncio.run(bot_server.decide_request(ctx))
+        return ctx.intent
+
+    threshold = bot_server.INTENT_CONFIDENCE_THRESHOLD
+    try:
+        assert decide("별로야 다른 거 없어", 0.0) == "reject"
+        assert gemini.await_count == 0
+        assert decide("별로야 다른 거 없어", 1.01) == "casual"   # 확신도 부족 -> Gemini
+        assert gemini.await_count == 1
+    finally:
+        bot_server.INTENT_CONFIDENCE_THRESHOLD = threshold
+        bot_server.intent_classifier, bot_server.analyze_intent_with_gemini, bot_server.GEMINI_AVAILABLE = original
+    print("✅ Confidence gate passed!")
+
+
+if __name__ == "__main__":
+    test_train_predict_and_persist()
+    test_train_command_from_log()
+    test_log_written_off_loop_and_rotated()
+    test_confident_prediction_skips_gemini()
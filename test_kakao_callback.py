@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import bot_server
+from fake_gemini import FakeGeminiModel, LatencyProfile
+from gemini_pool import GeminiClientPool, KeyClient
+from kakao_callback import CallbackDispatcher
+from latency_budget import LatencyTracker
+from response_copy_cache import ResponseCopyCache
+
+
+class _Receiver:
+    """callbackUrl 대역: 받은 본문을 기록하고, 처음 fail_first번은 503으로 응답"""
+
+    def __init__(self, fail_first=0):
+        self.bodies = []
+        self.attempts = 0
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                receiver.attempts += 1
+                status = 503 if receiver.attempts <= fail_first else 200
+                if status == 200:
+                    receiver.bodies.append(body)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"status": "SUCCESS"}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/callback"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_dispatcher_retries_until_delivered():
+    print("--- Testing callback delivery retries ---")
+    receiver = _Receiver(fail_first=2)
+    dispatcher = CallbackDispatcher(workers=2, retry_base_sec=0.01)
+
+    async def answer():
+        await asyncio.sleep(0.05)
+        return {"version": "2.0", "template": {"outputs": [{"simpleText": {"text": "최종 답"}}]}}
+
+    async def run():
+        assert dispatcher.submit(receiver.url, answer(), lambda: {"fallback": True})
+        await dispatcher.join()
+        stats = dispatcher.stats()
+        await dispatcher.aclose()
+        return stats
+
+    try:
+        stats = asyncio.run(run())
+    finally:
+        receiver.close()
+    assert receiver.attempts == 3 and receiver.bodies[0]["template"]["outputs"][0]["simpleText"]["text"] == "최종 답"
+    assert stats["delivered"] == 1 and stats["retries"] == 2 and stats["failed"] == 0
+    print("✅ Callback retries passed!")
+
+
+def test_slow_answers_do_not_hold_workers():
+    print("--- Testing callback workers are not held by slow answers ---")
+    receiver = _Receiver()
+    dispatcher = CallbackDispatcher(workers=1, queue_size=2)
+    delivered_at = {}
+
+    async def answer(text, delay):
+        await asyncio.sleep(delay)
+        return {"text": text}
+
+    async def run():
+        start = time.perf_counter()
+        assert dispatcher.submit(receiver.url, answer("slow", 0.5), lambda: {"text": "fallback"})
+        assert dispatcher.submit(receiver.url, answer("fast", 0.05), lambda: {"text": "fallback"})
+        while not receiver.bodies:
+            await asyncio.sleep(0.01)
+        delivered_at["first"] = time.perf_counter() - start
+        waiting = dispatcher.stats()["waiting"]
+        # 기다리는 콜백도 한도에 포함
+        assert dispatcher.submit(receiver.url, answer("third", 0.0), lambda: {})
+        over = answer("over", 0.0)
+        assert not dispatcher.submit(receiver.url, over, lambda: {})
+        over.close()
+        await dispatcher.join()
+        await dispatcher.aclose()
+        return waiting
+
+    try:
+        waiting = asyncio.run(run())
+    finally:
+        receiver.close()
+    # 워커가 하나뿐이어도 빠른 응답이 느린 응답을 기다리지 않고 먼저 전송됨
+    assert receiver.bodies[0] == {"text": "fast"} and delivered_at["first"] < 0.4
+    assert waiting == 1
+    assert [b["text"] for b in receiver.bodies] == ["fast", "third", "slow"]
+    assert dispatcher.counters["rejected"] == 1
+    print("✅ Slow answers do not hold workers passed!")
+
+
+def test_slow_gemini_answer_arrives_by_callback():
+    print("--- Testing useCallback flow with slow Gemini ---")
+    receiver = _Receiver()
+    slow = FakeGeminiModel("generation", latency=LatencyProfile(0.4, 0.4))
+    recommender = MagicMock()
+    recommender.recommend.return_value = {"name": "김치찌개", "area": "DDMC 지하", "tags": ["soup"], "category": "한식"}
+
+    def payload(utterance, user_id):
+        return bot_server.SkillPayload(userRequest={
+            "utterance": utterance, "user": {"id": user_id}, "callbackUrl": receiver.url,
+        })
+
+    async def run():
+        # 바로 끝나는 요청(도움말)은 콜백 없이 응답
+        quick = await bot_server.recommend_lunch(payload("도움말", "callback_user_1"))
+        started = time.perf_counter()
+        ack = await bot_server.recommend_lunch(payload("비 오는데 국물 있는 거 추천", "callback_user_2"))
+        ack_sec = time.perf_counter() - started
+        await bot_server.kakao_callbacks.join()
+        await bot_server.kakao_callbacks.aclose()
+        return quick, ack, ack_sec
+
+    original = (bot_server.gemini_pool, bot_server.GEMINI_AVAILABLE, bot_server.r, bot_server.response_copy_cache,
+                bot_server.gemini_latency, bot_server.CALLBACK_ACK_SEC, bot_server.GEMINI_STREAMING)
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("fake", {"generation": slow})])
+    bot_server.GEMINI_AVAILABLE = True
+    bot_server.r = recommender
+    bot_server.response_copy_cache = ResponseCopyCache(path=None)
+    bot_server.gemini_latency = LatencyTracker()
+    bot_server.CALLBACK_ACK_SEC = 0.1
+    bot_server.GEMINI_STREAMING = False
+    try:
+        quick, ack, ack_sec = asyncio.run(run())
+    finally:
+        (bot_server.gemini_pool, bot_server.GEMINI_AVAILABLE, bot_server.r, bot_server.response_copy_cache,
+         bot_server.gemini_latency, bot_server.CALLBACK_ACK_SEC, bot_server.GEMINI_STREAMING) = original
+        bot_server.session_manager.clear_session("callback_user_1")
+        bot_server.session_manager.clear_session("callback_user_2")
+        receiver.close()
+    assert "useCallback" not in quick and "사용법" in quick["template"]["outputs"][0]["simpleText"]["text"]
+    assert ack["useCallback"] is True and ack_sec < 0.4
+    # 최종 응답은 Gemini 멘트가 담겨 callbackUrl로 도착
+    assert len(receiver.bodies) == 1
+    text = receiver.bodies[0]["template"]["outputs"][0]["simpleText"]["text"]
+    assert "든든하게" in text
+    assert slow.calls == 1
+    print("✅ useCallback flow passed!")
+
+
+if __name__ == "__main__":
+    test_dispatcher_retries_until_delivered()
+    test_slow_answers_do_not_hold_workers()
+    test_slow_gemini_answer_arrives_by_callback()
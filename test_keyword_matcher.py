@@ -0,0 +1,53 @@
+import random
+
+from keyword_matcher import KeywordHit, KeywordMatcher, first_label, hit_labels
+
+
+def test_matches_every_overlapping_keyword():
+    print("--- Testing Aho-Corasick hits ---")
+    matcher = KeywordMatcher()
+    matcher.add_table("cuisine", {"한식": ["비빔밥", "국밥"]})
+    matcher.add_table("tag", {"rice": ["밥", "비빔밥"], "soup": ["국밥", "탕"]})
+    matcher.add_table("weather", {"비": ["비"]})
+    hits = matcher.compile().find_all("비빔밥이랑 국밥")
+
+    assert KeywordHit("weather", "비", 0, "비") in hits
+    assert KeywordHit("cuisine", "한식", 0, "비빔밥") in hits
+    assert KeywordHit("tag", "rice", 2, "밥") in hits
+    assert KeywordHit("tag", "soup", 6, "국밥") in hits
+    assert [h.position for h in hits] == sorted(h.position for h in hits)
+    assert hit_labels(hits)["tag"] == {"rice", "soup"}
+    assert first_label(["soup", "rice"], hit_labels(hits)["tag"]) == "soup"
+    print("✅ Aho-Corasick hits passed!")
+
+
+def test_agrees_with_substring_search():
+    print("--- Testing against brute-force search ---")
+    words = ["ab", "b", "bab", "abc", "c", "ca", "aab", "비", "비오", "오"]
+    matcher = KeywordMatcher()
+    for w in words:
+        matcher.add(w, "k", w)
+    matcher.compile()
+    rng = random.Random(7)
+    for _ in range(500):
+        text = "".join(rng.choice("abc비오") for _ in range(rng.randint(0, 12)))
+        expected = sorted((i, w) for w in words for i in range(len(text)) if text.startswith(w, i))
+        got = sorted((h.position, h.keyword) for h in matcher.find_all(text))
+        assert got == expected, text
+    print("✅ Brute-force agreement passed!")
+
+
+def test_intent_fallback_uses_single_matcher():
+    import bot_server
+    result = bot_server.analyze_intent_fallback("비오는데 얼큰한 짬뽕 추천")
+    assert result["intent"] == "recommend"
+    assert result["weather"] == "비"
+    assert result["cuisine_filters"] == ["중식"]
+    assert result["tag_filters"] == ["noodle", "spicy"]
+    assert bot_server.analyze_intent_fallback("이거 왜 추천했어")["intent"] == "explain"
+
+
+if __name__ == "__main__":
+    test_matches_every_overlapping_keyword()
+    test_agrees_with_substring_search()
+    test_intent_fallback_uses_single_matcher()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import bot_server
+from latency_budget import LatencyTracker
+from response_copy_cache import ResponseCopyCache
+from gemini_pool import GeminiClientPool, KeyClient
+
+
+def test_adaptive_deadline():
+    print("--- Testing adaptive Gemini deadline ---")
+    tracker = LatencyTracker(min_samples=10)
+    # 표본이 부족하면 고정 상한
+    assert tracker.deadline("generation", ceiling=2.5) == 2.5
+    for ms in range(500, 1500, 100):                      # 0.5 ~ 1.4초
+        tracker.record("generation", ms / 1000)
+    assert tracker.percentile("generation", 90) == 1.3
+    assert abs(tracker.deadline("generation", ceiling=2.5) - 1.3 * 1.15) < 1e-9
+    # 남은 예산이 적으면 그에 맞춰 줄임 (응답 조립 시간 0.4초 확보)
+    assert abs(tracker.deadline("generation", ceiling=2.5, remaining=1.0) - 0.6) < 1e-9
+    assert tracker.deadline("generation", ceiling=2.5, remaining=0.2) == 0.0
+    # 느린 날: 대부분 상한을 넘기면 기다리지 않음
+    for _ in range(20):
+        tracker.record("intent", 1.8, timed_out=True)
+    assert tracker.deadline("intent", ceiling=1.8) == 0.0
+    assert tracker.stats()["intent"]["timeouts"] == 20
+    print("✅ Adaptive deadline passed!")
+
+
+def test_hedge_returns_local_and_keeps_late_result():
+    print("--- Testing hedged Gemini generation ---")
+    model = MagicMock()
+
+    async def slow_generate(prompt):
+        await asyncio.sleep(0.3)
+        return MagicMock(text="늦게 도착한 멘트")
+    model.generate_content_async.side_effect = slow_generate
+    choice = {"name": "우동", "category": "우동", "area": "YTN 지하식당", "tags": ["noodle"]}
+    intent = {"intent": "recommend", "emotion": "neutral"}
+
+    async def run():
+        started = time.perf_counter()
+        # 남은 예산 0.5초 -> 0.1초만 기다리고 로컬 멘트로 응답
+        text = await bot_server.generate_response_with_gemini(
+            "점심", choice, intent, [], deadline_at=time.time() + 0.5
+        )
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*bot_server._background_tasks)
+        again = await bot_server.generate_response_with_gemini("점심", choice, intent, [])
+        return text, elapsed, again
+
+    original = (bot_server.gemini_pool, bot_server.response_copy_cache, bot_server.gemini_latency)
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"generation": model})])
+    bot_server.response_copy_cache = ResponseCopyCache(path=None)
+    bot_server.gemini_latency = LatencyTracker()
+    try:
+        text, elapsed, again = asyncio.run(run())
+        stats = bot_server.gemini_latency.stats()
+    finally:
+        bot_server.gemini_pool, bot_server.response_copy_cache, bot_server.gemini_latency = original
+    assert "늦게 도착한 멘트" not in text and "우동" in text
+    assert elapsed < 0.25, elapsed
+    # 늦게 온 결과는 버리지 않고 캐시에 저장 -> 다음 요청은 바로 사용
+    assert again.endswith("늦게 도착한 멘트")
+    assert stats["generation"]["outcomes"] == {"local": 1}
+    print("✅ Hedged generation passed!")
+
+
+if __name__ == "__main__":
+    test_adaptive_deadline()
+    test_hedge_returns_local_and_keeps_late_result()
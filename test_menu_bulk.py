@@ -0,0 +1,152 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import lunch_data
+
+
+def _with_temp_menus(func):
+    """실제 사용자 메뉴 파일을 건드리지 않도록 임시 파일로 교체해서 실행"""
+    def wrapper():
+        original = lunch_data.JSON_FILE
+        with tempfile.TemporaryDirectory() as tmp:
+            lunch_data.JSON_FILE = os.path.join(tmp, "menus.json")
+            with open(lunch_data.JSON_FILE, 'w', encoding='utf-8') as f:
+                json.dump(lunch_data.DEFAULT_MENUS, f, ensure_ascii=False)
+            try:
+                func(tmp)
+            finally:
+                lunch_data.JSON_FILE = original
+                lunch_data.refresh_menus()
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+@_with_temp_menus
+def test_bulk_import_csv(tmp):
+    print("--- Testing CSV bulk import ---")
+    src = os.path.join(tmp, "court.csv")
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write("name,area,category,cuisine,tags\n")
+        f.write("푸드코트 라멘,YTN 지하식당,라멘,일식,noodle|soup|hot\n")
+        f.write("마라탕,건너편 먹자골목,마라탕,중식,soup\n")          # 기존 메뉴와 중복
+        f.write("이상한가게,화성,기타,기타,\n")                       # 잘못된 구역
+        f.write("태그오류,회사 1층,기타,기타,crunchy\n")              # 잘못된 태그
+        f.write("푸드코트 라멘,YTN 지하식당,라멘,일식,noodle\n")       # 파일 내 중복
+
+    result = lunch_data.bulk_import_menus(src)
+    print(result)
+    assert result["added"] == ["푸드코트 라멘"]
+    assert result["duplicates"] == ["마라탕", "푸드코트 라멘"]
+    assert [line for line, _ in result["errors"]] == [4, 5]
+
+    names = [m['name'] for m in lunch_data.load_menus()]
+    assert names.count("푸드코트 라멘") == 1
+    assert lunch_data.MENUS[-1]["tags"] == ["noodle", "soup", "hot"]
+    print("✅ CSV bulk import passed!")
+
+
+@_with_temp_menus
+def test_bulk_import_jsonl_dry_run(tmp):
+    print("--- Testing JSONL dry run ---")
+    src = os.path.join(tmp, "court.jsonl")
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"name": "샐러드바", "area": "회사 지하식당", "tags": ["light"]}, ensure_ascii=False) + "\n")
+        f.write("{broken json\n")
+
+    result = lunch_data.bulk_import_menus(src, dry_run=True)
+    assert result["added"] == ["샐러드바"]
+    assert result["errors"][0][0] == 2
+    assert "샐러드바" not in [m['name'] for m in lunch_data.load_menus()]
+    print("✅ JSONL dry run passed!")
+
+
+@_with_temp_menus
+def test_bulk_import_bad_field_types(tmp):
+    print("--- Testing JSONL rows with wrong field types ---")
+    os.chmod(lunch_data.JSON_FILE, 0o644)
+    src = os.path.join(tmp, "types.jsonl")
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"name": 123, "area": "회사 지하식당"}, ensure_ascii=False) + "\n")
+        f.write(json.dumps({"name": "태그숫자", "area": "회사 지하식당", "tags": [1, 2]}, ensure_ascii=False) + "\n")
+        f.write(json.dumps(["목록", "행"], ensure_ascii=False) + "\n")
+        f.write(json.dumps({"name": "샐러드바", "area": "회사 지하식당", "tags": "light"}, ensure_ascii=False) + "\n")
+
+    result = lunch_data.bulk_import_menus(src)
+    # 잘못된 행만 오류로 남고 나머지는 추가됨
+    assert result["added"] == ["샐러드바"]
+    assert [line for line, _ in result["errors"]] == [1, 2, 3]
+    # 다시 쓴 menus.json의 권한 유지
+    assert oct(os.stat(lunch_data.JSON_FILE).st_mode & 0o777) == oct(0o644)
+    print("✅ Bad field types passed!")
+
+
+@_with_temp_menus
+def test_bulk_import_does_not_lose_concurrent_save(tmp):
+    print("--- Testing bulk import vs concurrent save ---")
+    src = os.path.join(tmp, "court.jsonl")
+    with open(src, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"name": "쌀국수", "area": "회사 지하식당"}, ensure_ascii=False) + "\n")
+    original_load = lunch_data.load_menus
+    loaded = threading.Event()
+
+    def slow_load():
+        # 일괄 가져오기가 메뉴를 읽은 직후에 다른 스레드가 저장하도록 틈을 만듦
+        menus = original_load()
+        if threading.current_thread().name == "bulk":
+            loaded.set()
+            time.sleep(0.2)
+        return menus
+
+    lunch_data.load_menus = slow_load
+    try:
+        worker = threading.Thread(target=lunch_data.bulk_import_menus, args=(src,), name="bulk")
+        worker.start()
+        loaded.wait(2)
+        assert lunch_data.save_new_menu("새가게", "회사 지하식당", "백반", "한식", [])
+        worker.join()
+    finally:
+        lunch_data.load_menus = original_load
+    names = [m['name'] for m in lunch_data.load_menus()]
+    assert "쌀국수" in names and "새가게" in names
+    print("✅ Concurrent save passed!")
+
+
+def test_new_menus_file_mode():
+    print("--- Testing new menus.json mode ---")
+    original = lunch_data.JSON_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        lunch_data.JSON_FILE = os.path.join(tmp, "menus.json")
+        umask = os.umask(0o077)
+        try:
+            lunch_data._write_menus(lunch_data.DEFAULT_MENUS)
+            mode = os.stat(lunch_data.JSON_FILE).st_mode & 0o777
+        finally:
+            current_umask = os.umask(umask)
+            lunch_data.JSON_FILE = original
+    # 새 파일은 프로세스 umask를 건드리지 않고 고정 권한으로
+    assert mode == lunch_data.MENUS_FILE_MODE and current_umask == 0o077
+    print("✅ New file mode passed!")
+
+
+@_with_temp_menus
+def test_export_roundtrip(tmp):
+    print("--- Testing export -> import roundtrip ---")
+    for ext in ("csv", "jsonl"):
+        out = os.path.join(tmp, f"export.{ext}")
+        count = lunch_data.export_menus(out)
+        assert count == len(lunch_data.DEFAULT_MENUS)
+        rows = [lunch_data.validate_menu_row(row)[0] for _, row in lunch_data.iter_menu_rows(out)]
+        assert rows == lunch_data.DEFAULT_MENUS
+    print("✅ Export roundtrip passed!")
+
+
+if __name__ == "__main__":
+    test_bulk_import_csv()
+    test_bulk_import_jsonl_dry_run()
+    test_bulk_import_bad_field_types()
+    test_bulk_import_does_not_lose_concurrent_save()
+    test_new_menus_file_mode()
+    test_export_roundtrip()
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import tempfile
+from unittest.mock import MagicMock
+
+import bot_server
+import intent_classifier
+from near_duplicate_cache import NearDuplicateCache, jaccard, shingles
+from gemini_pool import GeminiClientPool, KeyClient
+
+
+def test_similar_phrasings_share_result():
+    print("--- Testing MinHash/LSH near-duplicate lookup ---")
+    cache = NearDuplicateCache(threshold=0.7)
+    cache.put("점심 뭐먹지?", {"intent": "recommend", "cuisine_filters": []})
+    result, matched, similarity = cache.lookup("점심 뭐 먹지ㅠ")
+    assert result["intent"] == "recommend" and matched == "점심뭐먹지" and similarity == 1.0
+    result["cuisine_filters"].append("한식")                       # 사본이므로 캐시는 그대로
+    assert cache.lookup("점심뭐먹지")[0]["cuisine_filters"] == []
+    assert cache.lookup("저녁 뭐먹지?") is None                     # 유사도 미달
+    assert jaccard(shingles("저녁 뭐먹지?"), shingles("점심 뭐먹지?")) < 0.7
+    assert cache.stats()["hits"] == 2 and cache.stats()["lookups"] == 3
+    print("✅ Near-duplicate lookup passed!")
+
+
+def test_eviction_and_audit():
+    print("--- Testing eviction / false-hit audit ---")
+    cache = NearDuplicateCache(max_entries=1)
+    cache.put("오늘 회의 너무 길었어", {"intent": "casual"})
+    cache.put("이거 말고 다른 거 없어", {"intent": "reject"})
+    assert cache.lookup("오늘 회의 너무 길었어") is None
+    assert all(bucket for bucket in cache.buckets.values())
+    assert sum(len(b) for b in cache.buckets.values()) == cache.bands   # 남은 항목 하나만 색인
+    assert not cache.audit("a", "b", 0.8, {"intent": "reject"}, {"intent": "reject"})
+    assert cache.audit("a", "b", 0.8, {"intent": "reject"}, {"intent": "casual"})
+    # 의도가 같아도 조건이 다르면 오답 (없음/빈 목록은 같게, 목록 순서는 무관)
+    assert not cache.audit("a", "b", 0.8, {"intent": "recommend", "cuisine_filters": ["한식", "중식"], "mood": None},
+                           {"intent": "recommend", "cuisine_filters": ["중식", "한식"], "weather": None})
+    assert cache.audit("a", "b", 0.8, {"intent": "recommend", "cuisine_filters": ["중식"]},
+                       {"intent": "recommend", "cuisine_filters": ["한식"]})
+    stats = cache.stats()
+    assert stats["audited"] == 4 and stats["false_hits"] == 2 and stats["false_hit_rate"] == 0.5
+    assert stats["recent_audits"][-1]["mismatched"] == ["cuisine_filters"]
+    print("✅ Eviction / audit passed!")
+
+
+def test_gemini_near_duplicates_skip_call():
+    print("--- Testing Gemini near-duplicate reuse ---")
+    bot_server.intent_cache.clear()
+    bot_server.near_intent_cache.clear()
+    model = MagicMock()
+
+    async def generate(prompt):
+        return MagicMock(text='{"intent": "recommend", "filter": []}')
+    model.generate_content_async.side_effect = generate
+
+    async def run():
+        first = await bot_server.analyze_intent_with_gemini("점심 뭐먹지?", [])
+        second = await bot_server.analyze_intent_with_gemini("점심 뭐 먹지ㅠㅠ", [])
+        await asyncio.gather(*bot_server._background_tasks)
+        return first, second
+
+    original = (bot_server.gemini_pool, bot_server.NEAR_DUP_AUDIT_RATE, intent_classifier.INTENT_LOG_FILE)
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"intent": model})])
+    bot_server.NEAR_DUP_AUDIT_RATE = 1.0
+    with tempfile.TemporaryDirectory() as tmp:
+        intent_classifier.INTENT_LOG_FILE = os.path.join(tmp, "intent_log.jsonl")
+        try:
+            first, second = asyncio.run(run())
+        finally:
+            bot_server.gemini_pool, bot_server.NEAR_DUP_AUDIT_RATE, intent_classifier.INTENT_LOG_FILE = original
+    assert first["intent"] == second["intent"] == "recommend"
+    # 1회는 실제 분석, 1회는 재사용 결과 감사용 (응답은 기다리지 않음)
+    assert model.generate_content_async.call_count == 2
+    stats = bot_server.near_intent_cache.stats()
+    assert stats["hits"] == 1 and stats["audited"] == 1 and stats["false_hits"] == 0
+    print("✅ Gemini near-duplicate reuse passed!")
+
+
+def test_near_hit_reuses_intent_only():
+    print("--- Testing near-duplicate reuse keeps the new utterance's slots ---")
+    bot_server.intent_cache.clear()
+    bot_server.near_intent_cache.clear()
+    first, second = "중식 말고 한식 추천", "한식 말고 중식 추천"
+    assert jaccard(shingles(first), shingles(second)) >= bot_server.near_intent_cache.threshold
+    # 첫 발화의 Gemini 결과(한식)와 다른 조건이 섞인 결과를 저장해 둠
+    bot_server.near_intent_cache.put(first, {
+        "intent": "recommend", "casual_type": None, "cuisine_filters": ["한식"], "weather": "비", "mood": "우울",
+    })
+    original = bot_server.NEAR_DUP_AUDIT_RATE
+    bot_server.NEAR_DUP_AUDIT_RATE = 0.0
+    try:
+        result = asyncio.run(bot_server.analyze_intent_with_gemini(second, []))
+    finally:
+        bot_server.NEAR_DUP_AUDIT_RATE = original
+    local = bot_server.analyze_intent_fallback(second)
+    assert result["intent"] == "recommend"
+    # 조건은 새 발화에서 다시 추출 (저장된 날씨/기분/음식 종류를 물려받지 않음)
+    assert result["cuisine_filters"] == local["cuisine_filters"] and "중식" in result["cuisine_filters"]
+    assert result["weather"] is None and result["mood"] is None
+    assert bot_server.near_intent_cache.stats()["hits"] == 1
+    bot_server.near_intent_cache.clear()
+    print("✅ Near-duplicate intent-only reuse passed!")
+
+
+if __name__ == "__main__":
+    test_similar_phrasings_share_result()
+    test_eviction_and_audit()
+    test_gemini_near_duplicates_skip_call()
+    test_near_hit_reuses_intent_only()
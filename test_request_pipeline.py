@@ -0,0 +1,80 @@
+import asyncio
+import dataclasses
+from unittest.mock import MagicMock
+
+import bot_server
+from request_pipeline import PIPELINE_STAGES, PipelineStats, StageTimings
+
+
+def _run(utterance, user_id="pipeline_user"):
+    return asyncio.run(bot_server.handle_recommendation_logic(user_id, utterance, None, 0.0))
+
+
+def _with_fake_recommender(func):
+    def wrapper():
+        original_r, original_gemini = bot_server.r, bot_server.GEMINI_AVAILABLE
+        bot_server.r = MagicMock()
+        bot_server.r.recommend.return_value = {"name": "TestMenu", "area": "TestArea", "tags": ["soup"], "category": "TestCat"}
+        bot_server.GEMINI_AVAILABLE = False
+        try:
+            func()
+        finally:
+            bot_server.r, bot_server.GEMINI_AVAILABLE = original_r, original_gemini
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+def test_context_is_immutable():
+    print("--- Testing immutable request context ---")
+    ctx = bot_server.normalize_request("u1", "  비오는데 국밥 추천해줘 ")
+    assert ctx.compact == "비오는데국밥추천해줘"
+    assert ctx.text == "비오는데 국밥 추천해줘"
+    try:
+        ctx.intent = "recommend"
+        raise AssertionError("context should be frozen")
+    except dataclasses.FrozenInstanceError:
+        pass
+    enriched = bot_server.detect_fast_intent(ctx)
+    assert ctx.local_intent == {} and enriched.local_intent["weather"] == "비"
+    print("✅ Immutable context passed!")
+
+
+@_with_fake_recommender
+def test_every_stage_is_timed_once():
+    print("--- Testing stage timings ---")
+    bot_server.pipeline_stats.reset()
+    original = bot_server.analyze_intent_fallback
+    spy = bot_server.analyze_intent_fallback = MagicMock(wraps=original)
+    try:
+        response = _run("국물 있는 한식 추천해줘")
+    finally:
+        bot_server.analyze_intent_fallback = original
+    assert "TestMenu" in response["template"]["outputs"][0]["simpleText"]["text"]
+    assert spy.call_count == 1
+    stats = bot_server.pipeline_stats.snapshot()
+    assert stats["requests"] == 1
+    assert list(stats["stages"]) == list(PIPELINE_STAGES)
+
+    # 바로 답하는 요청은 gate에서 끝남
+    bot_server.pipeline_stats.reset()
+    _run("도움말")
+    assert list(bot_server.pipeline_stats.snapshot()["stages"]) == ["normalize", "fast_intent", "gate"]
+    print("✅ Stage timings passed!")
+
+
+def test_stage_timer_summary():
+    timings = StageTimings()
+    with timings.stage("normalize"):
+        pass
+    with timings.stage("render"):
+        pass
+    assert timings.summary().startswith("normalize=")
+    stats = PipelineStats()
+    stats.record(timings)
+    assert stats.snapshot()["stages"]["render"]["count"] == 1
+
+
+if __name__ == "__main__":
+    test_context_is_immutable()
+    test_every_stage_is_timed_once()
+    test_stage_timer_summary()
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import bot_server
+import lunch_data
+import recommender
+from response_copy_cache import ResponseCopyCache, copy_key
+from gemini_pool import GeminiClientPool, KeyClient
+
+
+def test_variants_ttl_and_persistence():
+    print("--- Testing response copy cache (memory + SQLite) ---")
+    key = copy_key("recommend", menu="마라탕", tags=["spicy", "soup"], mood=None, weather="비")
+    assert key == copy_key("recommend", weather="비", tags=["soup", "spicy"], menu="마라탕")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "copy.sqlite3")
+        cache = ResponseCopyCache(path, max_variants=2)
+        assert cache.get(key) is None
+        cache.put(key, "얼큰한 마라탕 어때요?", menu="마라탕", created_at=time.time() - 30)
+        cache.put(key, "얼큰한 마라탕 어때요?", menu="마라탕")      # 같은 문구는 한 번만
+        cache.put(key, "비 오는 날엔 마라탕!", menu="마라탕", created_at=time.time() - 20)
+        cache.put(key, "뜨끈한 국물 한 그릇!", menu="마라탕")
+        assert cache.variant_count(key) == 2 and not cache.needs_variants(key)
+        assert cache.get(key) in ("비 오는 날엔 마라탕!", "뜨끈한 국물 한 그릇!")
+
+        # 재시작해도 디스크에서 읽어 옴
+        reopened = ResponseCopyCache(path, max_variants=2)
+        assert reopened.get(key) in ("비 오는 날엔 마라탕!", "뜨끈한 국물 한 그릇!")
+        assert reopened.get(key) is not None
+        stats = reopened.stats()
+        assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1 and stats["stored_variants"] == 2
+
+        # TTL이 지난 문구는 쓰지 않음
+        expired = ResponseCopyCache(path, ttl_sec=10)
+        assert expired.get(key) is not None
+        expired.put("explain:{}", "오래된 설명", created_at=time.time() - 60)
+        assert expired.get("explain:{}") is None
+    print("✅ Response copy cache passed!")
+
+
+def test_async_access_runs_sqlite_off_loop():
+    print("--- Testing async copy cache access ---")
+    key = copy_key("recommend", menu="국밥")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCopyCache(os.path.join(tmp, "copy.sqlite3"))
+        loop_thread = threading.get_ident()
+        disk_threads = []
+        original_load = cache._load_from_disk
+
+        def load(key, now):
+            disk_threads.append(threading.get_ident())
+            return original_load(key, now)
+        cache._load_from_disk = load
+
+        async def run():
+            await cache.aput(key, "든든한 국밥 어때요?", menu="국밥")
+            return await cache.aget(key), await cache.aget(key)
+
+        first, second = asyncio.run(run())
+        assert first == second == "든든한 국밥 어때요?"
+        # 디스크 읽기(저장 전 확인 + 첫 조회)는 모두 이벤트 루프 밖, 두 번째 조회는 메모리
+        assert len(disk_threads) == 2 and loop_thread not in disk_threads
+        assert cache.stats()["memory_hits"] == 1
+        cache.db.close()
+    print("✅ Async copy cache access passed!")
+
+
+def test_menu_edit_invalidates_copy():
+    print("--- Testing copy invalidation on menu edit ---")
+    cache = ResponseCopyCache(path=None)
+    cache.put("recommend:a", "돈까스 추천!", menu="돈까스")
+    cache.put("recommend:b", "마라탕 추천!", menu="마라탕")
+    original = bot_server.response_copy_cache
+    bot_server.response_copy_cache = cache
+    try:
+        lunch_data._notify_menu_change(["돈까스"])
+    finally:
+        bot_server.response_copy_cache = original
+    assert cache.get("recommend:a") is None
+    assert cache.get("recommend:b") == "마라탕 추천!"
+    print("✅ Copy invalidation passed!")
+
+
+def test_external_menu_edit_reloads_bot():
+    print("--- Testing menus.json edits from another process ---")
+    cache = ResponseCopyCache(path=None)
+    cache.put("recommend:a", "돈까스 추천!", menu="돈까스")
+    cache.put("recommend:b", "마라탕 추천!", menu="마라탕")
+    original_cache, original_file = bot_server.response_copy_cache, lunch_data.JSON_FILE
+    original_trigger, original_r = bot_server.trigger_weather_revalidation, bot_server.r
+    bot_server.response_copy_cache = cache
+    bot_server.trigger_weather_revalidation = lambda: None
+    # 다른 테스트가 r을 MagicMock으로 바꿔 둘 수 있으므로 실제 추천기 (히스토리 파일은 건드리지 않음)
+    bot_server.r = recommender.LunchRecommender.__new__(recommender.LunchRecommender)
+    with tempfile.TemporaryDirectory() as tmp:
+        lunch_data.JSON_FILE = os.path.join(tmp, "menus.json")
+        try:
+            lunch_data._write_menus(lunch_data.DEFAULT_MENUS)
+            lunch_data.refresh_menus()
+            bot_server.r.refresh_data()
+            # 이미 읽은 파일이면 아무것도 하지 않음
+            assert lunch_data.check_menus_file() == []
+
+            # 관리 앱/CLI처럼 파일만 직접 고침 (이 프로세스의 저장 함수를 거치지 않음)
+            menus = [dict(m) for m in lunch_data.DEFAULT_MENUS if m["name"] != "마라탕"]
+            menus[2]["tags"] = ["meat"]
+            with open(lunch_data.JSON_FILE, 'w', encoding='utf-8') as f:
+                json.dump(menus, f, ensure_ascii=False)
+            st = os.stat(lunch_data.JSON_FILE)
+            os.utime(lunch_data.JSON_FILE, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+            # 다음 요청의 enrich 단계에서 mtime 변화를 보고 다시 읽음
+            bot_server.enrich_request(bot_server.RequestContext(utterance="점심 추천", user_id="copy-tester"))
+            names = [m["name"] for m in bot_server.r.menus]
+            assert "마라탕" not in names and len(names) == len(menus)
+            assert cache.get("recommend:b") is None
+            assert cache.get("recommend:a") == "돈까스 추천!"
+        finally:
+            bot_server.response_copy_cache = original_cache
+            bot_server.trigger_weather_revalidation, bot_server.r = original_trigger, original_r
+            lunch_data.JSON_FILE = original_file
+            lunch_data.refresh_menus()
+    print("✅ External menu edit reload passed!")
+
+
+def test_recommend_copy_served_from_cache():
+    print("--- Testing Gemini copy reuse ---")
+    model = MagicMock()
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        return MagicMock(text=f"맛있는 돈까스 어때요? ({len(calls)})")
+    model.generate_content_async.side_effect = generate
+    choice = {"name": "돈까스", "category": "돈까스", "area": "YTN 지하식당", "tags": ["meat"]}
+    intent = {"intent": "recommend", "emotion": "neutral", "mood": None}
+
+    async def run():
+        first = await bot_server.generate_response_with_gemini("점심 추천", choice, intent, [])
+        second = await bot_server.generate_response_with_gemini("밥 뭐 먹지", choice, intent, [])
+        await asyncio.gather(*bot_server._background_tasks)
+        return first, second
+
+    original = (bot_server.gemini_pool, bot_server.response_copy_cache)
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"generation": model})])
+    bot_server.response_copy_cache = ResponseCopyCache(path=None, max_variants=2)
+    try:
+        first, second = asyncio.run(run())
+        cache = bot_server.response_copy_cache
+    finally:
+        bot_server.gemini_pool, bot_server.response_copy_cache = original
+    assert first == second == "맛있는 돈까스 어때요? (1)"
+    # 두 번째 요청은 캐시에서 응답하고, 백그라운드로 변형 하나를 더 만들어 둠
+    assert len(calls) == 2
+    assert cache.stats()["memory_hits"] == 1 and not cache.needs_variants(copy_key(
+        "recommend", menu="돈까스", category="돈까스", area="YTN 지하식당", tags=["meat"],
+        meal_label="점심", tone="밝은 톤"))
+    print("✅ Gemini copy reuse passed!")
+
+
+def test_idle_pregeneration_fills_pool():
+    print("--- Testing idle-time copy pregeneration ---")
+    assert bot_server.is_peak_time(datetime(2026, 3, 2, 12, 0))
+    assert not bot_server.is_peak_time(datetime(2026, 3, 2, 15, 0))
+
+    model = MagicMock()
+
+    async def generate(prompt):
+        return MagicMock(text=f"미리 만든 문구 {model.generate_content_async.call_count}")
+    model.generate_content_async.side_effect = generate
+    menu = {"name": "국밥", "category": "국밥", "area": "회사 지하식당", "tags": ["soup"]}
+    fake_r = MagicMock(menus=[menu])
+    fake_r.recommend.return_value = menu
+
+    async def run():
+        targets = bot_server.build_pregen_targets()
+        while await bot_server.pregenerate_copy_once(targets):
+            pass
+        ctx = bot_server.normalize_request("pregen_user", "점심 추천")
+        ctx = bot_server.detect_fast_intent(ctx).with_(use_gemini=False, meal_label="점심")
+        return targets, await bot_server._render_menu_text(ctx, menu)
+
+    names = ("gemini_pool", "response_copy_cache", "r", "GEMINI_AVAILABLE", "last_request_at")
+    original = {name: getattr(bot_server, name) for name in names}
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"generation": model})])
+    bot_server.response_copy_cache = ResponseCopyCache(path=None, max_variants=2)
+    bot_server.r = fake_r
+    bot_server.GEMINI_AVAILABLE = True
+    try:
+        bot_server.last_request_at = time.time()
+        assert not bot_server.can_pregenerate(datetime(2026, 3, 2, 15, 0))   # 방금 요청이 있었음
+        bot_server.last_request_at = 0.0
+        assert bot_server.can_pregenerate(datetime(2026, 3, 2, 15, 0))
+        assert not bot_server.can_pregenerate(datetime(2026, 3, 2, 12, 0))
+        targets, text = asyncio.run(run())
+    finally:
+        for name, value in original.items():
+            setattr(bot_server, name, value)
+    # 모든 대상이 변형 2개씩 채워진 뒤 멈춤
+    assert model.generate_content_async.call_count == 2 * len(targets)
+    assert any(t[3] == "국밥" for t in targets) and any(t[3] is None for t in targets)
+    # Gemini를 쓰지 않는 경로에서도 풀의 문구 사용
+    assert text.startswith("미리 만든 문구"), text
+    print("✅ Idle-time pregeneration passed!")
+
+
+if __name__ == "__main__":
+    test_variants_ttl_and_persistence()
+    test_async_access_runs_sqlite_off_loop()
+    test_menu_edit_invalidates_copy()
+    test_external_menu_edit_reloads_bot()
+    test_recommend_copy_served_from_cache()
+    test_idle_pregeneration_fills_pool()
@@ -0,0 +1,110 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import bot_server
+from gemini_pool import GeminiClientPool, KeyClient
+from response_copy_cache import ResponseCopyCache
+from single_flight import SingleFlight, normalize_prompt
+
+
+def test_concurrent_duplicates_share_one_call():
+    print("--- Testing single-flight coalescing ---")
+    flights = SingleFlight()
+    calls = []
+
+    async def upstream(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return f"result-{value}"
+
+    async def failing():
+        calls.append("fail")
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    async def run():
+        same = await asyncio.gather(*(flights.do("k", lambda: upstream("k")) for _ in range(5)))
+        other = await flights.do("other", lambda: upstream("other"))
+        errors = await asyncio.gather(*(flights.do("f", failing) for _ in range(3)), return_exceptions=True)
+        # 기다리던 쪽이 먼저 포기해도 실제 호출은 끝까지 진행되어 다른 대기자가 받음
+        waiter = asyncio.ensure_future(flights.do("c", lambda: upstream("c")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("c", lambda: upstream("c")))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return same, other, errors, await follower
+
+    same, other, errors, late = asyncio.run(run())
+    assert same == ["result-k"] * 5 and other == "result-other" and late == "result-c"
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert calls == ["k", "other", "fail", "c"]
+    stats = flights.stats()
+    assert stats["calls"] == 4 and stats["shared"] == 7 and stats["in_flight"] == 0
+    assert normalize_prompt("a \n b  c") == normalize_prompt("a b c")
+    print("✅ Single-flight coalescing passed!")
+
+
+def test_burst_of_same_copy_makes_one_gemini_call():
+    print("--- Testing burst of identical recommendation copy ---")
+    model = MagicMock()
+
+    async def generate(prompt):
+        await asyncio.sleep(0.05)
+        return MagicMock(text="오늘은 국밥 어때요?")
+    model.generate_content_async.side_effect = generate
+    choice = {"name": "국밥", "category": "국밥", "area": "회사 지하식당", "tags": ["soup"]}
+    intent = {"intent": "recommend", "emotion": "neutral"}
+    utterances = ["점심 추천", "밥 뭐 먹지", "점심 ㄱㄱ", "메뉴 골라줘"]
+
+    async def run():
+        return await asyncio.gather(*(
+            bot_server.generate_response_with_gemini(u, choice, intent, []) for u in utterances
+        ))
+
+    original = (bot_server.gemini_pool, bot_server.response_copy_cache)
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"generation": model})])
+    bot_server.response_copy_cache = ResponseCopyCache(path=None)
+    try:
+        texts = asyncio.run(run())
+    finally:
+        bot_server.gemini_pool, bot_server.response_copy_cache = original
+    assert all(t.endswith("오늘은 국밥 어때요?") for t in texts)
+    assert model.generate_content_async.call_count == 1
+    print("✅ Identical copy burst passed!")
+
+
+def test_patience_is_not_shared_across_flights():
+    print("--- Testing Gemini patience with single-flight ---")
+    model = MagicMock()
+
+    async def generate(prompt):
+        await asyncio.sleep(0.15)
+        return MagicMock(text="늦은 답")
+    model.generate_content_async.side_effect = generate
+
+    async def call(patience):
+        bot_server.gemini_patience.set(patience)
+        return await bot_server.run_gemini_with_timeout("같은 프롬프트", 0.1, "Test")
+
+    async def run():
+        # 기다려 줄 수 있는(콜백) 요청이 먼저 시작해도 일반 요청은 자기 대기 상한으로 호출
+        patient = asyncio.ensure_future(call(bot_server.CALLBACK_PATIENCE))
+        await asyncio.sleep(0)
+        impatient = asyncio.ensure_future(call(1.0))
+        return await patient, await impatient
+
+    original = bot_server.gemini_pool
+    bot_server.gemini_pool = GeminiClientPool([KeyClient("test", {"generation": model})])
+    try:
+        patient, impatient = asyncio.run(run())
+    finally:
+        bot_server.gemini_pool = original
+    assert patient == "늦은 답" and impatient is None
+    assert model.generate_content_async.call_count == 2
+    print("✅ Patience per flight passed!")
+
+
+if __name__ == "__main__":
+    test_concurrent_duplicates_share_one_call()
+    test_burst_of_same_copy_makes_one_gemini_call()
+    test_patience_is_not_shared_across_flights()
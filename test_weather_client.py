@@ -0,0 +1,170 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import httpx
+
+import recommender
+import weather_client
+
+
+def test_host_timeouts():
+    print("--- Testing per-host timeouts ---")
+    client = weather_client.WeatherHttpClient()
+    assert client.timeout_for("https://wttr.in/Seoul?format=%C+%t") == weather_client.HOST_TIMEOUTS["wttr.in"]
+    assert client.timeout_for("https://api.open-meteo.com/v1/forecast") == weather_client.HOST_TIMEOUTS["api.open-meteo.com"]
+    assert client.timeout_for("https://example.com/") == weather_client.DEFAULT_TIMEOUT
+    # 연결 + 읽기 합이 예전 전체 타임아웃(3초 / 4초) 이내
+    assert sum(weather_client.HOST_TIMEOUTS["wttr.in"]) <= 3.0
+    assert sum(weather_client.HOST_TIMEOUTS["api.open-meteo.com"]) <= 4.0
+    print("✅ Per-host timeouts passed!")
+
+
+def test_session_is_reused():
+    print("--- Testing pooled session reuse ---")
+    client = weather_client.WeatherHttpClient()
+    assert client._get_session() is client._get_session()
+    client.close()
+    assert client._session is None
+    print("✅ Session reuse passed!")
+
+
+def test_recommender_uses_shared_client():
+    print("--- Testing recommender uses shared client ---")
+    fake = MagicMock()
+    fake.get.return_value = MagicMock(status_code=200, text="Light rain +12°C")
+    original = recommender.weather_http
+    recommender.weather_http = fake
+    try:
+        cond, temp = recommender.LunchRecommender()._fetch_wttr("Seoul")
+    finally:
+        recommender.weather_http = original
+    assert (cond, temp) == ("비", "+12°C")
+    assert fake.get.call_args[0][0].startswith("https://wttr.in/Seoul")
+    print("✅ Shared client passed!")
+
+
+def _async_client_with(handler):
+    client = weather_client.AsyncWeatherClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_async_client_falls_back_to_open_meteo():
+    print("--- Testing async client fallback ---")
+    def handler(request):
+        if request.url.host == "wttr.in":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"current_weather": {"temperature": -3.4, "weathercode": 71}})
+
+    async def run():
+        client = _async_client_with(handler)
+        try:
+            return await client.get_weather("Seoul")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == ("눈", "-3°C")
+    print("✅ Async fallback passed!")
+
+
+def test_async_client_is_cancellable():
+    print("--- Testing async client cancellation ---")
+    async def slow_handler(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, text="Sunny +20°C")
+
+    async def run():
+        client = _async_client_with(slow_handler)
+        start = time.time()
+        try:
+            await asyncio.wait_for(client.get_weather("Seoul"), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await client.aclose()
+        return time.time() - start
+
+    assert asyncio.run(run()) < 1.0
+    print("✅ Async cancellation passed!")
+
+
+def _reset_provider_stats():
+    for provider in weather_client.WEATHER_PROVIDERS:
+        provider.calls = provider.errors = 0
+        provider.latency_ewma, provider.error_ewma = 1.0, 0.0
+
+
+def test_hedged_first_valid_wins():
+    print("--- Testing hedged providers ---")
+    _reset_provider_stats()
+    cancelled = []
+
+    async def handler(request):
+        if request.url.host == "wttr.in":
+            try:
+                await asyncio.sleep(3)
+            except asyncio.CancelledError:
+                cancelled.append(request.url.host)
+                raise
+            return httpx.Response(200, text="Sunny +20°C")
+        return httpx.Response(200, json={"current_weather": {"temperature": 12.2, "weathercode": 61}})
+
+    async def run():
+        client = _async_client_with(handler)
+        start = time.time()
+        try:
+            result = await client.get_weather("Seoul")
+            await asyncio.sleep(0)  # 취소 전파
+        finally:
+            await client.aclose()
+        return result, time.time() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == ("비", "12°C")
+    assert elapsed < weather_client.HEDGE_MAX_DELAY_SEC + 0.5
+    assert cancelled == ["wttr.in"]
+    stats = weather_client.provider_stats()
+    assert stats["open_meteo"]["calls"] == 1 and stats["wttr"]["calls"] == 0
+    print("✅ Hedged providers passed!")
+
+
+def test_ranking_prefers_fast_reliable_provider():
+    print("--- Testing provider ranking ---")
+    _reset_provider_stats()
+    wttr, meteo = weather_client.WEATHER_PROVIDERS
+    assert weather_client.ranked_providers()[0] is wttr  # 동점이면 기존 순서
+    for _ in range(5):
+        wttr.record(2.5, ok=False)
+        meteo.record(0.3, ok=True)
+    assert weather_client.ranked_providers()[0] is meteo
+    assert weather_client.hedge_delay(meteo) < weather_client.hedge_delay(wttr)
+    _reset_provider_stats()
+    print("✅ Provider ranking passed!")
+
+
+def test_meal_time_and_labels():
+    print("--- Testing meal-time lookup ---")
+    from datetime import datetime
+    noon = datetime(2026, 1, 5, 12, 30)
+    assert weather_client.meal_time("저녁", noon) == datetime(2026, 1, 5, 19)
+    assert weather_client.meal_time("아침", noon) == datetime(2026, 1, 6, 10)   # 이미 지난 끼니는 내일
+    assert weather_client.meal_time("점심", noon) == datetime(2026, 1, 5, 12)
+    assert weather_client.map_weather_label(None, "-3°C") == "한파"
+    # 상태가 있어도 기온 기준 적용 (비/눈은 유지)
+    assert weather_client.map_weather_label("맑음", "30°C") == "더위"
+    assert weather_client.map_weather_label("흐림", "-5°C") == "한파"
+    assert weather_client.map_weather_label("맑음", "20°C") == "맑음"
+    assert weather_client.map_weather_label("눈", "-5°C") == "눈"
+    print("✅ Meal-time lookup passed!")
+
+
+if __name__ == "__main__":
+    test_host_timeouts()
+    test_session_is_reused()
+    test_recommender_uses_shared_client()
+    test_async_client_falls_back_to_open_meteo()
+    test_async_client_is_cancellable()
+    test_hedged_first_valid_wins()
+    test_ranking_prefers_fast_reliable_provider()
+    test_meal_time_and_labels()
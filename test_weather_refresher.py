@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import bot_server
+import weather_client
+from weather_store import ForecastStore, WeatherStore
+
+
+class _FakeWeather:
+    def __init__(self, result, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def get_weather(self, location=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+def _swap_weather(fake):
+    original = bot_server.async_weather
+    bot_server.async_weather = fake
+    # 사용자 디스크 캐시를 건드리지 않도록 빈 메모리 캐시 사용
+    bot_server.weather_store = WeatherStore(path=None)
+    bot_server.forecast_store = ForecastStore(path=None)
+    return original
+
+
+def test_failed_refresh_keeps_last_value():
+    print("--- Testing stale value survives failed refresh ---")
+    original = _swap_weather(_FakeWeather(("비", "12°C")))
+    try:
+        assert asyncio.run(bot_server.refresh_weather_cache())
+        assert bot_server.weather_cache["mapped_weather"] == "비"
+
+        bot_server.async_weather = _FakeWeather((None, None))
+        bot_server.weather_store.clear()
+        assert not asyncio.run(bot_server.refresh_weather_cache())
+        assert bot_server.weather_cache["mapped_weather"] == "비"
+        assert bot_server.weather_cache["last_error"]
+        assert not bot_server.is_weather_stale()
+    finally:
+        bot_server.async_weather = original
+    print("✅ Stale value test passed!")
+
+
+def test_revalidation_never_blocks_and_is_single_flight():
+    print("--- Testing non-blocking single-flight revalidation ---")
+    fake = _FakeWeather(("맑음", "-5°C"), delay=0.3)
+    original = _swap_weather(fake)
+    bot_server.weather_cache["last_updated"] = datetime.now() - timedelta(hours=1)
+
+    async def run():
+        start = time.time()
+        for _ in range(5):
+            bot_server.trigger_weather_revalidation()
+        elapsed = time.time() - start
+        await bot_server._weather_revalidate_task
+        return elapsed
+
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        bot_server.async_weather = original
+    assert elapsed < 0.05
+    assert fake.calls == 1
+    assert bot_server.weather_cache["mapped_weather"] == "한파"   # 맑아도 영하면 기온 기준
+    assert not bot_server.is_weather_stale()
+    print("✅ Revalidation test passed!")
+
+
+def test_map_weather_uses_temperature():
+    assert bot_server.map_weather(None, "-3°C") == "한파"
+    assert bot_server.map_weather("Partly", "5°C") == "추위"
+    assert bot_server.map_weather("더움", "30°C") == "더위"
+
+
+class _FakeForecastWeather(_FakeWeather):
+    def __init__(self, forecast):
+        super().__init__(("맑음", "20°C"))
+        self.forecast = forecast
+        self.forecast_calls = 0
+
+    async def get_hourly_forecast(self, location=None):
+        self.forecast_calls += 1
+        return self.forecast
+
+
+@contextmanager
+def _host_timezone(name):
+    """서버 시간대를 잠시 바꿈 (컨테이너 기본값 UTC 등)"""
+    original = os.environ.get("TZ")
+    os.environ["TZ"] = name
+    time.tzset()
+    try:
+        yield
+    finally:
+        if original is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = original
+        time.tzset()
+
+
+def test_refresh_prefers_hourly_forecast():
+    print("--- Testing forecast-backed refresh ---")
+    # 예보 표의 키는 KST 기준 (Open-Meteo timezone=Asia/Seoul)
+    now = weather_client.forecast_now()
+    hours = {
+        now.strftime("%Y-%m-%dT%H:00"): (-4.0, 0),
+        weather_client.meal_time("저녁", now).strftime("%Y-%m-%dT%H:00"): (8.0, 61),
+    }
+    fake = _FakeForecastWeather(weather_client.HourlyForecast("Seoul", hours))
+    original = _swap_weather(fake)
+    try:
+        assert asyncio.run(bot_server.refresh_weather_cache())
+        assert asyncio.run(bot_server.refresh_weather_cache())
+    finally:
+        bot_server.async_weather = original
+    assert fake.forecast_calls == 1   # 예보는 TTL 동안 한 번만 조회
+    assert fake.calls == 0            # 현재 날씨 직접 조회 없음
+    assert bot_server.weather_cache["source"] == "forecast"
+    assert bot_server.weather_cache["condition"] == "맑음"
+    assert bot_server.get_meal_weather("저녁") == "비"
+    print("✅ Forecast-backed refresh passed!")
+
+
+def test_forecast_lookup_ignores_host_timezone():
+    print("--- Testing forecast lookup on a non-KST host ---")
+    with _host_timezone("America/Los_Angeles"):
+        assert datetime.now().hour != weather_client.forecast_now().hour
+        assert weather_client.meal_time("저녁").hour == 19
+        assert weather_client.meal_time("저녁").utcoffset() == timedelta(hours=9)
+        test_refresh_prefers_hourly_forecast()
+        # 시간대가 있는 시각은 KST로 바꿔 조회
+        forecast = weather_client.HourlyForecast("Seoul", {"2026-01-05T12:00": (1.0, 0)})
+        assert forecast.at(datetime(2026, 1, 5, 3, 30, tzinfo=weather_client.timezone.utc)) == ("맑음", "1°C")
+    print("✅ Non-KST host lookup passed!")
+
+
+if __name__ == "__main__":
+    test_failed_refresh_keeps_last_value()
+    test_revalidation_never_blocks_and_is_single_flight()
+    test_map_weather_uses_temperature()
+    test_refresh_prefers_hourly_forecast()
+    test_forecast_lookup_ignores_host_timezone()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from datetime import datetime
+
+from weather_client import HourlyForecast
+from weather_store import ForecastStore, WeatherStore, location_key
+
+
+def test_location_key_normalization():
+    assert location_key("Seoul") == location_key("서울") == location_key("seoul,KR")
+    assert location_key("Gangnam") != location_key("Seoul")
+    # 좌표를 모르는 도시는 서울 좌표로 합쳐지지 않고 이름으로 구분
+    assert location_key("Busan,KR") == location_key("busan") != location_key("Seoul")
+    assert location_key("Busan") != location_key("Daegu")
+
+
+def test_unmapped_cities_do_not_collide():
+    print("--- Testing unmapped city keys ---")
+    store = WeatherStore(path=None)
+    store.put("Busan,KR", "맑음", "18°C")
+    store.put("Daegu,KR", "비", "12°C")
+    assert store.get("Busan") == ("맑음", "18°C")
+    assert store.get("Daegu") == ("비", "12°C")
+    assert store.get("Seoul") is None
+    assert store.stats()["entries"] == 2
+    print("✅ Unmapped city keys passed!")
+
+
+def test_ttl_and_lru():
+    print("--- Testing TTL / LRU ---")
+    store = WeatherStore(ttl_sec=60, max_entries=2, path=None)
+    store.put("Seoul", "맑음", "20°C")
+    store.put("Gangnam", "비", "15°C", fetched_at=time.time() - 120)
+    assert store.get("서울") == ("맑음", "20°C")
+    assert store.get("Gangnam") is None                  # TTL 지남
+    assert store.get_entry("Gangnam")["condition"] == "비"  # 오래된 값은 별도로 조회 가능
+    store.put("Sangam-dong", "흐림", "10°C")
+    assert store.get_entry("Gangnam") is None            # 가장 오래 안 쓴 항목 제거
+    assert store.stats()["entries"] == 2
+    print("✅ TTL / LRU passed!")
+
+
+def test_persistence_roundtrip():
+    print("--- Testing disk persistence ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "weather_cache.json")
+        WeatherStore(path=path).put("Seoul", "눈", "-2°C")
+        reloaded = WeatherStore(path=path)
+        assert reloaded.get("서울") == ("눈", "-2°C")
+        # 예전 형식: 모르는 도시가 서울 좌표 키로 저장된 파일
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({location_key("Seoul"): {"location": "Busan,KR", "condition": "맑음", "temp": "18°C", "fetched_at": time.time()}}, f)
+        legacy = WeatherStore(path=path)
+        assert legacy.get("Busan") == ("맑음", "18°C")
+        assert legacy.get("Seoul") is None
+    print("✅ Disk persistence passed!")
+
+
+def test_sync_requests_are_coalesced():
+    print("--- Testing sync coalescing ---")
+    store = WeatherStore(path=None)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "맑음", "21°C"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.get_or_fetch("Seoul", fetch))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [("맑음", "21°C")] * 5
+    print("✅ Sync coalescing passed!")
+
+
+def test_async_requests_are_coalesced():
+    print("--- Testing async coalescing ---")
+    store = WeatherStore(path=None)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "비", "12°C"
+
+    async def run():
+        return await asyncio.gather(*[store.aget_or_fetch("Seoul", fetch) for _ in range(5)])
+
+    assert asyncio.run(run()) == [("비", "12°C")] * 5
+    assert len(calls) == 1
+    # 실패 결과는 저장하지 않음
+    async def failing():
+        return None, None
+    assert asyncio.run(store.aget_or_fetch("Gangnam", failing)) == (None, None)
+    assert store.get_entry("Gangnam") is None
+    print("✅ Async coalescing passed!")
+
+
+def test_forecast_store_weather_at():
+    print("--- Testing forecast store ---")
+    data = {"hourly": {
+        "time": ["2026-01-05T12:00", "2026-01-05T19:00"],
+        "temperature_2m": [1.6, -7.2],
+        "weathercode": [3, 0],
+    }}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "forecast_cache.json")
+        ForecastStore(path=path).put("Seoul", HourlyForecast.from_open_meteo("Seoul", data))
+        store = ForecastStore(path=path)
+        assert store.weather_at("서울", datetime(2026, 1, 5, 12, 40)) == ("흐림", "2°C")
+        assert store.weather_at("Seoul", datetime(2026, 1, 5, 19)) == ("맑음", "-7°C")
+        assert store.weather_at("Seoul", datetime(2026, 1, 6, 12)) == (None, None)
+        assert store.weather_at("Gangnam", datetime(2026, 1, 5, 12)) == (None, None)
+    print("✅ Forecast store passed!")
+
+
+def test_forecast_failure_backoff():
+    print("--- Testing forecast failure backoff ---")
+    store = ForecastStore(path=None)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return None
+
+    # 실패한 조회는 백오프 동안 다시 나가지 않음 (API 장애 시 매번 타임아웃을 기다리지 않도록)
+    assert store.get_or_fetch("Seoul", failing) is None
+    assert store.get_or_fetch("Seoul", failing) is None
+    assert len(calls) == 1
+
+    async def afailing():
+        calls.append(1)
+        return None
+    assert asyncio.run(store.aget_or_fetch("Seoul", afailing)) is None
+    assert len(calls) == 1
+    # 다른 위치는 영향 없음
+    assert asyncio.run(store.aget_or_fetch("Gangnam", afailing)) is None
+    assert len(calls) == 2
+
+    # 백오프가 끝나면 다시 조회
+    store._failed_at = {key: at - store.failure_backoff_sec for key, at in store._failed_at.items()}
+    data = {"hourly": {"time": ["2026-01-05T12:00"], "temperature_2m": [1.6], "weathercode": [3]}}
+    forecast = store.get_or_fetch("Seoul", lambda: HourlyForecast.from_open_meteo("Seoul", data))
+    assert forecast.at(datetime(2026, 1, 5, 12)) == ("흐림", "2°C")
+    assert not store._failed_at.get(location_key("Seoul"))
+    print("✅ Forecast failure backoff passed!")
+
+
+if __name__ == "__main__":
+    test_location_key_normalization()
+    test_unmapped_cities_do_not_collide()
+    test_ttl_and_lru()
+    test_persistence_roundtrip()
+    test_sync_requests_are_coalesced()
+    test_async_requests_are_coalesced()
+    test_forecast_store_weather_at()
+    test_forecast_failure_backoff()
@@ -0,0 +1,531 @@
+"""
+날씨/위치 HTTP 클라이언트 모듈
+wttr.in, Open-Meteo, ipapi.co 호출을 하나의 keep-alive 세션으로 묶어
+매 호출마다 DNS + TCP + TLS 연결을 새로 맺지 않도록 합니다.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote_plus, urlsplit
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+    requests = None
+    HTTPAdapter = None
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+import lunch_data
+
+WTTR_HOST = "wttr.in"
+OPEN_METEO_HOST = "api.open-meteo.com"
+IPAPI_HOST = "ipapi.co"
+
+# 호스트별 (연결, 읽기) 타임아웃 (초)
+# 연결 + 읽기 합이 예전 전체 타임아웃(wttr/ipapi 3초, Open-Meteo 4초)을 넘지 않도록 나눔
+DEFAULT_TIMEOUT = (1.0, 2.0)
+HOST_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    WTTR_HOST: (1.0, 2.0),
+    OPEN_METEO_HOST: (1.0, 3.0),
+    IPAPI_HOST: (1.0, 2.0),
+}
+WARM_UP_TIMEOUT = (1.0, 1.0)   # 미리 연결 맺기는 짧게 (서버 종료 시 스레드가 오래 남지 않도록)
+
+
+# 간단한 좌표 매핑 (무료 API라 폭넓은 지오코딩을 하지 않음)
+COORDS_MAP = {
+    "seoul": (37.5665, 126.9780),
+    "서울": (37.5665, 126.9780),
+    "sangam-dong": (37.5795, 126.8890),
+    "상암동": (37.5795, 126.8890),
+    "mapo-gu": (37.5665, 126.9018),
+    "마포구": (37.5665, 126.9018),
+    "gangnam": (37.4979, 127.0276),
+    "강남": (37.4979, 127.0276),
+}
+
+
+def get_coords(location: Optional[str]) -> Tuple[float, float]:
+    """위치 문자열 -> (위도, 경도). 모르는 위치는 서울 기준."""
+    key = (location or "").lower().strip()
+    # 단순히 쉼표 앞부분만 사용 (예: "Seoul,KR")
+    if "," in key:
+        key = key.split(",")[0].strip()
+    return COORDS_MAP.get(key, COORDS_MAP["seoul"])
+
+
+def weather_from_code(code) -> str:
+    """Open-Meteo weathercode -> 간단한 한글 상태."""
+    if code in [0]:
+        return "맑음"
+    if code in [1, 2, 3, 45, 48]:
+        return "흐림"
+    if code in [51, 53, 55, 56, 57, 61, 63, 65, 80, 81, 82, 95, 96, 99]:
+        return "비"
+    if code in [71, 73, 75, 77, 85, 86]:
+        return "눈"
+    return "흐림"
+
+
+def wttr_url(location: str) -> str:
+    return f"https://{WTTR_HOST}/{quote_plus(location)}?format=%C+%t"
+
+
+def open_meteo_url(location: str) -> str:
+    lat, lon = get_coords(location)
+    return f"https://{OPEN_METEO_HOST}/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true"
+
+
+def parse_wttr(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """wttr.in '%C+%t' 응답 (예: 'Light rain +12°C') -> (상태, 온도)"""
+    text = (text or "").strip()
+    parts = text.split()
+    if len(parts) >= 2:
+        cond_text = " ".join(parts[:-1]).lower()
+        temp_text = parts[-1]
+    else:
+        cond_text = text.lower()
+        temp_text = ""
+
+    condition = "맑음"
+    if "rain" in cond_text or "drizzle" in cond_text or "shower" in cond_text:
+        condition = "비"
+    elif "snow" in cond_text:
+        condition = "눈"
+    elif "cloud" in cond_text or "overcast" in cond_text or "mist" in cond_text or "fog" in cond_text:
+        condition = "흐림"
+    elif "sun" in cond_text or "clear" in cond_text:
+        condition = "맑음"
+
+    try:
+        t_val_str = temp_text.replace("+", "").replace("°C", "").replace("C", "")
+        t_val = int(t_val_str)
+        if t_val >= 28 and condition not in ["비", "눈"]:
+            condition = "더움"
+    except:
+        pass
+
+    return condition, temp_text
+
+
+def parse_open_meteo(data: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Open-Meteo current_weather 응답 -> (상태, 온도)"""
+    current = (data or {}).get("current_weather") or {}
+    temp = current.get("temperature")
+    code = current.get("weathercode")
+    if temp is None or code is None:
+        return None, None
+    return weather_from_code(code), f"{round(temp)}°C"
+
+
+def map_weather_label(cond: Optional[str], temp: Optional[str]) -> Optional[str]:
+    """날씨 상태/기온 문자열 -> 추천 엔진용 날씨 라벨 (비/눈/맑음/흐림/더위/한파/추위)"""
+    actual_weather = None
+    if cond:
+        weather_mapping = {
+            "비": "비", "rain": "비", "rainy": "비",
+            "눈": "눈", "snow": "눈", "snowy": "눈",
+            "맑음": "맑음", "clear": "맑음", "sunny": "맑음",
+            "흐림": "흐림", "cloudy": "흐림", "overcast": "흐림",
+            "더움": "더위", "hot": "더위"
+        }
+        c_lower = cond.lower()
+        for k, v in weather_mapping.items():
+            if k in c_lower:
+                actual_weather = v
+                break
+
+    # 비/눈이 아니면 기온이 상태보다 우선 (Open-Meteo 상태에는 "더움"이 없으므로 맑아도 28도 넘으면 더위)
+    if actual_weather not in ("비", "눈") and temp:
+        try:
+            t_val = float(temp.replace("°C", "").replace("℃", "").strip())
+            if t_val < 0: actual_weather = "한파"
+            elif t_val < 10: actual_weather = "추위"
+            elif t_val > 28: actual_weather = "더위"
+        except: pass
+    return actual_weather
+
+
+# --- 시간별 예보 (Open-Meteo hourly) ---
+FORECAST_DAYS = 2
+FORECAST_TIMEZONE = "Asia/Seoul"
+try:
+    from zoneinfo import ZoneInfo
+    FORECAST_TZ = ZoneInfo(FORECAST_TIMEZONE)
+except Exception:
+    FORECAST_TZ = timezone(timedelta(hours=9))   # tz 데이터가 없으면 고정 KST (일광절약시간 없음)
+# 식사 라벨별 대표 시각 (bot_server.get_meal_label 구간 기준)
+MEAL_HOURS = {"아침": 10, "점심": 12, "저녁": 19}
+
+
+def open_meteo_hourly_url(location: str, days: int = FORECAST_DAYS) -> str:
+    lat, lon = get_coords(location)
+    return (
+        f"https://{OPEN_METEO_HOST}/v1/forecast?latitude={lat}&longitude={lon}"
+        f"&hourly=temperature_2m,weathercode&timezone={quote_plus(FORECAST_TIMEZONE)}&forecast_days={days}"
+    )
+
+
+class HourlyForecast:
+    """위치 하나의 시간별 예보 표 ("YYYY-MM-DDTHH:00" -> (기온, weathercode))"""
+
+    def __init__(self, location: str, hours: Dict[str, Tuple[float, int]], fetched_at: Optional[float] = None):
+        self.location = location
+        self.hours = hours
+        self.fetched_at = fetched_at or time.time()
+
+    @classmethod
+    def from_open_meteo(cls, location: str, data: Dict[str, Any]) -> Optional["HourlyForecast"]:
+        hourly = (data or {}).get("hourly") or {}
+        times = hourly.get("time") or []
+        temps = hourly.get("temperature_2m") or []
+        codes = hourly.get("weathercode") or []
+        hours = {
+            t[:13] + ":00": (temp, code)
+            for t, temp, code in zip(times, temps, codes)
+            if temp is not None and code is not None
+        }
+        return cls(location, hours) if hours else None
+
+    @staticmethod
+    def hour_key(when: datetime) -> str:
+        """표의 키 (예보는 한국 시간 기준이므로 시간대가 있는 시각은 KST로 바꿈, 없는 시각은 KST로 간주)"""
+        if when.tzinfo is not None:
+            when = when.astimezone(FORECAST_TZ)
+        return when.strftime("%Y-%m-%dT%H:00")
+
+    def at(self, when: datetime) -> Tuple[Optional[str], Optional[str]]:
+        """해당 시각(정시 기준)의 (상태, 온도). 표 범위 밖이면 (None, None)"""
+        row = self.hours.get(self.hour_key(when))
+        if not row:
+            return None, None
+        temp, code = row
+        return weather_from_code(code), f"{round(temp)}°C"
+
+    def covers(self, when: datetime) -> bool:
+        return self.hour_key(when) in self.hours
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"location": self.location, "hours": self.hours, "fetched_at": self.fetched_at}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HourlyForecast":
+        hours = {k: tuple(v) for k, v in (data.get("hours") or {}).items()}
+        return cls(data.get("location"), hours, data.get("fetched_at"))
+
+
+def forecast_now() -> datetime:
+    """예보 표를 찾을 때 쓰는 현재 시각 (서버 시간대와 무관하게 KST)"""
+    return datetime.now(FORECAST_TZ)
+
+
+def meal_time(meal_label: str, now: Optional[datetime] = None) -> datetime:
+    """식사 라벨의 대표 시각 (기본은 KST 기준). 오늘 그 시간이 이미 지났으면 내일 같은 시각."""
+    now = now or forecast_now()
+    target = now.replace(hour=MEAL_HOURS.get(meal_label, 12), minute=0, second=0, microsecond=0)
+    if target + timedelta(hours=1) < now:
+        target += timedelta(days=1)
+    return target
+
+
+# --- 날씨 제공자 (병렬 헤지 + 통계 기반 우선순위) ---
+HEDGE_MIN_DELAY_SEC = 0.3   # 1순위 제공자 응답을 기다렸다가 2순위를 띄우기까지 최소 대기
+HEDGE_MAX_DELAY_SEC = 1.5
+LATENCY_EWMA_ALPHA = 0.3    # 지연시간 이동평균 가중치
+ERROR_PENALTY_SEC = 3.0     # 오류율 1.0 당 점수 페널티 (초 단위로 환산)
+
+
+class WeatherProvider:
+    """날씨 제공자 하나 (URL 생성 + 응답 파싱 + 지연/오류 통계)"""
+
+    def __init__(self, name: str, build_url: Callable[[str], str], parse_response: Callable[[Any], Tuple[Optional[str], Optional[str]]], initial_latency: float = 1.0):
+        self.name = name
+        self.build_url = build_url
+        self.parse_response = parse_response
+        self.calls = 0
+        self.errors = 0
+        self.latency_ewma = initial_latency
+        self.error_ewma = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self.lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.latency_ewma += LATENCY_EWMA_ALPHA * (latency - self.latency_ewma)
+            self.error_ewma += LATENCY_EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_ewma)
+
+    def score(self) -> float:
+        """낮을수록 우선 (평균 지연 + 오류율 페널티)"""
+        return self.latency_ewma + self.error_ewma * ERROR_PENALTY_SEC
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "latency_ewma": round(self.latency_ewma, 3),
+                "error_rate": round(self.error_ewma, 3),
+            }
+
+
+def _parse_wttr_response(res):
+    return parse_wttr(res.text) if res.status_code == 200 else (None, None)
+
+
+def _parse_open_meteo_response(res):
+    return parse_open_meteo(res.json()) if res.status_code == 200 else (None, None)
+
+
+# 등록 순서가 동점일 때의 우선순위 (기존 동작: wttr.in 우선)
+WEATHER_PROVIDERS: List[WeatherProvider] = [
+    WeatherProvider("wttr", wttr_url, _parse_wttr_response),
+    WeatherProvider("open_meteo", open_meteo_url, _parse_open_meteo_response),
+]
+
+
+def ranked_providers() -> List[WeatherProvider]:
+    """통계 점수가 좋은(빠르고 오류 적은) 순서로 정렬된 제공자 목록"""
+    return sorted(WEATHER_PROVIDERS, key=lambda p: p.score())
+
+
+def hedge_delay(primary: WeatherProvider) -> float:
+    """1순위 제공자의 평소 지연보다 조금 더 기다린 뒤 2순위를 띄움"""
+    return min(HEDGE_MAX_DELAY_SEC, max(HEDGE_MIN_DELAY_SEC, primary.latency_ewma * 1.5))
+
+
+def provider_stats() -> Dict[str, Dict[str, Any]]:
+    return {p.name: p.stats() for p in WEATHER_PROVIDERS}
+
+
+class WeatherHttpClient:
+    def __init__(self, pool_maxsize: int = 8, timeouts: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.pool_maxsize = pool_maxsize
+        self.timeouts = dict(HOST_TIMEOUTS if timeouts is None else timeouts)
+        self._session = None
+        self._executor = None
+        self.lock = threading.Lock()
+
+    def _get_session(self):
+        """세션은 처음 사용할 때 한 번만 생성 (호스트별 연결 풀 재사용)"""
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=len(self.timeouts) or 1, pool_maxsize=self.pool_maxsize)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def timeout_for(self, url: str) -> Tuple[float, float]:
+        """URL 호스트에 맞는 타임아웃 반환"""
+        host = urlsplit(url).hostname or ""
+        return self.timeouts.get(host, DEFAULT_TIMEOUT)
+
+    def get(self, url: str, timeout=None, **kwargs):
+        """풀링된 세션으로 GET (timeout 미지정 시 호스트별 기본값)"""
+        if not REQUESTS_AVAILABLE:
+            raise RuntimeError("requests 패키지가 설치되어 있지 않습니다.")
+        return self._get_session().get(url, timeout=timeout or self.timeout_for(url), **kwargs)
+
+    def _timed_fetch(self, provider: WeatherProvider, location: str):
+        start = time.monotonic()
+        try:
+            result = provider.parse_response(self.get(provider.build_url(location)))
+        except Exception:
+            result = (None, None)
+        provider.record(time.monotonic() - start, ok=result[0] is not None)
+        return result
+
+    def get_weather(self, location: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        제공자들을 헤지 방식으로 조회하고 먼저 도착한 유효한 결과를 반환.
+        1순위가 hedge_delay 안에 답하지 않거나 실패하면 2순위를 바로 띄웁니다.
+        (스레드 요청은 강제 취소할 수 없으므로 진 쪽 결과는 버리기만 합니다.)
+        """
+        if not REQUESTS_AVAILABLE:
+            return None, None
+        providers = ranked_providers()
+        executor = self._get_executor()
+        pending = set()
+        next_idx = 0
+
+        def launch():
+            nonlocal next_idx
+            pending.add(executor.submit(self._timed_fetch, providers[next_idx], location))
+            next_idx += 1
+
+        launch()
+        while pending:
+            timeout = hedge_delay(providers[0]) if next_idx < len(providers) else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch()  # 1순위가 느림 -> 헤지 요청 시작
+                continue
+            for fut in done:
+                pending.discard(fut)
+                cond, temp = fut.result()
+                if cond is not None:
+                    return cond, temp
+            if next_idx < len(providers):
+                launch()  # 실패했으면 기다리지 않고 다음 제공자
+        return None, None
+
+    def get_hourly_forecast(self, location: str) -> Optional[HourlyForecast]:
+        """시간별 예보 한 번 조회 (실패 시 None)"""
+        if not REQUESTS_AVAILABLE:
+            return None
+        try:
+            res = self.get(open_meteo_hourly_url(location))
+            if res.status_code != 200:
+                return None
+            return HourlyForecast.from_open_meteo(location, res.json())
+        except Exception:
+            return None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self.lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=len(WEATHER_PROVIDERS) * 2, thread_name_prefix="weather")
+        return self._executor
+
+    def warm_up(self, hosts=(WTTR_HOST, OPEN_METEO_HOST), timeout=WARM_UP_TIMEOUT) -> None:
+        """첫 요청 전에 미리 연결을 맺어 둠 (실패해도 무시)"""
+        if not REQUESTS_AVAILABLE:
+            return
+        for host in hosts:
+            try:
+                self._get_session().head(f"https://{host}/", timeout=timeout)
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        with self.lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+class AsyncWeatherClient:
+    """
+    봇 서버(asyncio)용 날씨 클라이언트.
+    httpx가 있으면 이벤트 루프 안에서 직접 요청하므로 스레드를 점유하지 않고,
+    태스크를 취소하면 진행 중인 요청도 함께 취소됩니다.
+    httpx가 없으면 동기 클라이언트를 스레드에서 실행합니다.
+    """
+
+    def __init__(self, timeouts: Optional[Dict[str, Tuple[float, float]]] = None, max_connections: int = 8):
+        self.timeouts = dict(HOST_TIMEOUTS if timeouts is None else timeouts)
+        self.max_connections = max_connections
+        self._client = None
+
+    def _get_client(self):
+        # 이벤트 루프 스레드에서만 사용하므로 별도 락 불필요
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def _timeout_for(self, url: str):
+        connect, read = self.timeouts.get(urlsplit(url).hostname or "", DEFAULT_TIMEOUT)
+        return httpx.Timeout(read, connect=connect)
+
+    async def _get(self, url: str):
+        if HTTPX_AVAILABLE:
+            # httpx 타임아웃은 단계별이므로 연결 + 읽기 합을 전체 마감으로도 걸어 둠
+            total = sum(self.timeouts.get(urlsplit(url).hostname or "", DEFAULT_TIMEOUT))
+            return await asyncio.wait_for(self._get_client().get(url, timeout=self._timeout_for(url)), timeout=total)
+        return await asyncio.to_thread(weather_http.get, url)
+
+    async def _timed_fetch(self, provider: WeatherProvider, location: str):
+        start = time.monotonic()
+        try:
+            result = provider.parse_response(await self._get(provider.build_url(location)))
+        except asyncio.CancelledError:
+            # 헤지에서 진 요청은 통계에 넣지 않음
+            raise
+        except Exception:
+            result = (None, None)
+        provider.record(time.monotonic() - start, ok=result[0] is not None)
+        return result
+
+    async def get_weather(self, location: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        날씨 가져오기: 빠른 제공자부터 시작해 hedge_delay 후(또는 실패 즉시) 다음 제공자를 병렬로 띄우고,
+        먼저 도착한 유효한 결과를 반환하며 나머지 요청은 취소합니다.
+        """
+        if not (HTTPX_AVAILABLE or REQUESTS_AVAILABLE):
+            return None, None
+        target_location = location or lunch_data.load_config().get("location", "Seoul")
+        providers = ranked_providers()
+        pending = set()
+        next_idx = 0
+
+        def launch():
+            nonlocal next_idx
+            pending.add(asyncio.create_task(self._timed_fetch(providers[next_idx], target_location)))
+            next_idx += 1
+
+        launch()
+        try:
+            while pending:
+                timeout = hedge_delay(providers[0]) if next_idx < len(providers) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()  # 1순위가 느림 -> 헤지 요청 시작
+                    continue
+                for task in done:
+                    pending.discard(task)
+                    cond, temp = task.result()
+                    if cond is not None:
+                        return cond, temp
+                if next_idx < len(providers):
+                    launch()  # 실패했으면 기다리지 않고 다음 제공자
+            return None, None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_hourly_forecast(self, location: str) -> Optional[HourlyForecast]:
+        """시간별 예보 한 번 조회 (실패 시 None)"""
+        if not (HTTPX_AVAILABLE or REQUESTS_AVAILABLE):
+            return None
+        try:
+            res = await self._get(open_meteo_hourly_url(location))
+            if res.status_code != 200:
+                return None
+            return HourlyForecast.from_open_meteo(location, res.json())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return None
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 전역 클라이언트 인스턴스 (봇 서버 / Streamlit / Tk 앱 공용)
+weather_http = WeatherHttpClient()
+# 봇 서버 전용 비동기 클라이언트
+async_weather = AsyncWeatherClient()
@@ -0,0 +1,298 @@
+"""
+날씨 캐시 모듈
+위치(좌표)별 최근 관측값과 시간별 예보를 TTL/LRU로 보관하고 디스크에 저장하여
+봇 서버, Streamlit, Tk 앱이 재시작 후에도 같은 값을 재사용하도록 합니다.
+같은 위치를 동시에 조회하면 실제 외부 요청은 한 번만 나갑니다.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import lunch_data
+from weather_client import COORDS_MAP, HourlyForecast, get_coords
+
+WEATHER_CACHE_FILE = os.path.join(lunch_data.DATA_DIR, "weather_cache.json")
+DEFAULT_TTL_SEC = 600            # 10분 이내 관측값은 그대로 사용
+MAX_PERSISTED_AGE_SEC = 6 * 3600 # 디스크에서 읽을 때 이보다 오래된 값은 버림
+COALESCE_WAIT_SEC = 10.0         # 다른 스레드의 조회를 기다리는 최대 시간
+
+FORECAST_CACHE_FILE = os.path.join(lunch_data.DATA_DIR, "forecast_cache.json")
+FORECAST_TTL_SEC = 3 * 3600       # 시간별 예보는 3시간마다 새로 받음
+FORECAST_MAX_AGE_SEC = 24 * 3600  # 이보다 오래된 예보는 사용하지 않음
+FORECAST_FAILURE_BACKOFF_SEC = 300  # 예보 조회 실패 후 5분간 다시 조회하지 않음 (API 장애 시 매 요청이 타임아웃을 기다리지 않도록)
+
+WeatherResult = Tuple[Optional[str], Optional[str]]
+
+
+def location_key(location: Optional[str]) -> str:
+    """
+    위치 문자열을 캐시 키로 정규화 ("Seoul", "서울", "seoul,KR" -> 같은 좌표 키).
+    좌표를 모르는 위치는 서울 좌표로 합쳐지지 않도록 정규화한 이름을 그대로 키로 사용
+    """
+    name = (location or "").lower().strip().split(",")[0].strip()
+    if name and name not in COORDS_MAP:
+        return name
+    lat, lon = get_coords(location)
+    return f"{lat:.4f},{lon:.4f}"
+
+
+class _Flight:
+    """진행 중인 동기 조회 하나 (결과를 기다리는 스레드들과 공유)"""
+
+    def __init__(self, result: Any = None):
+        self.event = threading.Event()
+        self.result = result
+
+
+class TTLStore(ABC):
+    """위치 키별 TTL/LRU 캐시 + 동시 조회 합치기 + 디스크 저장 (값 변환은 하위 클래스가 담당)"""
+    empty_result: Any = None
+    max_persisted_age_sec: float = MAX_PERSISTED_AGE_SEC
+    failure_backoff_sec: float = 0.0   # 조회 실패 후 이 시간 동안은 다시 조회하지 않고 empty_result 반환
+
+    def __init__(self, ttl_sec: float, max_entries: int = 64, path: Optional[str] = None):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.path = path
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._load()
+
+    # --- 값 변환 (하위 클래스에서 구현) ---
+    @abstractmethod
+    def _encode(self, value: Any) -> Optional[Dict[str, Any]]:
+        """저장할 필드 dict (저장하지 않을 값이면 None)"""
+
+    @abstractmethod
+    def _decode(self, entry: Dict[str, Any]) -> Any:
+        """저장된 필드 dict -> 값"""
+
+    def _is_valid_entry(self, entry: Dict[str, Any]) -> bool:
+        return True
+
+    # --- 조회/저장 ---
+    def get_entry(self, location: Optional[str]) -> Optional[Dict[str, Any]]:
+        """나이와 상관없이 마지막 저장값 반환 (오래된 값이라도 보여줄 때 사용)"""
+        with self.lock:
+            entry = self.entries.get(location_key(location))
+            return dict(entry) if entry else None
+
+    def get(self, location: Optional[str], max_age: Optional[float] = None) -> Any:
+        """TTL 안의 값이면 반환, 아니면 None"""
+        with self.lock:
+            return self._get_fresh(location_key(location), max_age)
+
+    def _get_fresh(self, key: str, max_age: Optional[float]) -> Any:
+        entry = self.entries.get(key)
+        limit = self.ttl_sec if max_age is None else max_age
+        if entry and time.time() - entry["fetched_at"] <= limit:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self._decode(entry)
+        self.misses += 1
+        return None
+
+    def _put_value(self, location: Optional[str], value: Any, fetched_at: Optional[float] = None) -> bool:
+        """유효한 값만 저장 (LRU 초과분 제거 후 디스크 반영). 반환: 저장 여부"""
+        fields = self._encode(value)
+        if fields is None:
+            return False
+        key = location_key(location)
+        with self.lock:
+            self.entries[key] = {"location": location, **fields, "fetched_at": fetched_at or time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            snapshot = dict(self.entries)
+        self._save(snapshot)
+        return True
+
+    # --- 실패 백오프 ---
+    def _backing_off(self, key: str) -> bool:
+        """최근 조회가 실패해 아직 다시 조회하지 않을 때 True (lock 안에서 호출)"""
+        failed_at = self._failed_at.get(key)
+        return failed_at is not None and time.time() - failed_at < self.failure_backoff_sec
+
+    def _fetch_done(self, location: Optional[str], key: str, result: Any) -> None:
+        """조회 결과 저장, 실패였으면 백오프 시작"""
+        stored = self._put_value(location, result)
+        with self.lock:
+            if stored:
+                self._failed_at.pop(key, None)
+            elif self.failure_backoff_sec > 0:
+                self._failed_at[key] = time.time()
+
+    # --- 동시 요청 합치기 ---
+    def get_or_fetch(self, location: Optional[str], fetch: Callable[[], Any], max_age: Optional[float] = None) -> Any:
+        """캐시에 있으면 바로 반환, 없으면 fetch() 한 번만 실행 (동시에 들어온 스레드는 결과를 기다림)"""
+        key = location_key(location)
+        with self.lock:
+            cached = self._get_fresh(key, max_age)
+            if cached:
+                return cached
+            if self._backing_off(key):
+                return self.empty_result
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(self.empty_result)
+
+        if not leader:
+            flight.event.wait(COALESCE_WAIT_SEC)
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            self._fetch_done(location, key, flight.result)
+            return flight.result
+        except Exception:
+            self._fetch_done(location, key, self.empty_result)
+            raise
+        finally:
+            with self.lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    async def aget_or_fetch(self, location: Optional[str], fetch: Callable[[], Awaitable[Any]], max_age: Optional[float] = None) -> Any:
+        """get_or_fetch의 asyncio 버전 (같은 위치의 조회 태스크를 공유)"""
+        key = location_key(location)
+        with self.lock:
+            cached = self._get_fresh(key, max_age)
+            backing_off = not cached and self._backing_off(key)
+        if cached:
+            return cached
+        if backing_off:
+            return self.empty_result
+
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._fetch_and_put(location, key, fetch))
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._tasks.pop(k, None) if self._tasks.get(k) is t else None)
+        # 한 호출자가 취소돼도 다른 호출자의 조회는 계속되도록 shield
+        return await asyncio.shield(task)
+
+    async def _fetch_and_put(self, location, key, fetch) -> Any:
+        try:
+            result = await fetch()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._fetch_done(location, key, self.empty_result)
+            raise
+        self._fetch_done(location, key, result)
+        return result
+
+    # --- 디스크 저장 ---
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Weather cache load error: {e}")
+            return
+        now = time.time()
+        rows = sorted(data.items(), key=lambda kv: kv[1].get("fetched_at", 0))
+        for key, entry in rows[-self.max_entries:]:
+            if now - entry.get("fetched_at", 0) <= self.max_persisted_age_sec and self._is_valid_entry(entry):
+                # 예전 파일은 모르는 위치도 서울 좌표 키로 저장했으므로 저장된 위치로 키를 다시 계산
+                if entry.get("location"):
+                    key = location_key(entry["location"])
+                self.entries[key] = entry
+
+    def _save(self, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        if not self.path:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".weather_", suffix=".json", dir=os.path.dirname(self.path) or ".")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Weather cache save error: {e}")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self._failed_at.clear()
+        self._save({})
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class WeatherStore(TTLStore):
+    """위치별 현재 날씨 (상태, 온도)"""
+    empty_result = (None, None)
+
+    def __init__(self, ttl_sec: float = DEFAULT_TTL_SEC, max_entries: int = 64, path: Optional[str] = WEATHER_CACHE_FILE):
+        super().__init__(ttl_sec, max_entries, path)
+
+    def _encode(self, value: WeatherResult) -> Optional[Dict[str, Any]]:
+        condition, temp = value
+        if condition is None:
+            return None
+        return {"condition": condition, "temp": temp}
+
+    def _decode(self, entry: Dict[str, Any]) -> WeatherResult:
+        return entry["condition"], entry["temp"]
+
+    def _is_valid_entry(self, entry: Dict[str, Any]) -> bool:
+        return bool(entry.get("condition"))
+
+    def put(self, location: Optional[str], condition: Optional[str], temp: Optional[str], fetched_at: Optional[float] = None) -> None:
+        self._put_value(location, (condition, temp), fetched_at)
+
+
+class ForecastStore(TTLStore):
+    """위치별 시간별 예보 (식사 시각 날씨를 외부 호출 없이 조회)"""
+    max_persisted_age_sec = FORECAST_MAX_AGE_SEC
+    failure_backoff_sec = FORECAST_FAILURE_BACKOFF_SEC
+
+    def __init__(self, ttl_sec: float = FORECAST_TTL_SEC, max_entries: int = 16, path: Optional[str] = FORECAST_CACHE_FILE):
+        super().__init__(ttl_sec, max_entries, path)
+
+    def _encode(self, value: Optional[HourlyForecast]) -> Optional[Dict[str, Any]]:
+        if value is None or not value.hours:
+            return None
+        return {"hours": value.hours}
+
+    def _decode(self, entry: Dict[str, Any]) -> HourlyForecast:
+        return HourlyForecast.from_dict(entry)
+
+    def _is_valid_entry(self, entry: Dict[str, Any]) -> bool:
+        return bool(entry.get("hours"))
+
+    def put(self, location: Optional[str], forecast: Optional[HourlyForecast]) -> None:
+        if forecast is not None:
+            self._put_value(location, forecast, forecast.fetched_at)
+
+    def weather_at(self, location: Optional[str], when: datetime) -> WeatherResult:
+        """저장된 예보에서 해당 시각의 (상태, 온도). 예보가 없거나 범위 밖이면 (None, None)"""
+        with self.lock:
+            entry = self.entries.get(location_key(location))
+            if not entry or time.time() - entry["fetched_at"] > self.max_persisted_age_sec:
+                return None, None
+            forecast = self._decode(entry)
+        return forecast.at(when)
+
+
+# 전역 날씨 / 예보 캐시 인스턴스
+weather_store = WeatherStore()
+forecast_store = ForecastStore()